@@ -7,6 +7,20 @@ import sys
 import os
 from datetime import datetime
 import logging
+import logging.handlers
+import queue
+import atexit
+import struct
+import gzip
+import glob
+import shutil
+import collections
+import mmap
+import itertools
+import signal
+import bisect
+import tracemalloc
+import http.server
 
 # ================================
 # CONFIGURAÇÕES INICIAIS
@@ -17,67 +31,246 @@ class Token:
         self.sequencia = 0
         self.timestamp = time.time()
         self.node_id = None  # ID do nó que gerou o token
+        self.extensoes = {}  # Campos opcionais (ex: anel e sentido no anel duplo)
     
     def incrementar(self):
         self.sequencia += 1
         self.timestamp = time.time()
-        logging.debug(f"[Token] 🔄 Token incrementado - Nova sequência: {self.sequencia}")
-        logging.debug(f"[Token] ⏱️ Novo timestamp: {datetime.fromtimestamp(self.timestamp)}")
+        logging.debug("[Token] 🔄 Token incrementado - Nova sequência: %s", self.sequencia)
+        logging.debug("[Token] ⏱️ Novo timestamp: %s", self.timestamp)
     
     def to_string(self):
         token_str = f"9000:{self.sequencia}:{self.timestamp}:{self.node_id}"
-        logging.debug(f"[Token] 📝 Token convertido para string: {token_str}")
+        if self.extensoes:
+            token_str += f":{montar_extensoes(self.extensoes)}"
+        logging.debug("[Token] 📝 Token convertido para string: %s", token_str)
         return token_str
     
     @staticmethod
     def from_string(token_str):
         if ":" in token_str:
             try:
-                _, seq, ts, node_id = token_str.split(":")
-                logging.debug(f"[Token] 🔍 Decodificando token: seq={seq}, ts={ts}, node={node_id}")
-                return int(seq), float(ts), node_id
+                _, seq, ts, node_id, *resto = token_str.split(":")
+                extensoes = ler_extensoes(resto[0]) if resto else {}
+                logging.debug("[Token] 🔍 Decodificando token: seq=%s, ts=%s, node=%s", seq, ts, node_id)
+                return int(seq), float(ts), node_id, extensoes
             except ValueError as e:
                 logging.error(f"[Token] ❌ Erro ao decodificar token: {token_str}")
                 logging.error(f"[Token] ❌ Erro específico: {str(e)}")
-                return 0, 0, None
-        return 0, 0, None
+                return 0, 0, None, {}
+        return 0, 0, None, {}
 
 def carregar_configuracao():
     """
     Carrega as configurações do arquivo config.txt
-    Retorna: IP de destino, porta, apelido, tempo do token e flag de gerador
+    Retorna: IP de destino, porta, apelido, tempo do token, flag de gerador
+    e opções adicionais (linhas opcionais no formato chave=valor)
     """
     with open('config.txt') as arquivo:
         linhas = arquivo.read().splitlines()
         ip_destino, porta = linhas[0].split(":")
         apelido = linhas[1]
-        tempo_token = int(linhas[2])
+        tempo_token = float(linhas[2])
         gerar_token = linhas[3].strip().lower() == 'true'
         porta = int(porta)
+        opcoes = {}
+        for linha in linhas[4:]:
+            if "=" in linha:
+                chave, valor = linha.split("=", 1)
+                opcoes[chave.strip()] = valor.strip()
         print(f"Configuração carregada: IP={ip_destino}, Porta={porta}, Apelido={apelido}, Tempo={tempo_token}, Gerador={gerar_token}")
-    return ip_destino, porta, apelido, tempo_token, gerar_token
+    return ip_destino, porta, apelido, tempo_token, gerar_token, opcoes
 
 # Carrega configurações do arquivo
-ip_destino, porta_destino, apelido, tempo_token, gerar_token = carregar_configuracao()
+ip_destino, porta_destino, apelido, tempo_token, gerar_token, opcoes = carregar_configuracao()
 
 # Configuração de logging
+# As threads da rede apenas enfileiram os registros; a formatação e a escrita
+# em disco ficam com uma thread de fundo, fora do caminho do token
+class RegistroEnfileirado(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        return record  # Mensagem formatada só na thread de escrita
+
+# Tipos de evento do índice lateral do log; registros sem marcador entram como OUTRO
+TIPOS_INDICE = ("ACK", "NACK", "DESCARTE", "MENSAGEM", "TOKEN", "TIMEOUT")
+
+def evento(tipo: str, no: str = None) -> dict:
+    """
+    Marcador de um registro para o índice (logging extra=...): o tipo do evento
+    e o nó do outro lado (origem ou destino da mensagem), se houver
+    """
+    return {"evento": tipo, "no": no}
+
+def classificar_registro(registro: logging.LogRecord) -> tuple:
+    """
+    Fonte (nó do outro lado do evento) e tipo de evento de um registro, pelo marcador
+    """
+    return getattr(registro, "no", None) or "-", getattr(registro, "evento", "OUTRO")
+
+# Segmentos de log fechados aguardando compressão
+fila_compressao = queue.SimpleQueue()
+
+def compactar_segmentos():
+    """
+    Thread de fundo: comprime com gzip os segmentos de log já rotacionados e depois
+    remove os mais antigos além do limite. Só esta thread remove segmentos, então
+    nenhum é apagado enquanto ainda aguarda (ou está em) compressão
+    """
+    while True:
+        segmento, base, manter = fila_compressao.get()
+        # Já descartado pela retenção enquanto aguardava na fila
+        if not os.path.exists(f"{segmento}.idx"):
+            continue
+        try:
+            with open(segmento, "rb") as origem, gzip.open(f"{segmento}.gz", "wb") as destino:
+                shutil.copyfileobj(origem, destino)
+            os.remove(segmento)
+        except OSError as erro:
+            print(f"Falha ao comprimir {segmento}: {erro}", file=sys.stderr)
+        if manter:
+            for indice_antigo in sorted(glob.glob(f"{glob.escape(base)}.*.idx"))[:-manter]:
+                antigo = indice_antigo[:-len(".idx")]
+                for caminho in (indice_antigo, antigo, f"{antigo}.gz"):
+                    if os.path.exists(caminho):
+                        os.remove(caminho)
+
+class ArquivoLogIndexado(logging.FileHandler):
+    """
+    FileHandler que mantém um índice lateral (<log>.idx) com a posição de cada
+    registro no arquivo, o instante, o nível, a fonte e o tipo do evento.
+    O log é rotacionado por tamanho ou tempo em segmentos <log>.<data>, que a
+    thread compactar_segmentos comprime (e descarta, além do limite) depois
+    """
+    def __init__(self, caminho, maximo_bytes=0, maximo_segundos=0, segmentos=0, encoding=None):
+        super().__init__(caminho, mode='a', encoding=encoding)
+        self.maximo_bytes = maximo_bytes
+        self.maximo_segundos = maximo_segundos
+        self.segmentos = segmentos  # Quantos segmentos antigos manter (0: todos)
+        self.indice = open(f"{self.baseFilename}.idx", "a", encoding="utf-8")
+        self.inicio_segmento = time.monotonic()
+        # O log da execução anterior vira um segmento em vez de ser apagado
+        if self.stream.tell() > 0:
+            self.rotacionar()
+
+    def rotacionar(self):
+        self.stream.close()
+        self.indice.close()
+        segmento = f"{self.baseFilename}.{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}"
+        os.replace(self.baseFilename, segmento)
+        os.replace(f"{self.baseFilename}.idx", f"{segmento}.idx")
+        fila_compressao.put((segmento, self.baseFilename, self.segmentos))
+        self.stream = self._open()
+        self.indice = open(f"{self.baseFilename}.idx", "a", encoding="utf-8")
+        self.inicio_segmento = time.monotonic()
+
+    def emit(self, record):
+        try:
+            if (self.maximo_bytes and self.stream.tell() >= self.maximo_bytes) or \
+               (self.maximo_segundos and time.monotonic() - self.inicio_segmento >= self.maximo_segundos):
+                self.rotacionar()
+            posicao = self.stream.tell()
+        except OSError:
+            self.handleError(record)
+            return
+        super().emit(record)
+        fonte, tipo = classificar_registro(record)
+        self.indice.write(f"{posicao}\t{record.created:.3f}\t{record.levelname}\t{fonte}\t{tipo}\n")
+        self.indice.flush()
+
+    def close(self):
+        self.indice.close()
+        super().close()
+
+fila_logs = queue.SimpleQueue()
+threading.Thread(target=compactar_segmentos, name="compactar_segmentos", daemon=True).start()
+arquivo_log = ArquivoLogIndexado(
+    f"logs_Computer3.log",
+    maximo_bytes=int(opcoes.get("log_max_bytes", 5_000_000)),
+    maximo_segundos=float(opcoes.get("log_max_segundos", 0)),
+    segmentos=int(opcoes.get("log_segmentos", 5)),
+    encoding="utf-8"
+)
+console_log = logging.StreamHandler()  # Adiciona saída para o console também
+for saida_log in (arquivo_log, console_log):
+    saida_log.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+escritor_logs = logging.handlers.QueueListener(fila_logs, arquivo_log, console_log)
+escritor_logs.start()
+atexit.register(escritor_logs.stop)  # Grava o que ainda estiver na fila ao encerrar
 logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(f"logs_Computer3.log", mode='w', encoding="utf-8"),
-        logging.StreamHandler()  # Adiciona saída para o console também
-    ]
+    level=getattr(logging, opcoes.get("nivel_log", "INFO").upper(), logging.INFO),
+    handlers=[RegistroEnfileirado(fila_logs)]
 )
 
 # Configurações globais do sistema
 fila_mensagens = []  # Lista de tuplas: (destino, mensagem, reenviado?, tentativas)
-token_presente = False
-ultima_passagem_token = time.time()
-tempo_maximo_token = 5  # Tempo máximo para o token voltar (em segundos)
-tempo_minimo_token = 0.5  # Tempo mínimo entre tokens (em segundos)
+ultima_passagem_token = time.monotonic()
+tempo_maximo_token = float(opcoes.get("tempo_maximo_token", 15))  # Tempo máximo para o token voltar (em segundos)
+tempo_minimo_token = float(opcoes.get("tempo_minimo_token", 0.5))  # Tempo mínimo entre tokens (em segundos)
 nos_ativos = set()  # Conjunto de nós ativos na rede
 MAX_TENTATIVAS = 2  # Número máximo de tentativas de envio
+TTL_MINIMO = 8  # Saltos mínimos de um quadro antes de ser descartado
+TAMANHO_FILA = 10  # Máximo de mensagens na fila do nó (somando os anéis)
+PAUSA_GERENCIADOR = 0.1  # Pausa entre as iterações do gerenciador (em segundos)
+ESPERA_GERADOR = 2  # O gerador aguarda a rede estabilizar antes do primeiro token (em segundos)
+INTERVALO_VIZINHOS = 1  # Intervalo entre PINGs aos vizinhos no anel duplo (em segundos)
+LIMITE_ENLACE = 3  # Tempo sem PONG para considerar o enlace caído (em segundos)
+INTERVALO_ROTA = 5  # Intervalo entre levantamentos dos nós de cada anel pela ponte (em segundos)
+INTERVALO_RELOGIO = 5  # Intervalo entre trocas de relógio com o próximo nó (em segundos)
+TAMANHO_DATAGRAMA = 65535  # Maior datagrama UDP; o rastro de saltos (extensão t) cresce a cada nó
+# Os instantes internos vêm do relógio monotônico; a base o alinha ao relógio de parede
+# uma única vez, na partida, e ajustes posteriores do relógio do sistema não o afetam
+BASE_RELOGIO = time.time() - time.monotonic()
+
+# Anel duplo contra-rotativo (opcional, estilo FDDI): no modo "failover" o anel
+# secundário só é usado para contornar enlaces caídos (wrap); no modo "duplo"
+# um segundo token circula nele, dobrando a capacidade
+modo_anel = opcoes.get("anel_duplo", "simples")
+ip_anterior, porta_anterior = None, None
+if modo_anel not in ("simples", "failover", "duplo"):
+    logging.error(f"Modo de anel inválido: {modo_anel}. Usando anel simples")
+    modo_anel = "simples"
+elif modo_anel != "simples":
+    if "anterior" in opcoes:
+        ip_anterior, porta_anterior = opcoes["anterior"].split(":")
+        porta_anterior = int(porta_anterior)
+    else:
+        logging.error("Anel duplo exige a opção anterior=ip:porta. Usando anel simples")
+        modo_anel = "simples"
+
+# Ponte (opcional): o nó participa também de um segundo anel, recebendo nele
+# pela porta ponte_porta e repassando ao nó ponte=ip:porta, e encaminha
+# quadros entre os dois anéis, formando um anel de anéis
+ip_ponte, porta_ponte, porta_local_ponte = None, None, None
+ponte_gerador = opcoes.get("ponte_gerador", "false").lower() == "true"
+if "ponte" in opcoes:
+    if "ponte_porta" in opcoes:
+        ip_ponte, porta_ponte = opcoes["ponte"].split(":")
+        porta_ponte = int(porta_ponte)
+        porta_local_ponte = int(opcoes["ponte_porta"])
+    else:
+        logging.error("Ponte exige a opção ponte_porta=porta. Ponte desativada")
+
+# Entrega direta (opcional): o token continua controlando quem pode transmitir,
+# mas o quadro vai direto ao endereço do destino em vez de percorrer o anel
+entrega_direta = opcoes.get("entrega", "anel") == "direta"
+
+# Sem interface (interface=false): as mensagens chegam pela entrada padrão, uma por linha
+# ("destino mensagem"), e os eventos saem em linhas "@ENTREGUE", "@DESCARTADA",
+# "@RECEBIDA" (quadro aceito no destino) e "@REGENERADO" (token regenerado);
+# as linhas de uma mensagem terminam com o texto dela, para casar com o envio
+interface_ativa = opcoes.get("interface", "true").lower() != "false"
+probabilidade_erro = float(opcoes.get("probabilidade_erro", 0.2))  # Chance de corromper um quadro enviado
+
+# Rastro de saltos (opcional): cada nó acrescenta nome@instante ao quadro (extensão t)
+# e a origem decompõe a latência de entrega ao receber o ACK/NACK
+rastrear_saltos = opcoes.get("rastro_saltos", "false").lower() == "true"
+
+# Estatísticas do anel no token (opcional): cada nó soma ao bloco e do token primário o que
+# fez desde a última passagem, e qualquer nó calcula a vazão do anel a cada volta
+estatisticas_no_token = opcoes.get("estatisticas_anel", "false").lower() == "true"
+
+saindo = False  # Indica que o nó está deixando a rede (saída graciosa)
+saida_concluida = threading.Event()  # Sinaliza que a saída foi anunciada e o token repassado
 
 # Estados do token
 ESTADO_TOKEN = {
@@ -101,12 +294,12 @@ ESTADO_MENSAGEM = {
 # Controle de tempo do token
 class ControleToken:
     def __init__(self):
-        self.ultima_passagem = time.time()
-        self.ultimo_token_time = time.time()
+        self.ultima_passagem = time.monotonic()
+        self.ultimo_token_time = time.monotonic()
         self.contador_tokens = 0
         self.token_gerado = False
-        self.tempo_maximo = 15  # Aumentado para 15 segundos
-        self.tempo_minimo = 0.5
+        self.tempo_maximo = tempo_maximo_token
+        self.tempo_minimo = tempo_minimo_token
         self.ultima_sequencia = 0
         self.token = Token()
         self.token.node_id = apelido  # Identificador do nó
@@ -116,23 +309,22 @@ class ControleToken:
         self.max_tokens_armazenados = 100  # Limite de tokens armazenados
         self.contador_timeouts = 0
         self.contador_duplicados = 0
-        logging.debug(f"[Token] 🆕 Controle de token inicializado para {apelido}")
+        logging.debug("[Token] 🆕 Controle de token inicializado para %s", apelido)
 
     def verificar_timeout(self):
         if self.regenerando:
             return False
             
-        tempo_atual = time.time()
+        tempo_atual = time.monotonic()
         tempo_passado = tempo_atual - self.ultima_passagem
         
         # Log detalhado do estado do token
-        logging.debug(f"[Token] ⏱️ Tempo desde último token: {tempo_passado:.2f}s")
-        logging.debug(f"[Token] 🔄 Estado atual: {'Regenerando' if self.regenerando else 'Normal'}")
+        logging.debug("[Token] ⏱️ Tempo desde último token: %.2fs", tempo_passado)
         
         if tempo_passado > self.tempo_maximo:
             self.regenerando = True
             self.contador_timeouts += 1
-            logging.warning(f"[Token] ⚠️ TIMEOUT DO TOKEN!")
+            logging.warning(f"[Token] ⚠️ TIMEOUT DO TOKEN!", extra=evento("TIMEOUT"))
             logging.warning(f"[Token] ⏱️ Token não retornou em {tempo_passado:.2f} segundos")
             logging.warning(f"[Token] 📊 Total de timeouts: {self.contador_timeouts}")
             return True
@@ -142,32 +334,36 @@ class ControleToken:
         if not self.regenerando:
             return None
             
+        # Salta as sequências que os demais nós podem ter visto na última volta,
+        # para o token regenerado não ser descartado como duplicado (ex: após wrap)
+        self.token.sequencia += len(nos_ativos)
         self.token.incrementar()
         self.ultima_sequencia = self.token.sequencia
         self.regenerando = False
         self.atualizar_tempo()
-        logging.info(f"[Token] 🔄 Token regenerado - Nova sequência: {self.token.sequencia}")
-        logging.debug(f"[Token] 📊 Estado após regeneração:")
-        logging.debug(f"[Token] 🔢 Sequência: {self.token.sequencia}")
-        logging.debug(f"[Token] ⏱️ Timestamp: {datetime.fromtimestamp(self.token.timestamp)}")
-        logging.debug(f"[Token] 🏷️ Node ID: {self.token.node_id}")
+        logging.info(f"[Token] 🔄 Token regenerado - Nova sequência: {self.token.sequencia}", extra=evento("TOKEN"))
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug("[Token] 📊 Estado após regeneração:")
+            logging.debug("[Token] 🔢 Sequência: %s", self.token.sequencia)
+            logging.debug("[Token] ⏱️ Timestamp: %s", datetime.fromtimestamp(self.token.timestamp))
+            logging.debug("[Token] 🏷️ Node ID: %s", self.token.node_id)
         return self.token.to_string()
 
     def verificar_tempo_minimo(self):
-        tempo_atual = time.time()
+        tempo_atual = time.monotonic()
         tempo_passado = tempo_atual - self.ultimo_token_time
         
         # Limpa tokens antigos
         self._limpar_tokens_antigos()
         
         if tempo_passado < self.tempo_minimo:
-            logging.warning(f"[Token] ⚠️ ALERTA: TOKEN MUITO RÁPIDO!")
+            logging.warning(f"[Token] ⚠️ ALERTA: TOKEN MUITO RÁPIDO!", extra=evento("TOKEN"))
             logging.warning(f"[Token] ⏱️ Token recebido em {tempo_passado:.2f} segundos")
             return True
         return False
 
     def _limpar_tokens_antigos(self):
-        tempo_atual = time.time()
+        tempo_atual = time.monotonic()
         tokens_para_remover = []
         
         # Remove tokens antigos
@@ -185,69 +381,549 @@ class ControleToken:
                 del self.tokens_recebidos[seq]
 
     def processar_token(self, token_str):
-        sequencia, timestamp, node_id = Token.from_string(token_str)
+        sequencia, timestamp, node_id, extensoes = Token.from_string(token_str)
         
         # Log detalhado do processamento
-        logging.debug(f"[Token] 🔍 Processando token:")
-        logging.debug(f"[Token] 📊 Sequência atual: {self.token.sequencia}")
-        logging.debug(f"[Token] 📊 Sequência recebida: {sequencia}")
-        logging.debug(f"[Token] 📊 Node ID atual: {self.token.node_id}")
-        logging.debug(f"[Token] 📊 Node ID recebido: {node_id}")
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            logging.debug("[Token] 🔍 Processando token:")
+            logging.debug("[Token] 📊 Sequência atual: %s", self.token.sequencia)
+            logging.debug("[Token] 📊 Sequência recebida: %s", sequencia)
+            logging.debug("[Token] 📊 Node ID atual: %s", self.token.node_id)
+            logging.debug("[Token] 📊 Node ID recebido: %s", node_id)
         
         # Verifica se é um token duplicado
         if sequencia in self.tokens_recebidos:
             self.contador_duplicados += 1
-            logging.warning(f"[Token] ⚠️ Token duplicado detectado!")
+            logging.warning(f"[Token] ⚠️ Token duplicado detectado!", extra=evento("TOKEN", node_id))
             logging.warning(f"[Token] 📊 Sequência: {sequencia}")
             logging.warning(f"[Token] 📊 Total de duplicados: {self.contador_duplicados}")
-            logging.warning(f"[Token] 🔍 Token anterior recebido em: {datetime.fromtimestamp(self.tokens_recebidos[sequencia][0])}")
+            logging.warning(f"[Token] 🔍 Token anterior recebido há {time.monotonic() - self.tokens_recebidos[sequencia][0]:.2f}s")
             return False
         
         # Atualiza o token local com os dados recebidos
         self.token.sequencia = sequencia
         self.token.timestamp = timestamp
         self.token.node_id = node_id
+        self.token.extensoes = extensoes
         
         # Incrementa a sequência para o próximo nó
         self.token.incrementar()
         
-        # Armazena o token com timestamp e node_id
-        self.tokens_recebidos[sequencia] = (timestamp, node_id)
-        logging.debug(f"[Token] ✅ Token processado e incrementado")
+        # Armazena o token com o instante local de chegada e node_id
+        self.tokens_recebidos[sequencia] = (time.monotonic(), node_id)
+        logging.debug("[Token] ✅ Token processado e incrementado")
         return True
 
     def atualizar_tempo(self):
-        self.ultima_passagem = time.time()
-        self.ultimo_token_time = time.time()
+        self.ultima_passagem = time.monotonic()
+        self.ultimo_token_time = time.monotonic()
         self.contador_tokens += 1
-        logging.debug(f"[Token] ⏱️ Tempo atualizado - Total de tokens: {self.contador_tokens}")
-
-    def mostrar_status(self):
-        tempo_atual = time.time()
-        tempo_desde_ultimo = tempo_atual - self.ultima_passagem
-        logging.info(f"[Token] 📊 Status do Token:")
-        logging.info(f"[Token] ⏱️ Tempo desde último token: {tempo_desde_ultimo:.2f}s")
-        logging.info(f"[Token] 🔢 Tokens recebidos: {self.contador_tokens}")
-        logging.info(f"[Token] 🔄 Sequência atual: {self.token.sequencia}")
-        logging.info(f"[Token] ⚠️ Total de timeouts: {self.contador_timeouts}")
-        logging.info(f"[Token] ⚠️ Total de duplicados: {self.contador_duplicados}")
-        logging.info(f"[Token] 📝 Tokens em memória: {len(self.tokens_recebidos)}")
+        logging.debug("[Token] ⏱️ Tempo atualizado - Total de tokens: %s", self.contador_tokens)
+
+# Contadores de quadros de dados descartados
+class EstatisticasQuadros:
+    def __init__(self):
+        self.descartados_ttl = 0  # TTL esgotado antes de chegar ao destino
+        self.descartados_orfaos = 0  # Passaram duas vezes pelo monitor (origem morta)
+        self.descartados_malformados = 0  # Cabeçalho corrompido
+        self.trava = threading.Lock()
+
+    def incrementar(self, contador: str):
+        # Os dois receptores (anel e ponte) descartam quadros: += não é atômico entre threads
+        with self.trava:
+            setattr(self, contador, getattr(self, contador) + 1)
+
+    def total_descartados(self):
+        return self.descartados_ttl + self.descartados_orfaos + self.descartados_malformados
+
+# Métricas acumuladas em memória e registradas em uma única linha por intervalo;
+# os receptores e o gerenciador atualizam e o gerenciador lê e zera, sob um lock
+class ResumoPeriodico:
+    def __init__(self, intervalo):
+        self.intervalo = intervalo
+        self.anteriores = (0, 0, 0)  # Duplicados, timeouts e descartados até o último resumo
+        self.trava = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        self.inicio = time.monotonic()
+        self.tokens = 0
+        self.quadros_enviados = 0
+        self.retransmissoes = 0
+        self.voltas = 0
+        self.soma_voltas = 0
+        self.volta_minima = None
+        self.volta_maxima = 0
+
+    def incrementar(self, contador: str):
+        with self.trava:
+            setattr(self, contador, getattr(self, contador) + 1)
+
+    def registrar_volta(self, duracao):
+        with self.trava:
+            self.voltas += 1
+            self.soma_voltas += duracao
+            self.volta_minima = duracao if self.volta_minima is None else min(self.volta_minima, duracao)
+            self.volta_maxima = max(self.volta_maxima, duracao)
+
+    def emitir(self):
+        duplicados = sum(anel.controle.contador_duplicados for anel in aneis)
+        timeouts = sum(anel.controle.contador_timeouts for anel in aneis)
+        descartados = estatisticas_quadros.total_descartados()
+        # Lê e zera juntos: o que chegar depois entra no próximo resumo
+        with self.trava:
+            if self.voltas:
+                voltas = f"{self.volta_minima:.2f}/{self.soma_voltas / self.voltas:.2f}/{self.volta_maxima:.2f}s"
+            else:
+                voltas = "-"
+            duracao, tokens, quadros, retransmissoes = time.monotonic() - self.inicio, self.tokens, self.quadros_enviados, self.retransmissoes
+            self.reiniciar()
+        logging.info(
+            f"[{apelido}] 📊 Resumo {duracao:.0f}s: tokens={tokens} "
+            f"volta mín/média/máx={voltas} quadros={quadros} "
+            f"retransmissões={retransmissoes} duplicados={duplicados - self.anteriores[0]} "
+            f"timeouts={timeouts - self.anteriores[1]} descartados={descartados - self.anteriores[2]}"
+        )
+        if estatisticas_rede:
+            logging.info(
+                f"[{apelido}] 🌐 Anel (última volta): {estatisticas_rede['quadros_por_segundo']:.2f} quadros/s "
+                f"{estatisticas_rede['entregas_por_segundo']:.2f} entregas/s "
+                f"retransmissão={estatisticas_rede['taxa_retransmissao']:.1%} "
+                f"utilização={estatisticas_rede['utilizacao']:.1%}"
+            )
+        if desvio_anel is not None and not gerar_token:
+            logging.info(f"[{apelido}] 🕰️ Relógio: desvio do anel {desvio_anel * 1000:+.3f} ms")
+        self.anteriores = (duplicados, timeouts, descartados)
+
+# Histograma com limites fixos; observar() só incrementa contadores, sob um lock
+# próprio (observado por mais de uma thread)
+class Histograma:
+    def __init__(self, limites):
+        self.limites = limites
+        self.contagens = [0] * (len(limites) + 1)  # Último: acima do maior limite
+        self.soma = 0.0
+        self.trava = threading.Lock()
+
+    def observar(self, valor):
+        indice = bisect.bisect_left(self.limites, valor)
+        with self.trava:
+            self.contagens[indice] += 1
+            self.soma += valor
+
+    def copia(self) -> tuple:
+        """
+        Contagens e soma lidas juntas, para a coleta das métricas
+        """
+        with self.trava:
+            return list(self.contagens), self.soma
+
+LIMITES_SALTO = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 15)
+
+# Métricas do nó no formato de texto do Prometheus (metricas_porta=N)
+class Metricas:
+    def __init__(self):
+        self.datagramas_enviados = 0
+        self.datagramas_recebidos = 0
+        self.quadros_enviados = 0
+        self.quadros_recebidos = 0
+        self.entregas = 0
+        self.retransmissoes = 0
+        self.tempo_volta = Histograma((0.01, 0.05, 0.1, 0.5, 1, 2, 5, 10, 15, 30))
+        self.latencia_entrega = Histograma((0.005, 0.01, 0.05, 0.1, 0.5, 1, 2, 5, 10, 30, 60))
+        # Decomposição da entrega pelo rastro de saltos (rastro_saltos=true)
+        self.etapas = {etapa: Histograma(LIMITES_SALTO) for etapa in ("fila", "destino", "retorno")}
+        self.saltos = {}  # (de, para) -> Histograma
+        self.trava = threading.Lock()  # Contadores atualizados pelos receptores e pelo gerenciador
+
+    def incrementar(self, contador: str):
+        with self.trava:
+            setattr(self, contador, getattr(self, contador) + 1)
+
+    def observar_salto(self, de, para, duracao):
+        with self.trava:
+            hist = self.saltos.get((de, para))
+            if hist is None:
+                hist = self.saltos[(de, para)] = Histograma(LIMITES_SALTO)
+        hist.observar(duracao)
+
+    def exportar(self) -> str:
+        linhas = []
+        no = f'no="{apelido}"'
+
+        def serie(nome, tipo, ajuda, valores):
+            linhas.append(f"# HELP {nome} {ajuda}")
+            linhas.append(f"# TYPE {nome} {tipo}")
+            for rotulos, valor in valores:
+                linhas.append(f"{nome}{{{no}{rotulos}}} {valor}")
+
+        def histograma(nome, ajuda, series):
+            linhas.append(f"# HELP {nome} {ajuda}")
+            linhas.append(f"# TYPE {nome} histogram")
+            for rotulos, hist in series:
+                contagens, soma = hist.copia()
+                acumulado = 0
+                for limite, contagem in zip(list(hist.limites) + ["+Inf"], contagens):
+                    acumulado += contagem
+                    linhas.append(f'{nome}_bucket{{{no}{rotulos},le="{limite}"}} {acumulado}')
+                linhas.append(f"{nome}_sum{{{no}{rotulos}}} {soma}")
+                linhas.append(f"{nome}_count{{{no}{rotulos}}} {acumulado}")
+
+        def por_anel(valor):
+            return [(f',anel="{anel.indice}"', valor(anel)) for anel in aneis]
+
+        serie("anel_token_passagens_total", "counter", "Passagens do token pelo nó", por_anel(lambda anel: anel.controle.contador_tokens))
+        serie("anel_token_timeouts_total", "counter", "Timeouts do token", por_anel(lambda anel: anel.controle.contador_timeouts))
+        serie("anel_token_duplicados_total", "counter", "Tokens duplicados descartados", por_anel(lambda anel: anel.controle.contador_duplicados))
+        serie("anel_fila_mensagens", "gauge", "Mensagens aguardando envio", por_anel(lambda anel: len(anel.fila)))
+        serie("anel_datagramas_total", "counter", "Datagramas UDP", [(',sentido="enviado"', self.datagramas_enviados), (',sentido="recebido"', self.datagramas_recebidos)])
+        serie("anel_quadros_total", "counter", "Quadros de dados", [(',sentido="enviado"', self.quadros_enviados), (',sentido="recebido"', self.quadros_recebidos)])
+        serie("anel_entregas_total", "counter", "Mensagens confirmadas com ACK", [("", self.entregas)])
+        serie("anel_retransmissoes_total", "counter", "Quadros retransmitidos após NACK", [("", self.retransmissoes)])
+        serie("anel_quadros_descartados_total", "counter", "Quadros descartados", [
+            (',motivo="ttl"', estatisticas_quadros.descartados_ttl),
+            (',motivo="orfao"', estatisticas_quadros.descartados_orfaos),
+            (',motivo="malformado"', estatisticas_quadros.descartados_malformados),
+        ])
+        vizinhos = [(f',vizinho="{relogio.nome}"', relogio) for relogio in list(relogios.values()) if relogio.amostras]
+        serie("anel_relogio_desvio_segundos", "gauge", "Relógio do próximo nó menos o local", [(r, relogio.desvio()) for r, relogio in vizinhos])
+        serie("anel_relogio_atraso_segundos", "gauge", "Ida e volta da melhor troca de relógio", [(r, relogio.melhor_amostra()[2]) for r, relogio in vizinhos])
+        serie("anel_relogio_deriva_ppm", "gauge", "Deriva do relógio do próximo nó", [(r, relogio.deriva() * 1e6) for r, relogio in vizinhos])
+        for chave, ajuda in (("quadros_por_segundo", "Quadros enviados no anel inteiro"),
+                             ("entregas_por_segundo", "Entregas no anel inteiro"),
+                             ("taxa_retransmissao", "Retransmissões por quadro enviado no anel"),
+                             ("utilizacao", "Fração das passagens do token usadas para transmitir")):
+            if chave in estatisticas_rede:
+                serie(f"anel_rede_{chave}", "gauge", f"{ajuda} (última volta)", [("", estatisticas_rede[chave])])
+        if desvio_anel is not None:
+            serie("anel_relogio_desvio_anel_segundos", "gauge", "Relógio local menos o do gerador do token", [("", desvio_anel)])
+        usos = [(f',lock="{lock.nome}",local="{local}"', uso) for lock in (mutex, lock_token) for local, uso in list(lock.usos.items())]
+        serie("anel_lock_aquisicoes_total", "counter", "Aquisições do lock", [(r, uso.aquisicoes) for r, uso in usos])
+        serie("anel_lock_disputas_total", "counter", "Aquisições que encontraram o lock ocupado", [(r, uso.contendidas) for r, uso in usos])
+        serie("anel_lock_espera_segundos_total", "counter", "Tempo esperando pelo lock", [(r, uso.espera) for r, uso in usos])
+        serie("anel_lock_posse_segundos_total", "counter", "Tempo com o lock adquirido", [(r, uso.posse) for r, uso in usos])
+        serie("anel_lock_espera_maxima_segundos", "gauge", "Maior espera pelo lock", [(r, uso.espera_maxima) for r, uso in usos])
+        serie("anel_lock_posse_maxima_segundos", "gauge", "Maior posse do lock", [(r, uso.posse_maxima) for r, uso in usos])
+        serie("anel_estrutura_itens", "gauge", "Itens em estruturas que crescem com o tráfego",
+              [(f',estrutura="{nome}"', tamanho) for nome, tamanho in tamanhos_estruturas().items()])
+        if tracemalloc.is_tracing():
+            serie("anel_memoria_rastreada_bytes", "gauge", "Memória alocada rastreada pelo tracemalloc", [("", tracemalloc.get_traced_memory()[0])])
+        cpu = Perfilador.cpu_das_threads()
+        serie("anel_thread_cpu_segundos_total", "counter", "Tempo de CPU por thread", [(f',thread="{nome}"', segundos) for nome, segundos in sorted(cpu.items())])
+        histograma("anel_tempo_volta_segundos", "Tempo entre chegadas do token", [("", self.tempo_volta)])
+        histograma("anel_latencia_entrega_segundos", "Da entrada na fila até o ACK", [("", self.latencia_entrega)])
+        histograma("anel_etapa_entrega_segundos", "Fila na origem, processamento no destino e retorno",
+                   [(f',etapa="{etapa}"', hist) for etapa, hist in self.etapas.items()])
+        histograma("anel_salto_segundos", "Latência de cada salto do quadro até o destino",
+                   [(f',de="{de}",para="{para}"', hist) for (de, para), hist in list(self.saltos.items())])
+        return "\n".join(linhas) + "\n"
+
+class ManipuladorMetricas(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404)
+            return
+        corpo = metricas.exportar().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, formato, *args):
+        pass  # Não polui o terminal do nó
+
+# Rastro binário de eventos (buffer circular pré-alocado, sem formatação de texto)
+# Registro: instante monotônico, tipo do evento, valor (sequência do token ou
+# TTL do quadro), origem e destino
+FORMATO_EVENTO = struct.Struct("<dBI16s16s")
+CABECALHO_RASTRO = struct.Struct("<8sIIQI")  # assinatura, tamanho do registro, quantidade, total, tamanho dos nomes
+EVENTOS_RASTRO = [
+    "TOKEN_RECEBIDO", "TOKEN_DESCARTADO", "TOKEN_ENVIADO", "TOKEN_REGENERADO",
+    "QUADRO_ENVIADO", "QUADRO_ENTREGUE", "QUADRO_CRC_INVALIDO", "QUADRO_REPASSADO",
+    "QUADRO_NA_PONTE", "QUADRO_DESCARTADO", "ACK_RECEBIDO", "NACK_RECEBIDO",
+]
+EVENTO = {nome: codigo for codigo, nome in enumerate(EVENTOS_RASTRO)}
+
+class RastroEventos:
+    def __init__(self, capacidade):
+        self.capacidade = capacidade
+        self.buffer = bytearray(FORMATO_EVENTO.size * capacidade)
+        self.contador = itertools.count()  # next() é atômico entre threads
+        self.registrados = 0
+
+    def registrar(self, tipo, valor=0, origem="", destino=""):
+        indice = next(self.contador)
+        FORMATO_EVENTO.pack_into(
+            self.buffer, (indice % self.capacidade) * FORMATO_EVENTO.size,
+            time.monotonic(), tipo, valor & 0xFFFFFFFF, origem.encode()[:16], destino.encode()[:16]
+        )
+        self.registrados = indice + 1
+
+    def despejar(self, caminho):
+        """
+        Grava os eventos em ordem cronológica em um arquivo mapeado em memória
+        Returns:
+            Quantidade de eventos gravados
+        """
+        total = self.registrados
+        quantidade = min(total, self.capacidade)
+        divisa = (total % self.capacidade) * FORMATO_EVENTO.size if total > self.capacidade else 0
+        nomes = ",".join(EVENTOS_RASTRO).encode()
+        inicio_eventos = CABECALHO_RASTRO.size + len(nomes)
+        tamanho = inicio_eventos + quantidade * FORMATO_EVENTO.size
+        with open(caminho, "w+b") as arquivo:
+            arquivo.truncate(tamanho)
+            with mmap.mmap(arquivo.fileno(), tamanho) as mapa:
+                mapa[:inicio_eventos] = CABECALHO_RASTRO.pack(b"RASTRO1", FORMATO_EVENTO.size, quantidade, total, len(nomes)) + nomes
+                antigos = self.buffer[divisa:quantidade * FORMATO_EVENTO.size]
+                mapa[inicio_eventos:inicio_eventos + len(antigos)] = antigos
+                mapa[inicio_eventos + len(antigos):] = self.buffer[:divisa]
+        return quantidade
+
+# Captura de datagramas (opcional, captura=arquivo): cada datagrama recebido é
+# gravado com o instante e o remetente, para ser reproduzido depois por
+# ferramentas/reproduzir_captura.py
+CABECALHO_CAPTURA = struct.Struct("<8sdH")  # assinatura, instante de parede do início, tamanho do apelido
+FORMATO_CAPTURA = struct.Struct("<Q?4sHH")  # ns desde o início, pela ponte, IPv4, porta, tamanho
+
+class CapturaDatagramas:
+    def __init__(self, caminho):
+        self.arquivo = open(caminho, "wb")
+        self.inicio = time.monotonic_ns()
+        self.quantidade = 0
+        nome = apelido.encode()
+        self.arquivo.write(CABECALHO_CAPTURA.pack(b"ANELCAP1", BASE_RELOGIO + self.inicio / 1e9, len(nome)) + nome)
+
+    def registrar(self, dados: bytes, endereco: tuple, pela_ponte: bool = False):
+        # Uma única escrita por registro: o arquivo bufferizado serializa as duas threads de recepção
+        self.arquivo.write(FORMATO_CAPTURA.pack(
+            time.monotonic_ns() - self.inicio, pela_ponte, socket.inet_aton(endereco[0]), endereco[1], len(dados)
+        ) + dados)
+        self.quantidade += 1
+
+    def fechar(self):
+        self.arquivo.close()
+        logging.info(f"[{apelido}] 📼 {self.quantidade} datagramas capturados")
+
+# Desvio do relógio do próximo nó, estimado por trocas estilo NTP de carona no token
+class RelogioVizinho:
+    def __init__(self, nome):
+        self.nome = nome
+        self.amostras = collections.deque(maxlen=8)  # (instante local, desvio, atraso)
+
+    def registrar(self, t1, t2, t3, t4):
+        """
+        t1: envio do token, t2: chegada no vizinho, t3: resposta do vizinho, t4: chegada da resposta
+        """
+        desvio = ((t2 - t1) + (t3 - t4)) / 2
+        atraso = (t4 - t1) - (t3 - t2)
+        self.amostras.append((t4, desvio, atraso))
+
+    def melhor_amostra(self):
+        # A amostra de menor atraso é a menos afetada por filas (filtro do NTP)
+        return min(self.amostras, key=lambda amostra: amostra[2])
+
+    def deriva(self):
+        """
+        Deriva relativa entre os relógios (s/s), pela regressão linear das amostras
+        """
+        if len(self.amostras) < 2:
+            return 0.0
+        media_t = sum(amostra[0] for amostra in self.amostras) / len(self.amostras)
+        media_d = sum(amostra[1] for amostra in self.amostras) / len(self.amostras)
+        variancia = sum((amostra[0] - media_t) ** 2 for amostra in self.amostras)
+        if not variancia:
+            return 0.0
+        return sum((t - media_t) * (d - media_d) for t, d, _ in self.amostras) / variancia
+
+    def desvio(self):
+        """
+        Relógio do vizinho menos o relógio local, corrigido pela deriva desde a melhor amostra
+        """
+        instante, desvio, _ = self.melhor_amostra()
+        return desvio + self.deriva() * (relogio_local() - instante)
+
+# Perfil por amostragem: a pilha de cada thread é lida em intervalos fixos e gravada no
+# formato "folded" (thread;função;função N), aceito pelo flamegraph.pl e pelo speedscope
+class Perfilador:
+    def __init__(self, intervalo):
+        self.intervalo = intervalo
+        self.ativo = threading.Event()
+        self.pedido = threading.Event()  # SIGUSR2: o gerenciador alterna o perfil fora do handler
+        self.pilhas = collections.Counter()
+        self.cpu_inicial = {}
+        self.inicio = 0
+        self.thread = None
+
+    @staticmethod
+    def cpu_das_threads() -> dict:
+        """
+        Tempo de CPU consumido por thread (nome -> segundos)
+        """
+        tempos = {}
+        for thread in threading.enumerate():
+            try:
+                tempos[thread.name] = time.clock_gettime(time.pthread_getcpuclockid(thread.ident))
+            except (AttributeError, OSError, TypeError):
+                pass  # Plataforma sem relógio por thread ou thread já encerrada
+        return tempos
+
+    def alternar(self):
+        """
+        Liga o perfil ou, se já estiver ligado, desliga e grava o resultado
+        """
+        if self.ativo.is_set():
+            return self.parar()
+        self.pilhas.clear()
+        self.cpu_inicial = self.cpu_das_threads()
+        self.inicio = time.monotonic()
+        self.ativo.set()
+        self.thread = threading.Thread(target=self.amostrar, name="perfilador", daemon=True)
+        self.thread.start()
+        logging.info(f"[{apelido}] 🔥 Perfil ligado (amostra a cada {self.intervalo * 1000:.0f} ms)")
+        return None
+
+    def amostrar(self):
+        proprio = threading.get_ident()
+        while self.ativo.is_set():
+            nomes = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, quadro in sys._current_frames().items():
+                if ident == proprio:
+                    continue
+                pilha = []
+                while quadro is not None:
+                    codigo = quadro.f_code
+                    pilha.append(f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{codigo.co_firstlineno})")
+                    quadro = quadro.f_back
+                pilha.append(nomes.get(ident, str(ident)))
+                self.pilhas[";".join(reversed(pilha))] += 1
+            time.sleep(self.intervalo)
+
+    def parar(self) -> str:
+        self.ativo.clear()
+        self.thread.join(timeout=1)
+        duracao = max(time.monotonic() - self.inicio, 1e-9)
+        cpu = self.cpu_das_threads()
+        caminho = f"perfil_{apelido}.folded"
+        with open(caminho, "w", encoding="utf-8") as arquivo:
+            for pilha, quantidade in sorted(self.pilhas.items()):
+                arquivo.write(f"{pilha} {quantidade}\n")
+        for nome in sorted(cpu, key=lambda nome: cpu[nome] - self.cpu_inicial.get(nome, 0.0), reverse=True):
+            usado = cpu[nome] - self.cpu_inicial.get(nome, 0.0)
+            logging.info(f"[{apelido}] 🔥 CPU {nome}: {usado:.3f}s ({usado / duracao:.1%} de {duracao:.1f}s)")
+        logging.info(f"[{apelido}] 🔥 Perfil com {sum(self.pilhas.values())} amostras salvo em {caminho}")
+        return caminho
+
+# Estado de cada anel lógico (o secundário só existe no modo de anel duplo)
+class Anel:
+    def __init__(self, indice, controle, fila):
+        self.indice = indice  # 0: primário, 1: secundário (contra-rotativo)
+        self.controle = controle
+        self.fila = fila
+        self.token_presente = False
+        self.direcao = indice  # Sentido em que o token segue (muda no wrap)
+        self.proximo_envio = 0  # Aguarda o retorno do último quadro até este instante
+        self.aguardando_resposta = False  # Quadro enviado com o token atual ainda sem ACK/NACK
+        self.repasses = []  # Quadros vindos do outro anel (ponte) aguardando o token
+        self.ultima_chegada = None  # Instante da última chegada do token (tempo de volta)
+        self.ultima_troca_relogio = 0  # Último envio de uma troca de relógio neste anel
+        self.usou_token = False  # Transmitiu algum quadro com o token atual
+        self.passagens = 0  # Passagens do token por este nó
+        self.usos = 0  # Passagens em que o token foi usado para transmitir
+        self.contribuicao = (0, 0, 0, 0, 0)  # Contadores já somados ao bloco e do token
 
 # Instância do controle de token
 controle_token = ControleToken()
+estatisticas_quadros = EstatisticasQuadros()
+rastro = RastroEventos(int(opcoes.get("rastro_eventos", 16384)))
+resumo = ResumoPeriodico(float(opcoes.get("intervalo_status", 30)))
+captura = CapturaDatagramas(opcoes["captura"]) if "captura" in opcoes else None
+if captura is not None:
+    atexit.register(captura.fechar)
+metricas = Metricas()
+snapshot_memoria = None  # Último snapshot do tracemalloc (comparar_memoria)
+perfilador = Perfilador(float(opcoes.get("perfil_intervalo_ms", 5)) / 1000)
+instante_enfileirado = {}  # (destino, mensagem) -> instante monotônico em que entrou na fila
+relogios = {}  # (ip, porta) do próximo nó -> RelogioVizinho
+# Desvio do relógio local em relação ao do gerador do token (referência do anel)
+desvio_anel = 0.0 if gerar_token else None
+ultimo_bloco = None  # (instante, totais) do bloco e visto na última volta
+estatisticas_rede = {}  # Vazão e utilização do anel calculadas na última volta
+aneis = [Anel(0, controle_token, fila_mensagens)]
+if modo_anel == "duplo":
+    aneis.append(Anel(1, ControleToken(), []))
+aneis_locais = list(aneis)  # Anéis do nó, sem o anel da ponte
+
+# O anel da ponte é o último da lista
+anel_ponte = None
+lado_do_no = {}  # Na ponte: nome -> "local" ou "ponte", conforme o anel que alcança o nó
+updates_pendentes = {}  # Na ponte: (nome, pela_ponte) -> último UPDATE recebido antes de a ROTA revelar o lado do nó
+if porta_local_ponte is not None:
+    anel_ponte = Anel(len(aneis), ControleToken(), [])
+    aneis.append(anel_ponte)
+
+# Monitoramento dos vizinhos no anel duplo
+ultimo_pong = {}  # (ip, porta) -> instante do último PONG recebido
+enlaces_caidos = set()  # Vizinhos cujo enlace foi considerado caído
 
 # Configuração de rede
 ip_local = "127.0.0.1"  # Usando localhost para teste
-porta_local = 6002  # Porta fixa para o Computador3
+porta_local = int(opcoes.get("porta", 6002))  # Porta do Computador3 (a opção porta=N a substitui)
 
 # Mapeamento de apelidos para IPs e portas
 mapeamento_apelidos = {
     "TODOS": ("127.0.0.1", porta_local)  # Usa a porta local do nó
 }
 
+# Tempos de um lock em um ponto de chamada (função:linha)
+class UsoLock:
+    def __init__(self):
+        self.aquisicoes = 0
+        self.contendidas = 0  # Aquisições que encontraram o lock ocupado
+        self.espera = 0.0
+        self.espera_maxima = 0.0
+        self.posse = 0.0
+        self.posse_maxima = 0.0
+
+# Lock que mede espera, posse e disputa por ponto de chamada; os contadores
+# são atualizados com o próprio lock adquirido, então dispensam outro lock
+class LockInstrumentado:
+    def __init__(self, nome):
+        self.nome = nome
+        self.lock = threading.Lock()
+        self.usos = {}  # "função:linha" -> UsoLock
+        self.adquirido_em = 0.0
+        self.uso_atual = None
+
+    def __enter__(self):
+        quadro = sys._getframe(1)
+        local = f"{quadro.f_code.co_name}:{quadro.f_lineno}"
+        inicio = time.perf_counter()
+        contendido = not self.lock.acquire(blocking=False)
+        if contendido:
+            self.lock.acquire()
+        self.adquirido_em = time.perf_counter()
+        uso = self.usos.get(local)
+        if uso is None:
+            uso = self.usos[local] = UsoLock()
+        uso.aquisicoes += 1
+        uso.contendidas += contendido
+        espera = self.adquirido_em - inicio
+        uso.espera += espera
+        uso.espera_maxima = max(uso.espera_maxima, espera)
+        self.uso_atual = uso
+        return self
+
+    def __exit__(self, *_):
+        uso = self.uso_atual
+        posse = time.perf_counter() - self.adquirido_em
+        uso.posse += posse
+        uso.posse_maxima = max(uso.posse_maxima, posse)
+        self.lock.release()
+
 # Locks para sincronização entre threads
-mutex = threading.Lock()  # Protege a fila de mensagens
-lock_token = threading.Lock()  # Protege o controle do token
+mutex = LockInstrumentado("mutex")  # Protege a fila de mensagens
+lock_token = LockInstrumentado("lock_token")  # Protege o controle do token
 
 # ================================
 # FUNÇÕES AUXILIARES
@@ -276,6 +952,89 @@ def inserir_erro(mensagem: str, probabilidade: float = 0.2) -> str:
         return mensagem[:posicao] + chr((ord(mensagem[posicao]) + 1) % 128) + mensagem[posicao + 1:]
     return mensagem
 
+def montar_pacote(controle: str, origem: str, destino: str, crc, texto: str, extensoes: dict = None) -> str:
+    """
+    Monta um pacote de dados no formato 7777:controle;origem;destino;crc;extensoes;mensagem
+    Args:
+        extensoes: Campos opcionais do cabeçalho (ex: ttl), serializados como chave=valor
+    Returns:
+        Pacote pronto para envio
+    """
+    return f"7777:{controle};{origem};{destino};{crc};{montar_extensoes(extensoes)};{texto}"
+
+def ler_pacote(mensagem: str) -> tuple:
+    """
+    Decodifica um pacote de dados montado por montar_pacote
+    Returns:
+        Tupla (controle, origem, destino, crc, extensoes, texto)
+    Raises:
+        ValueError: Se o cabeçalho estiver corrompido
+    """
+    _, conteudo = mensagem.split(":", 1)
+    controle, origem, destino, crc, campos, texto = conteudo.split(";", 5)
+    return controle, origem, destino, crc, ler_extensoes(campos), texto
+
+def montar_extensoes(extensoes: dict) -> str:
+    """
+    Serializa campos opcionais de pacotes e tokens como chave=valor separados por vírgula
+    """
+    return ",".join(f"{chave}={valor}" for chave, valor in (extensoes or {}).items())
+
+def ler_extensoes(campos: str) -> dict:
+    """
+    Decodifica campos opcionais serializados por montar_extensoes
+    """
+    return dict(campo.split("=", 1) for campo in campos.split(",") if campo)
+
+def relogio_local() -> float:
+    """
+    Instante monotônico alinhado ao relógio de parede da partida (em segundos)
+    """
+    return time.monotonic() + BASE_RELOGIO
+
+def relogio_anel() -> float:
+    """
+    Instante no relógio de referência do anel (o do gerador do token), quando o desvio é conhecido
+    """
+    return relogio_local() - (desvio_anel or 0.0)
+
+def marca_salto(nome: str) -> str:
+    """
+    Marca de um salto na extensão t: nome@instante no relógio do anel em microssegundos
+    """
+    return f"{nome}@{int(relogio_anel() * 1_000_000)}"
+
+def ler_trajeto(trajeto: str) -> list:
+    """
+    Decodifica a extensão t em uma lista de (nome, instante em segundos)
+    """
+    marcas = []
+    for marca in trajeto.split("|"):
+        nome, instante = marca.rsplit("@", 1)
+        marcas.append((nome, int(instante) / 1_000_000))
+    return marcas
+
+def calcular_ttl(conhecidos: int = None) -> int:
+    """
+    TTL inicial de um quadro: duas voltas no anel conhecido (conhecidos nós;
+    os nos_ativos se omitido), com um mínimo para anéis ainda em descoberta
+    """
+    if conhecidos is None:
+        conhecidos = len(nos_ativos)
+    return max(TTL_MINIMO, 2 * conhecidos)
+
+def marcar_no_monitor(extensoes: dict) -> bool:
+    """
+    Passagem de um quadro em trânsito pelo monitor (o gerador do anel): marca o
+    quadro na primeira passagem
+    Returns:
+        True se já estava marcado (órfão: a origem não o retirou do anel)
+    """
+    if extensoes.get("m") == "1":
+        return True
+    extensoes["m"] = "1"
+    return False
+
 def enviar_udp(ip: str, porta: int, mensagem: str):
     """
     Envia mensagem UDP para o destino especificado
@@ -288,9 +1047,263 @@ def enviar_udp(ip: str, porta: int, mensagem: str):
         socket_udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         socket_udp.sendto(mensagem.encode(), (ip, porta))
         socket_udp.close()
+        metricas.incrementar("datagramas_enviados")
     except Exception as erro:
         print(f"[ERRO] Falha ao enviar mensagem: {erro}")
 
+def proximo_salto(direcao: int = 0) -> tuple:
+    """
+    Próximo salto no sentido indicado (0: anel primário, 1: anel secundário,
+    em direção ao nó anterior). No anel duplo, se o enlace nesse sentido
+    estiver caído o quadro volta pelo outro sentido (wrap)
+    Returns:
+        Tupla (ip, porta, sentido efetivo)
+    """
+    if modo_anel == "simples":
+        return ip_destino, porta_destino, 0
+    vizinhos = ((ip_destino, porta_destino), (ip_anterior, porta_anterior))
+    if vizinhos[direcao] in enlaces_caidos and vizinhos[1 - direcao] not in enlaces_caidos:
+        direcao = 1 - direcao
+    ip, porta = vizinhos[direcao]
+    return ip, porta, direcao
+
+def dobrar_quadro(extensoes: dict):
+    """
+    Marca um quadro que volta pelo outro sentido (wrap) com a extensão w (quantas
+    vezes dobrou). Na primeira dobra a marca do monitor é limpa, pois o quadro passa
+    de novo pelos mesmos nós no caminho de volta; na segunda ele já percorreu o anel
+    dobrado inteiro e a marca fica, para o monitor descartá-lo na próxima passagem
+    """
+    extensoes["w"] = int(extensoes.get("w", 0)) + 1
+    if extensoes["w"] == 1:
+        extensoes.pop("m", None)
+
+def proximo_no_anel(pela_ponte: bool = False) -> tuple:
+    """
+    Próximo nó no anel principal ou, na ponte, no segundo anel
+    """
+    if pela_ponte:
+        return ip_ponte, porta_ponte
+    return ip_destino, porta_destino
+
+def salto_do_anel(anel) -> tuple:
+    """
+    Próximo salto do token e dos quadros de um anel
+    Returns:
+        Tupla (ip, porta, sentido efetivo)
+    """
+    if anel is anel_ponte:
+        return ip_ponte, porta_ponte, 0
+    return proximo_salto(anel.direcao)
+
+def gerador_do_anel(anel) -> bool:
+    """
+    Indica se este nó gera (e monitora) o token do anel
+    """
+    return ponte_gerador if anel is anel_ponte else gerar_token
+
+def verificar_enlaces():
+    """
+    Envia PING aos dois vizinhos do anel duplo e atualiza os enlaces caídos
+    conforme o último PONG recebido de cada um
+    """
+    agora = time.monotonic()
+    for vizinho in ((ip_destino, porta_destino), (ip_anterior, porta_anterior)):
+        enviar_udp(*vizinho, f"PING:{ip_local}:{porta_local}")
+        ultimo = ultimo_pong.setdefault(vizinho, agora)
+        if agora - ultimo > LIMITE_ENLACE:
+            if vizinho not in enlaces_caidos:
+                enlaces_caidos.add(vizinho)
+                logging.warning(f"[{apelido}] 🔀 Enlace com {vizinho[0]}:{vizinho[1]} caiu, dobrando o anel (wrap)")
+        elif vizinho in enlaces_caidos:
+            enlaces_caidos.discard(vizinho)
+            logging.info(f"[{apelido}] 🔗 Enlace com {vizinho[0]}:{vizinho[1]} restabelecido")
+
+def passar_token(anel):
+    """
+    Repassa o token do anel ao próximo salto no sentido em que ele circula
+    Args:
+        anel: Anel cujo token será repassado
+    """
+    ip, porta, direcao = salto_do_anel(anel)
+    token = anel.controle.token
+    if modo_anel != "simples" and anel is not anel_ponte:
+        token.extensoes["a"] = anel.indice
+        token.extensoes["d"] = direcao
+    logging.info("[Token] 📤 Enviando token de %s para %s:%s", apelido, ip, porta, extra=evento("TOKEN"))
+    rastro.registrar(EVENTO["TOKEN_ENVIADO"], token.sequencia, apelido, f"{ip}:{porta}")
+    if estatisticas_no_token and anel is aneis[0]:
+        acrescentar_estatisticas(token, anel)
+    # Troca de relógio de carona no token: r pede resposta ao próximo nó, c informa o desvio dele
+    token.extensoes.pop("r", None)
+    token.extensoes.pop("c", None)
+    vizinho = relogios.get((ip, porta))
+    if desvio_anel is not None and vizinho is not None:
+        token.extensoes["c"] = f"{desvio_anel + vizinho.desvio():.6f}"
+    if time.monotonic() - anel.ultima_troca_relogio >= INTERVALO_RELOGIO:
+        anel.ultima_troca_relogio = time.monotonic()
+        porta_propria = porta_local_ponte if anel is anel_ponte else porta_local
+        token.extensoes["r"] = f"{relogio_local():.6f}/{ip_local}/{porta_propria}"
+    enviar_udp(ip, porta, token.to_string())
+    anel.token_presente = False
+    anel.aguardando_resposta = False
+    anel.controle.atualizar_tempo()
+
+def acrescentar_estatisticas(token, anel):
+    """
+    Soma ao bloco e do token (enviados/entregues/retransmitidos/usos/passagens, totais do anel)
+    o que este nó fez desde a última vez que passou o token
+    """
+    anel.passagens += 1
+    if anel.usou_token:
+        anel.usos += 1
+        anel.usou_token = False
+    contadores = (metricas.quadros_enviados, metricas.entregas, metricas.retransmissoes, anel.usos, anel.passagens)
+    try:
+        totais = [int(valor) for valor in token.extensoes.get("e", "0/0/0/0/0").split("/")]
+    except ValueError:
+        totais = [0] * len(contadores)
+    token.extensoes["e"] = "/".join(
+        str(total + atual - anterior) for total, atual, anterior in zip(totais, contadores, anel.contribuicao)
+    )
+    anel.contribuicao = contadores
+
+def observar_estatisticas(anel, bloco: str):
+    """
+    Guarda o bloco e recebido para a próxima passagem e calcula a vazão e a
+    utilização do anel pela diferença em relação ao bloco da última volta
+    """
+    global ultimo_bloco
+    agora = time.monotonic()
+    try:
+        totais = [int(valor) for valor in bloco.split("/")]
+    except ValueError:
+        return
+    if ultimo_bloco is not None and totais == ultimo_bloco[1]:
+        return  # Token duplicado
+    anel.controle.token.extensoes["e"] = bloco
+    anterior, ultimo_bloco = ultimo_bloco, (agora, totais)
+    if anterior is None:
+        return
+    intervalo = agora - anterior[0]
+    enviados, entregues, retransmitidos, usos, passagens = (atual - antes for atual, antes in zip(totais, anterior[1]))
+    # Totais menores que na volta anterior: o token foi regenerado e o bloco recomeçou
+    if intervalo <= 0 or min(enviados, entregues, retransmitidos, usos, passagens) < 0:
+        return
+    estatisticas_rede.update({
+        "quadros_por_segundo": enviados / intervalo,
+        "entregas_por_segundo": entregues / intervalo,
+        "taxa_retransmissao": retransmitidos / enviados if enviados else 0.0,
+        "utilizacao": usos / passagens if passagens else 0.0,
+    })
+
+def trocar_relogio(extensoes: dict, chegada: float, pela_ponte: bool):
+    """
+    Trata os campos de relógio que vieram de carona no token
+    Args:
+        extensoes: r (instante de envio/ip/porta de quem passou o token) e c (desvio deste nó)
+        chegada: Instante local de chegada do token
+    """
+    global desvio_anel
+    try:
+        if "r" in extensoes:
+            t1, ip, porta = extensoes["r"].split("/")
+            porta_resposta = porta_local_ponte if pela_ponte else porta_local
+            enviar_udp(ip, int(porta), f"RELOGIO:{apelido}:{ip_local}:{porta_resposta}:{t1}:{chegada:.6f}:{relogio_local():.6f}")
+        # A referência é o gerador; na ponte, o desvio vem só do anel local
+        if "c" in extensoes and not gerar_token and not pela_ponte:
+            desvio_anel = float(extensoes["c"])
+    except ValueError:
+        logging.warning(f"[{apelido}] Campos de relógio inválidos no token: {extensoes}")
+
+def despachar_repasses(anel):
+    """
+    Envia os quadros vindos do outro anel (ponte) usando o token deste anel
+    """
+    while anel.repasses:
+        ip, porta, _ = salto_do_anel(anel)
+        enviar_udp(ip, porta, anel.repasses.pop(0))
+
+def liberar_updates_pendentes():
+    """
+    Na ponte, após uma ROTA completar a volta: repassa os UPDATEs que aguardavam
+    o lado do nó no anel em que chegaram, se o nó é desse anel, e descarta os demais
+    """
+    for (nome, pela_ponte), mensagem in list(updates_pendentes.items()):
+        lado = lado_do_no.get(nome)
+        if lado is None:
+            continue
+        del updates_pendentes[(nome, pela_ponte)]
+        if lado == ("ponte" if pela_ponte else "local"):
+            enviar_udp(*proximo_no_anel(pela_ponte), mensagem)
+
+def tamanhos_estruturas() -> dict:
+    """
+    Quantidade de itens das estruturas que crescem com o tráfego e com os nós da rede
+    """
+    tamanhos = {
+        "mapeamento_apelidos": len(mapeamento_apelidos),
+        "nos_ativos": len(nos_ativos),
+        "instante_enfileirado": len(instante_enfileirado),
+        "relogios": len(relogios),
+        "lado_do_no": len(lado_do_no),
+        "updates_pendentes": len(updates_pendentes),
+        "ultimo_pong": len(ultimo_pong),
+        "saltos_metricas": len(metricas.saltos),
+        "fila_logs": fila_logs.qsize(),
+        "pilhas_perfil": len(perfilador.pilhas),
+        "locais_locks": len(mutex.usos) + len(lock_token.usos),
+    }
+    for anel in aneis:
+        tamanhos[f"fila_anel{anel.indice}"] = len(anel.fila)
+        tamanhos[f"tokens_recebidos_anel{anel.indice}"] = len(anel.controle.tokens_recebidos)
+        tamanhos[f"repasses_anel{anel.indice}"] = len(anel.repasses)
+    return tamanhos
+
+def snapshot_filtrado():
+    """
+    Snapshot do tracemalloc sem as alocações do próprio tracemalloc
+    """
+    return tracemalloc.take_snapshot().filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),))
+
+def comparar_memoria(quantidade: int = 10) -> list:
+    """
+    Na primeira chamada liga o tracemalloc; nas seguintes tira um snapshot, grava em
+    memoria_<apelido>.snap e compara com o anterior (maiores crescimentos por linha)
+    Returns:
+        Linhas do relatório
+    """
+    global snapshot_memoria
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(int(opcoes.get("memoria_quadros", 1)))
+        snapshot_memoria = snapshot_filtrado()
+        logging.info(f"[{apelido}] 🧠 tracemalloc ligado; o próximo comando mostra o crescimento desde agora")
+        return ["tracemalloc ligado; repita o comando para ver o crescimento"]
+    atual = snapshot_filtrado()
+    caminho = f"memoria_{apelido}.snap"
+    atual.dump(caminho)
+    usada, pico = tracemalloc.get_traced_memory()
+    linhas = [f"Memória rastreada: {usada / 1024:.1f} KiB (pico {pico / 1024:.1f} KiB), snapshot em {caminho}"]
+    for diferenca in atual.compare_to(snapshot_memoria, "lineno")[:quantidade]:
+        linhas.append(str(diferenca))
+    snapshot_memoria = atual
+    for linha in linhas:
+        logging.info(f"[{apelido}] 🧠 {linha}")
+    return linhas
+
+# SIGUSR1: o gerenciador grava o rastro fora do handler do sinal
+pedido_rastro = threading.Event()
+
+def salvar_rastro(motivo: str = "sob demanda") -> str:
+    """
+    Grava o rastro binário de eventos em rastro_<apelido>.bin
+    Use ferramentas/decodificar_rastro.py para ler o arquivo
+    """
+    caminho = f"rastro_{apelido}.bin"
+    quantidade = rastro.despejar(caminho)
+    logging.info(f"[{apelido}] 💾 Rastro com {quantidade} eventos salvo em {caminho} ({motivo})")
+    return caminho
+
 def registrar_log(mensagem: str, mostrar_terminal: bool = False):
     """
     Registra mensagem com timestamp
@@ -346,6 +1359,74 @@ def enviar_lista_nos(destino: str):
                 enviar_udp(*mapeamento_apelidos[destino], mensagem)
                 logging.info(f"[{apelido}] Enviando informação do nó {no} para {destino}")
 
+def remover_no(nome: str):
+    """
+    Remove do mapeamento um nó que deixou a rede
+    Args:
+        nome: Nome do nó
+    """
+    nos_ativos.discard(nome)
+    if nome != "TODOS":
+        mapeamento_apelidos.pop(nome, None)
+
+def anunciar_saida():
+    """
+    Anuncia a saída do nó para todos os nós conhecidos, informando o próximo
+    salto para que o antecessor religue o anel sem esperar o timeout do token
+    """
+    mensagem = f"LEAVE:{apelido}:{ip_local}:{porta_local}:{ip_destino}:{porta_destino}:{'1' if gerar_token else '0'}"
+    if modo_anel != "simples":
+        mensagem += f":{ip_anterior}:{porta_anterior}"
+    destinos = {(ip_destino, porta_destino)}
+    for no in nos_ativos:
+        if no != apelido:
+            destinos.add(mapeamento_apelidos[no])
+    for ip, porta in destinos:
+        enviar_udp(ip, porta, mensagem)
+    # Na ponte, o antecessor no segundo anel aponta para a porta da ponte
+    if anel_ponte is not None:
+        mensagem_ponte = f"LEAVE:{apelido}:{ip_local}:{porta_local_ponte}:{ip_ponte}:{porta_ponte}:{'1' if ponte_gerador else '0'}"
+        for ip, porta in destinos | {(ip_ponte, porta_ponte)}:
+            enviar_udp(ip, porta, mensagem_ponte)
+    logging.info(f"[{apelido}] 🚪 Saída anunciada para {len(destinos)} nós")
+
+def concluir_saida():
+    """
+    Anuncia a saída e repassa os tokens presentes ao próximo nó
+    Deve ser chamada com as filas vazias (ou após o limite de espera)
+    """
+    if saida_concluida.is_set():
+        return
+    anunciar_saida()
+    for anel in aneis:
+        if anel.token_presente:
+            logging.info(f"[Token] 📤 Repassando token do anel {anel.indice} antes de sair")
+            passar_token(anel)
+    saida_concluida.set()
+
+def sair_da_rede():
+    """
+    Saída graciosa: para de aceitar mensagens, aguarda a fila esvaziar e o
+    token chegar, repassa o token e anuncia a saída antes de encerrar
+    """
+    global saindo
+    with mutex:
+        saindo = True
+        pendentes = sum(len(anel.fila) for anel in aneis)
+    logging.info(f"[{apelido}] 🚪 Iniciando saída graciosa ({pendentes} mensagens pendentes)")
+    print(f"\nAguardando envio de {pendentes} mensagens pendentes e o token...")
+
+    # Cada mensagem pendente pode precisar de todas as tentativas
+    limite = controle_token.tempo_maximo + pendentes * (MAX_TENTATIVAS + 1) * tempo_token
+    if not saida_concluida.wait(limite):
+        with mutex:
+            for anel in aneis:
+                if anel.fila:
+                    logging.warning(f"[{apelido}] ⚠️ Saída forçada: {len(anel.fila)} mensagens descartadas no anel {anel.indice}")
+                    anel.fila.clear()
+            logging.warning(f"[{apelido}] ⚠️ Token não chegou em {limite:.0f}s, anunciando saída mesmo assim")
+            concluir_saida()
+
 def mostrar_status_rede():
     """
     Mostra o status atual da rede
@@ -357,6 +1438,28 @@ def mostrar_status_rede():
     for no in sorted(nos_ativos):
         ip, porta = mapeamento_apelidos[no]
         print(f"- {no}: {ip}:{porta}")
+    print("\nQuadros descartados:")
+    print(f"- TTL esgotado: {estatisticas_quadros.descartados_ttl}")
+    print(f"- Órfãos (monitor): {estatisticas_quadros.descartados_orfaos}")
+    print(f"- Malformados: {estatisticas_quadros.descartados_malformados}")
+    print("\nRelógios:")
+    for relogio in list(relogios.values()):
+        instante, _, atraso = relogio.melhor_amostra()
+        print(f"- {relogio.nome}: desvio {relogio.desvio() * 1000:+.3f} ms | ida e volta {atraso * 1000:.3f} ms | deriva {relogio.deriva() * 1e6:+.1f} ppm")
+    if desvio_anel is not None:
+        print(f"- Desvio em relação ao gerador: {desvio_anel * 1000:+.3f} ms")
+    print("\nEstruturas (itens):")
+    print("- " + " | ".join(f"{nome}: {tamanho}" for nome, tamanho in tamanhos_estruturas().items()))
+    print("\nLocks (espera e posse em ms, média/máx):")
+    for lock in (mutex, lock_token):
+        for local, uso in sorted(list(lock.usos.items())):
+            print(f"- {lock.nome} em {local}: {uso.aquisicoes} aquisições, {uso.contendidas} disputadas | "
+                  f"espera {1000 * uso.espera / uso.aquisicoes:.3f}/{1000 * uso.espera_maxima:.3f} | "
+                  f"posse {1000 * uso.posse / uso.aquisicoes:.3f}/{1000 * uso.posse_maxima:.3f}")
+    if estatisticas_rede:
+        print("\nAnel (última volta do token):")
+        print(f"- Vazão: {estatisticas_rede['quadros_por_segundo']:.2f} quadros/s | {estatisticas_rede['entregas_por_segundo']:.2f} entregas/s")
+        print(f"- Retransmissões: {estatisticas_rede['taxa_retransmissao']:.1%} | Utilização do token: {estatisticas_rede['utilizacao']:.1%}")
     print("\n" + "="*50)
     logging.info(f"[{apelido}] Status da rede: {len(nos_ativos)} nós ativos")
 
@@ -368,6 +1471,12 @@ def mostrar_menu():
     print(f"\nNó: {apelido}")
     print(f"IP Local: {ip_local}:{porta_local}")
     print(f"Próximo nó: {ip_destino}:{porta_destino}")
+    if modo_anel != "simples":
+        print(f"Nó anterior: {ip_anterior}:{porta_anterior} (anel {modo_anel})")
+    if anel_ponte is not None:
+        print(f"Ponte: {ip_local}:{porta_local_ponte} -> {ip_ponte}:{porta_ponte}")
+    if entrega_direta:
+        print("Entrega: direta (token controla o acesso)")
     print(f"Gerador de token: {'Sim' if gerar_token else 'Não'}")
     print("\n" + "="*50)
     print("\nOpções:")
@@ -375,7 +1484,10 @@ def mostrar_menu():
     print("2. Ver fila atual")
     print("3. Ver logs")
     print("4. Ver status da rede")
-    print("5. Sair")
+    print("5. Sair (saída graciosa)")
+    print("6. Salvar rastro de eventos")
+    print(f"7. {'Desligar' if perfilador.ativo.is_set() else 'Ligar'} perfil de CPU")
+    print("8. Comparar uso de memória")
     print("\n" + "="*50)
 
 def interface_usuario():
@@ -395,7 +1507,18 @@ def interface_usuario():
             elif opcao == "5":
                 logging.info("Encerrando aplicação...")
                 print("\nEncerrando aplicação...")
+                sair_da_rede()
                 break
+            elif opcao == "6":
+                print(f"\nRastro salvo em {salvar_rastro()}")
+                input("\nPressione Enter para continuar...")
+            elif opcao == "7":
+                caminho = perfilador.alternar()
+                print(f"\nPerfil salvo em {caminho} (CPU por thread no log)" if caminho else "\nPerfil ligado")
+                input("\nPressione Enter para continuar...")
+            elif opcao == "8":
+                print("\n" + "\n".join(comparar_memoria()))
+                input("\nPressione Enter para continuar...")
             else:
                 print("\nOpção inválida!")
                 input("\nPressione Enter para continuar...")
@@ -410,33 +1533,87 @@ def verificar_destino_ativo(destino: str) -> bool:
     """
     return destino in nos_ativos or destino == "TODOS"
 
-def processar_resposta_mensagem(controle: str, destino: str, texto: str):
+def registrar_trajeto(trajeto: str, anel):
+    """
+    Decompõe a latência de entrega pela extensão t devolvida no ACK/NACK:
+    fila na origem, cada salto até o destino, processamento no destino e retorno.
+    As marcas são: envio na origem, chegada em cada nó, chegada e resposta no destino
+    """
+    agora = relogio_anel()
+    try:
+        marcas = ler_trajeto(trajeto)
+    except ValueError:
+        return
+    if len(marcas) < 3 or marcas[0][0] != apelido:
+        return
+    with mutex:
+        enfileirada = instante_enfileirado.get(anel.fila[0][:2]) if anel.fila else None
+    partes = []
+    if enfileirada is not None:
+        enfileirada = agora - (time.monotonic() - enfileirada)  # Para o relógio do anel
+        metricas.etapas["fila"].observar(marcas[0][1] - enfileirada)
+        partes.append(f"fila {1000 * (marcas[0][1] - enfileirada):.2f}")
+    for (de, inicio), (para, fim) in zip(marcas[:-2], marcas[1:-1]):
+        metricas.observar_salto(de, para, fim - inicio)
+        partes.append(f"{de}→{para} {1000 * (fim - inicio):.2f}")
+    metricas.etapas["destino"].observar(marcas[-1][1] - marcas[-2][1])
+    metricas.etapas["retorno"].observar(agora - marcas[-1][1])
+    partes.append(f"destino {1000 * (marcas[-1][1] - marcas[-2][1]):.2f}")
+    partes.append(f"retorno {1000 * (agora - marcas[-1][1]):.2f}")
+    logging.info(f"[{apelido}] 🧭 Trajeto (ms): {' | '.join(partes)}")
+
+def processar_resposta_mensagem(controle: str, destino: str, texto: str, anel=None, crc=None) -> bool:
     """
     Processa a resposta de uma mensagem enviada
+    Args:
+        anel: Anel por onde a mensagem foi enviada (primário se omitido)
+        crc: CRC do texto original, devolvido na resposta; se não for o da mensagem
+             à frente da fila, a resposta é de uma cópia já tratada e é ignorada
+    Returns:
+        False se a resposta foi ignorada
     """
+    fila = (anel or aneis[0]).fila
     with mutex:
-        if not fila_mensagens:
-            return
+        if not fila:
+            return False
 
-        destino_atual, texto_atual, reenviado, tentativas = fila_mensagens[0]
+        destino_atual, texto_atual, reenviado, tentativas = fila[0]
+        if crc is not None and int(crc) != calcular_crc(texto_atual):
+            logging.info(f"[{apelido}] Resposta {controle} de {destino} para uma cópia já tratada, ignorada")
+            return False
         
         if controle == "ACK":
             mostrar_estado_mensagem('ENTREGUE', f"Mensagem entregue com sucesso para {destino}")
-            logging.info(f"[{apelido}] Mensagem entregue com sucesso para {destino}")
-            fila_mensagens.pop(0)
+            logging.info(f"[{apelido}] Mensagem entregue com sucesso para {destino}", extra=evento("ACK", destino))
+            fila.pop(0)
+            metricas.incrementar("entregas")
+            enfileirada = instante_enfileirado.pop((destino_atual, texto_atual), None)
+            if enfileirada is not None:
+                metricas.latencia_entrega.observar(time.monotonic() - enfileirada)
+                if not interface_ativa:
+                    print(f"@ENTREGUE {destino} {time.monotonic() - enfileirada:.6f} {tentativas} {texto_atual}", flush=True)
         elif controle == "NACK":
             if tentativas < MAX_TENTATIVAS:
                 mostrar_estado_mensagem('RETRANSMITINDO', f"Retransmitindo mensagem (tentativa {tentativas + 1})")
-                logging.warning(f"[{apelido}] Erro de CRC detectado. Retransmitindo...")
-                fila_mensagens[0] = (destino_atual, texto_atual, True, tentativas + 1)
+                logging.warning(f"[{apelido}] Erro de CRC detectado. Retransmitindo...", extra=evento("NACK", destino))
+                fila[0] = (destino_atual, texto_atual, True, tentativas + 1)
+                resumo.incrementar("retransmissoes")
+                metricas.incrementar("retransmissoes")
             else:
                 mostrar_estado_mensagem('DESCARTADA', "Máximo de tentativas atingido")
-                logging.error(f"[{apelido}] Mensagem descartada após {MAX_TENTATIVAS} tentativas")
-                fila_mensagens.pop(0)
+                logging.error(f"[{apelido}] Mensagem descartada após {MAX_TENTATIVAS} tentativas", extra=evento("DESCARTE", destino))
+                fila.pop(0)
+                instante_enfileirado.pop((destino_atual, texto_atual), None)
+                if not interface_ativa:
+                    print(f"@DESCARTADA {destino} tentativas {texto_atual}", flush=True)
         elif controle == "naoexiste":
             mostrar_estado_mensagem('NAO_EXISTE', f"Destino {destino} não existe na rede")
-            logging.warning(f"[{apelido}] Destino {destino} não existe na rede")
-            fila_mensagens.pop(0)
+            logging.warning(f"[{apelido}] Destino {destino} não existe na rede", extra=evento("DESCARTE", destino))
+            fila.pop(0)
+            instante_enfileirado.pop((destino_atual, texto_atual), None)
+            if not interface_ativa:
+                print(f"@DESCARTADA {destino} naoexiste {texto_atual}", flush=True)
+    return True
 
 def mostrar_estado_mensagem(estado: str, detalhes: str = ""):
     """
@@ -462,41 +1639,163 @@ def enviar_mensagem_usuario():
     print("Mensagem: ", end="")
     mensagem = input().strip()
     
-    if len(fila_mensagens) >= 10:
-        print("\nErro: Fila cheia! Máximo de 10 mensagens atingido.")
+    if saindo:
+        print("\nErro: Nó está saindo da rede, novas mensagens não são aceitas.")
         input("\nPressione Enter para continuar...")
         return
     
+    if not enfileirar_mensagem(destino, mensagem):
+        print(f"\nErro: Fila cheia! Máximo de {TAMANHO_FILA} mensagens atingido.")
+        input("\nPressione Enter para continuar...")
+        return
+    print(f"\nMensagem adicionada à fila.")
+    input("\nPressione Enter para continuar...")
+
+def enfileirar_mensagem(destino: str, mensagem: str) -> bool:
+    """
+    Coloca a mensagem na fila do anel adequado
+    Returns:
+        False se a fila estiver cheia (máximo de TAMANHO_FILA mensagens)
+    """
     timestamp = datetime.now().strftime("%H:%M:%S")
     mensagem_completa = f"{timestamp} | {apelido} -> {destino}: {mensagem}"
     with mutex:
-        fila_mensagens.append((destino, mensagem_completa, False, 0))
-        logging.info(f"[Fila] Mensagem adicionada: {mensagem_completa}")
-        print(f"\nMensagem adicionada à fila.")
-        input("\nPressione Enter para continuar...")
+        if sum(len(anel.fila) for anel in aneis) >= TAMANHO_FILA:
+            return False
+        # Na ponte, destinos do segundo anel seguem pelo anel da ponte; no anel
+        # duplo a mensagem segue pelo anel com a fila mais curta
+        if anel_ponte is not None and lado_do_no.get(destino) == "ponte":
+            anel = anel_ponte
+        else:
+            anel = min(aneis_locais, key=lambda anel: len(anel.fila))
+        anel.fila.append((destino, mensagem_completa, False, 0))
+        instante_enfileirado[(destino, mensagem_completa)] = time.monotonic()
+    logging.info(f"[Fila] Mensagem adicionada: {mensagem_completa}")
+    return True
+
+def entrada_sem_interface():
+    """
+    Modo sem interface: lê "destino mensagem" da entrada padrão e enfileira,
+    esperando vaga quando a fila está cheia; "SAIR" faz a saída graciosa
+    """
+    for linha in sys.stdin:
+        linha = linha.rstrip("\n")
+        if linha == "SAIR":
+            sair_da_rede()
+            return
+        destino, _, mensagem = linha.partition(" ")
+        if not destino or saindo:
+            continue
+        while not enfileirar_mensagem(destino, mensagem):
+            time.sleep(0.01)
 
 def ver_fila():
     print("\n" + "="*50)
     print("FILA DE MENSAGENS".center(50))
     print("="*50)
-    if not fila_mensagens:
+    if not any(anel.fila for anel in aneis):
         print("\nFila vazia")
     else:
         print("\nMensagens pendentes:")
-        for i, (dest, msg, reenv, tentativas) in enumerate(fila_mensagens, 1):
-            print(f"{i}. Para: {dest} | Mensagem: {msg} | Reenviado: {reenv} | Tentativas: {tentativas}")
+        for anel in aneis:
+            prefixo = f"[Anel {anel.indice}] " if len(aneis) > 1 else ""
+            for i, (dest, msg, reenv, tentativas) in enumerate(anel.fila, 1):
+                print(f"{i}. {prefixo}Para: {dest} | Mensagem: {msg} | Reenviado: {reenv} | Tentativas: {tentativas}")
     print("\n" + "="*50)
     input("\nPressione Enter para continuar...")
 
+def ler_ultimas_linhas(caminho: str, quantidade: int = 20) -> list:
+    """
+    Lê as últimas linhas de um arquivo em blocos a partir do fim, sem percorrê-lo inteiro
+    """
+    with open(caminho, "rb") as arquivo:
+        posicao = arquivo.seek(0, os.SEEK_END)
+        dados = b""
+        while posicao > 0 and dados.count(b"\n") <= quantidade:
+            bloco = min(4096, posicao)
+            posicao -= bloco
+            arquivo.seek(posicao)
+            dados = arquivo.read(bloco) + dados
+    return [linha.decode("utf-8", errors="replace") for linha in dados.splitlines()[-quantidade:]]
+
+def segmentos_log() -> list:
+    """
+    Segmentos rotacionados do log, do mais antigo ao atual
+    Returns:
+        Lista de tuplas (caminho do log, caminho do índice); o log pode estar comprimido (.gz)
+    """
+    segmentos = []
+    for indice in sorted(glob.glob(f"{glob.escape(arquivo_log.baseFilename)}.*.idx")):
+        segmento = indice[:-len(".idx")]
+        # Enquanto a compressão não termina, o segmento original ainda existe
+        if not os.path.exists(segmento):
+            segmento += ".gz"
+            if not os.path.exists(segmento):
+                continue
+        segmentos.append((segmento, indice))
+    segmentos.append((arquivo_log.baseFilename, f"{arquivo_log.baseFilename}.idx"))
+    return segmentos
+
+def abrir_segmento(caminho: str):
+    """
+    Abre um segmento do log em modo binário, comprimido ou não
+    """
+    return gzip.open(caminho, "rb") if caminho.endswith(".gz") else open(caminho, "rb")
+
+def ultimas_linhas_log(quantidade: int = 20) -> list:
+    """
+    Últimas linhas do log, continuando pelos segmentos rotacionados se o atual for curto
+    """
+    linhas = []
+    for segmento, _ in reversed(segmentos_log()):
+        faltam = quantidade - len(linhas)
+        if faltam <= 0:
+            break
+        if segmento.endswith(".gz"):
+            with abrir_segmento(segmento) as arquivo:
+                anteriores = [linha.decode("utf-8", errors="replace").rstrip("\n") for linha in collections.deque(arquivo, maxlen=faltam)]
+        else:
+            anteriores = ler_ultimas_linhas(segmento, faltam)
+        linhas = anteriores + linhas
+    return linhas
+
+def buscar_logs(tipo: str = None, fonte: str = None, quantidade: int = 20) -> list:
+    """
+    Busca registros pelos índices laterais (incluindo segmentos rotacionados) e lê
+    do log apenas as linhas encontradas
+    Args:
+        tipo: Tipo do evento (ver TIPOS_INDICE) ou None para todos
+        fonte: Nó do outro lado do evento (origem ou destino da mensagem) ou None para todos
+        quantidade: Máximo de linhas retornadas (as mais recentes)
+    """
+    encontrados = []  # Tuplas (segmento, posição)
+    for segmento, caminho_indice in segmentos_log():
+        with open(caminho_indice, encoding="utf-8") as indice:
+            for entrada in indice:
+                campos = entrada.rstrip("\n").split("\t")
+                if len(campos) == 5 and (tipo is None or campos[4] == tipo) and (fonte is None or campos[3] == fonte):
+                    encontrados.append((segmento, int(campos[0])))
+    linhas = []
+    for segmento, posicoes in itertools.groupby(encontrados[-quantidade:], key=lambda item: item[0]):
+        with abrir_segmento(segmento) as log:
+            for _, posicao in posicoes:
+                log.seek(posicao)
+                linhas.append(log.readline().decode("utf-8", errors="replace").rstrip())
+    return linhas
+
 def ver_logs():
     print("\n" + "="*50)
     print("LOGS DO SISTEMA".center(50))
     print("="*50)
     try:
-        with open(f"logs_Computer3.log", "r", encoding="utf-8") as f:
-            logs = f.readlines()[-20:]  # Mostra últimos 20 logs
-            for log in logs:
-                print(log.strip())
+        for log in ultimas_linhas_log(20):  # Mostra últimos 20 logs
+            print(log.strip())
+        filtro = input(f"\nFiltrar por tipo[:nó] ({', '.join(TIPOS_INDICE)}; ex: NACK:Computador2) ou Enter para voltar: ").strip()
+        if filtro:
+            tipo, _, fonte = filtro.partition(":")
+            print()
+            for log in buscar_logs(tipo.upper() or None, fonte or None):
+                print(log)
     except Exception as e:
         print(f"\nErro ao ler logs: {e}")
     print("\n" + "="*50)
@@ -506,23 +1805,29 @@ def mostrar_estado_token(estado, detalhes=""):
     """
     Mostra o estado atual do token com timestamp
     """
-    timestamp = datetime.now().strftime("%H:%M:%S")
-    mensagem = f"{ESTADO_TOKEN[estado]}"
+    if not logging.getLogger().isEnabledFor(logging.INFO):
+        return
+    mensagem = ESTADO_TOKEN[estado]
     if detalhes:
         mensagem += f" - {detalhes}"
-    logging.info(f"[Token] {mensagem}")
+    logging.info("[Token] %s", mensagem)
 
 def processar_token(mensagem):
     """
     Processa o token recebido e retorna informações sobre sua origem e destino
     """
     try:
-        _, seq, ts, node_id = mensagem.split(":")
+        _, seq, ts, node_id, *resto = mensagem.split(":")
+        extensoes = ler_extensoes(resto[0]) if resto else {}
+        anel = int(extensoes.get('a', 0))
         return {
             'sequencia': int(seq),
             'timestamp': float(ts),
             'origem': node_id,
-            'destino': apelido
+            'destino': apelido,
+            'anel': anel,
+            'direcao': int(extensoes.get('d', anel)),
+            'extensoes': extensoes
         }
     except Exception as e:
         logging.error(f"[Token] ❌ Erro ao processar token: {e}")
@@ -531,12 +1836,314 @@ def processar_token(mensagem):
 # ================================
 # THREAD DE RECEPÇÃO
 # ================================
+def tratar_datagrama(mensagem: str, endereco: tuple, pela_ponte: bool = False):
+    """
+    Trata um datagrama recebido (token, controle da rede ou pacote de dados)
+    Args:
+        mensagem: Conteúdo decodificado do datagrama
+        endereco: Endereço (ip, porta) de quem enviou
+        pela_ponte: True se chegou pela porta da ponte (segundo anel)
+    """
+    global fila_mensagens, ip_destino, porta_destino, ip_anterior, porta_anterior, gerar_token
+    global ip_ponte, porta_ponte
+    metricas.incrementar("datagramas_recebidos")
+
+    # Após a saída o nó apenas repassa o que ainda chegar até encerrar
+    if saida_concluida.is_set():
+        enviar_udp(*proximo_no_anel(pela_ponte), mensagem)
+        return
+
+    if mensagem.startswith("DISCOVER:"):  # Mensagem de descoberta
+        _, nome, ip, porta = mensagem.split(":")
+        porta = int(porta)
+        if nome != apelido:  # Ignora mensagens próprias
+            atualizar_mapeamento(nome, ip, porta)
+            logging.info(f"[{apelido}] Nó descoberto: {nome} ({ip}:{porta})")
+            # Envia lista completa de nós para o novo nó
+            enviar_lista_nos(nome)
+            # Repassa a mensagem de descoberta
+            enviar_udp(*proximo_no_anel(pela_ponte), mensagem)
+
+    elif mensagem.startswith("UPDATE:"):  # Mensagem de atualização
+        _, nome, ip, porta = mensagem.split(":")
+        porta = int(porta)
+        if nome != apelido:  # Ignora mensagens próprias
+            atualizar_mapeamento(nome, ip, porta)
+            logging.info(f"[{apelido}] Mapeamento atualizado: {nome} ({ip}:{porta})")
+            # Na ponte, atualizações sobre nós que não são deste anel nunca
+            # voltariam ao nó de origem e circulariam para sempre: param aqui.
+            # Antes de a ROTA revelar o lado do nó, a atualização aguarda
+            if anel_ponte is not None:
+                lado = lado_do_no.get(nome)
+                if lado is None:
+                    updates_pendentes[(nome, pela_ponte)] = mensagem
+                    return
+                if lado != ("ponte" if pela_ponte else "local"):
+                    return
+                enviar_udp(*proximo_no_anel(not pela_ponte), mensagem)  # Leva a mudança também ao outro anel
+            # Repassa a atualização
+            enviar_udp(*proximo_no_anel(pela_ponte), mensagem)
+
+    elif mensagem.startswith("9000:"):  # Token com sequência
+        chegada = relogio_local()
+        with lock_token:
+            # Identifica o anel do token (sempre o primário fora do modo duplo)
+            token_info = processar_token(mensagem)
+            if pela_ponte:
+                anel = anel_ponte
+            else:
+                anel = aneis_locais[min(token_info['anel'], len(aneis_locais) - 1)] if token_info else aneis[0]
+
+            # A troca de relógio é respondida mesmo que o token seja descartado
+            if token_info:
+                trocar_relogio(token_info['extensoes'], chegada, pela_ponte)
+            # O bloco e também é aproveitado de tokens descartados (ex: o gerador
+            # descarta o token que volta rápido demais e regenera um novo)
+            if estatisticas_no_token and anel is aneis[0] and token_info and "e" in token_info['extensoes']:
+                observar_estatisticas(anel, token_info['extensoes']["e"])
+
+            # Verifica tempo mínimo entre tokens
+            if anel.controle.verificar_tempo_minimo():
+                rastro.registrar(EVENTO["TOKEN_DESCARTADO"], token_info['sequencia'] if token_info else 0, endereco[0], apelido)
+                return
+            
+            # Processa o token
+            if token_info and logging.getLogger().isEnabledFor(logging.INFO):
+                logging.info("[Token] 📨 Token recebido de %s para %s", token_info['origem'], token_info['destino'],
+                             extra=evento("TOKEN", token_info['origem']))
+                logging.info("[Token] 🔢 Sequência: %s", token_info['sequencia'])
+                logging.info("[Token] ⏱️ Timestamp: %s", datetime.fromtimestamp(token_info['timestamp']))
+                if logging.getLogger().isEnabledFor(logging.DEBUG):
+                    logging.debug("[Token] 🔍 Estado do token após processamento:")
+                    logging.debug("[Token] 📊 Sequência atual: %s", anel.controle.token.sequencia)
+                    logging.debug("[Token] ⏱️ Timestamp atual: %s", datetime.fromtimestamp(anel.controle.token.timestamp))
+                    logging.debug("[Token] 🏷️ Node ID atual: %s", anel.controle.token.node_id)
+            
+            if not anel.controle.processar_token(mensagem):
+                rastro.registrar(EVENTO["TOKEN_DESCARTADO"], token_info['sequencia'] if token_info else 0, endereco[0], apelido)
+                return
+            rastro.registrar(EVENTO["TOKEN_RECEBIDO"], anel.controle.token.sequencia, anel.controle.token.node_id or "", apelido)
+            agora = time.monotonic()
+            if anel.ultima_chegada is not None:
+                resumo.registrar_volta(agora - anel.ultima_chegada)
+                metricas.tempo_volta.observar(agora - anel.ultima_chegada)
+            anel.ultima_chegada = agora
+            resumo.incrementar("tokens")
+            
+            # Atualiza controle de tempo
+            anel.controle.atualizar_tempo()
+            anel.direcao = token_info['direcao'] if token_info and not pela_ponte else anel.indice
+            anel.token_presente = True
+            mostrar_estado_token('CIRCULANDO', "Token recebido - Pronto para enviar mensagens")
+            logging.info("[%s] ✅ Token recebido - Pronto para enviar mensagens", apelido)
+
+    elif mensagem.startswith("ROTA:"):  # Levantamento dos nós de um anel (pontes)
+        _, origem_rota, entradas = mensagem.split(":", 2)
+        nos_rota = [entrada.split("/") for entrada in entradas.split(",") if entrada]
+        if origem_rota == apelido:
+            # Volta completa: os nós listados são alcançados por este anel
+            lado = "ponte" if pela_ponte else "local"
+            for nome, ip, porta in nos_rota:
+                if nome != apelido:
+                    lado_do_no[nome] = lado
+                    atualizar_mapeamento(nome, ip, int(porta))
+                    # O outro anel só conhece estes nós pela ponte: a cada volta o endereço é
+                    # reanunciado lá, e o UPDATE para ao voltar à ponte pelo outro lado
+                    enviar_udp(*proximo_no_anel(not pela_ponte), f"UPDATE:{nome}:{ip}:{porta}")
+            liberar_updates_pendentes()
+        elif apelido not in (nome for nome, _, _ in nos_rota):
+            entradas += f",{apelido}/{ip_local}/{porta_local}"
+            # Uma ponte no caminho anuncia também os nós do seu outro anel
+            if anel_ponte is not None:
+                lado_oposto = "local" if pela_ponte else "ponte"
+                for nome, lado in lado_do_no.items():
+                    if lado == lado_oposto and nome in mapeamento_apelidos:
+                        ip, porta = mapeamento_apelidos[nome]
+                        entradas += f",{nome}/{ip}/{porta}"
+            enviar_udp(*proximo_no_anel(pela_ponte), f"ROTA:{origem_rota}:{entradas}")
+
+    elif mensagem.startswith("RELOGIO:"):  # Resposta do próximo nó à troca de relógio
+        t4 = relogio_local()
+        _, nome, ip, porta, t1, t2, t3 = mensagem.split(":")
+        relogios.setdefault((ip, int(porta)), RelogioVizinho(nome)).registrar(float(t1), float(t2), float(t3), t4)
+
+    elif mensagem.startswith("PING:"):  # Verificação de enlace (anel duplo)
+        _, ip, porta = mensagem.split(":")
+        enviar_udp(ip, int(porta), f"PONG:{ip_local}:{porta_local}")
+
+    elif mensagem.startswith("PONG:"):  # Vizinho respondeu ao PING
+        _, ip, porta = mensagem.split(":")
+        ultimo_pong[(ip, int(porta))] = time.monotonic()
+
+    elif mensagem.startswith("LEAVE:"):  # Nó deixando a rede
+        _, nome, ip, porta, ip_prox, porta_prox, gerador, *anterior = mensagem.split(":")
+        porta, porta_prox = int(porta), int(porta_prox)
+        if nome != apelido:  # Ignora mensagens próprias
+            remover_no(nome)
+            logging.info(f"[{apelido}] 🚪 Nó {nome} deixou a rede")
+            # O antecessor do nó que saiu passa a apontar para o sucessor dele
+            if (ip, porta) == (ip_destino, porta_destino):
+                ip_destino, porta_destino = ip_prox, porta_prox
+                logging.info(f"[{apelido}] 🔗 Próximo nó religado para {ip_destino}:{porta_destino}")
+            # No anel duplo o sucessor passa a ter como anterior o antecessor de quem saiu
+            if anterior and modo_anel != "simples" and (ip, porta) == (ip_anterior, porta_anterior):
+                ip_anterior, porta_anterior = anterior[0], int(anterior[1])
+                logging.info(f"[{apelido}] 🔗 Nó anterior religado para {ip_anterior}:{porta_anterior}")
+            # Na ponte, o nó que saiu pode ser o próximo no segundo anel
+            if anel_ponte is not None and (ip, porta) == (ip_ponte, porta_ponte):
+                ip_ponte, porta_ponte = ip_prox, porta_prox
+                logging.info(f"[{apelido}] 🔗 Próximo nó da ponte religado para {ip_ponte}:{porta_ponte}")
+            lado_do_no.pop(nome, None)
+            updates_pendentes.pop((nome, False), None)
+            updates_pendentes.pop((nome, True), None)
+            # O sucessor herda o papel de gerador (monitor) do token
+            if gerador == "1" and (ip_prox, porta_prox) == (ip_local, porta_local) and not gerar_token:
+                gerar_token = True
+                controle_token.ultima_passagem = time.monotonic()
+                logging.info(f"[{apelido}] 🏷️ Assumindo papel de gerador do token deixado por {nome}")
+
+    elif mensagem.startswith("7777:"):  # Pacote de dados
+        try:
+            controle, origem, destino, crc, extensoes, texto = ler_pacote(mensagem)
+            ttl = int(extensoes.get("ttl", TTL_MINIMO))
+        except ValueError:
+            estatisticas_quadros.incrementar("descartados_malformados")
+            rastro.registrar(EVENTO["QUADRO_DESCARTADO"], 0, endereco[0], apelido)
+            logging.warning(f"[{apelido}] 🗑️ Quadro com cabeçalho corrompido descartado: {mensagem[:60]}")
+            return
+
+        # Ignora mensagens próprias
+        if origem == apelido:
+            if controle == "naoexiste":
+                # O quadro segue como um quadro em trânsito se dobrou uma vez (wrap) e ainda
+                # não passou pelos nós do outro lado do enlace caído ou se, na ponte, foi
+                # enviado antes de a ROTA revelar que o destino é do outro anel
+                lado = lado_do_no.get(destino) if anel_ponte is not None else None
+                if extensoes.get("w") != "1" and lado in (None, "ponte" if pela_ponte else "local"):
+                    logging.info(f"[{apelido}] Ignorando mensagem própria: {texto}")
+                    return
+            else:
+                print("\n" + "="*50)
+                print(f"\n[{datetime.now().strftime('%H:%M:%S')}] RETORNO DE MENSAGEM:")
+                print(f"Status: {controle}")
+                print(f"Mensagem: {texto}")
+                print("="*50 + "\n")
+                logging.info(f"[{apelido}] Pacote retornou: {controle}")
+                if f"{controle}_RECEBIDO" in EVENTO:
+                    rastro.registrar(EVENTO[f"{controle}_RECEBIDO"], ttl, destino, apelido)
+                anel = aneis[min(int(extensoes.get("a", 0)), len(aneis) - 1)]
+                if "t" in extensoes:
+                    registrar_trajeto(extensoes["t"], anel)
+                if not processar_resposta_mensagem(controle, destino, texto, anel, crc):
+                    return
+                # Saindo com as filas vazias: anuncia a saída e entrega o token
+                if saindo and not any(outro.fila for outro in aneis):
+                    concluir_saida()
+                    return
+                # Após processar a resposta, passa o token (se ainda estiver com ele)
+                if anel.token_presente:
+                    passar_token(anel)
+                return
+
+        if destino == apelido or destino == "TODOS":
+            # O remetente do datagrama é o salto anterior (com uma porta de envio
+            # descartável), nunca a origem: sem o endereço dela, vindo da descoberta,
+            # a resposta não tem para onde ir e o quadro é descartado; a origem
+            # retransmite e será atendida quando o endereço chegar
+            if origem not in mapeamento_apelidos:
+                rastro.registrar(EVENTO["QUADRO_DESCARTADO"], ttl, origem, destino)
+                logging.warning(f"[{apelido}] 🗑️ Quadro de {origem} descartado: endereço da origem ainda desconhecido",
+                                extra=evento("DESCARTE", origem))
+                return
+            # A resposta volta direto à origem, indicando o anel do quadro
+            extensoes_resposta = {"ttl": calcular_ttl()}
+            if "a" in extensoes:
+                extensoes_resposta["a"] = extensoes["a"]
+            if "t" in extensoes:
+                extensoes_resposta["t"] = f"{extensoes['t']}|{marca_salto(apelido)}"
+            crc_recalculado = calcular_crc(texto)
+            if int(crc) == crc_recalculado:
+                print("\n" + "="*50)
+                print(f"\n[{datetime.now().strftime('%H:%M:%S')}] MENSAGEM RECEBIDA:")
+                print(f"De: {origem}")
+                print(f"Para: {destino}")
+                print(f"Conteúdo: {texto}")
+                print(f"Status: CRC OK")
+                print("="*50 + "\n")
+                logging.info(f"[{apelido}] MENSAGEM RECEBIDA de {origem}: {texto}", extra=evento("MENSAGEM", origem))
+                if not interface_ativa:
+                    print(f"@RECEBIDA {origem} {texto}", flush=True)
+                rastro.registrar(EVENTO["QUADRO_ENTREGUE"], ttl, origem, destino)
+                metricas.incrementar("quadros_recebidos")
+                controle_resposta = "ACK"
+            else:
+                print("\n" + "="*50)
+                print(f"\n[{datetime.now().strftime('%H:%M:%S')}] ERRO DE CRC:")
+                print(f"De: {origem}")
+                print(f"Para: {destino}")
+                print(f"Conteúdo: {texto}")
+                print(f"Status: CRC INVÁLIDO")
+                print("="*50 + "\n")
+                logging.info(f"[{apelido}] Erro de CRC! Enviando NACK para {origem}", extra=evento("NACK", origem))
+                rastro.registrar(EVENTO["QUADRO_CRC_INVALIDO"], ttl, origem, destino)
+                controle_resposta = "NACK"
+            if "t" in extensoes_resposta:
+                extensoes_resposta["t"] += f"|{marca_salto(apelido)}"
+            resposta = montar_pacote(controle_resposta, origem, apelido, crc, texto, extensoes_resposta)
+            enviar_udp(*mapeamento_apelidos[origem], resposta)
+
+        else:
+            # Descarta quadros que esgotaram o TTL
+            if ttl <= 1:
+                estatisticas_quadros.incrementar("descartados_ttl")
+                rastro.registrar(EVENTO["QUADRO_DESCARTADO"], ttl, origem, destino)
+                logging.warning(f"[{apelido}] 🗑️ TTL esgotado, descartando quadro de {origem} para {destino} (total: {estatisticas_quadros.descartados_ttl})",
+                                extra=evento("DESCARTE", origem))
+                return
+            if "t" in extensoes:
+                extensoes["t"] += f"|{marca_salto(apelido)}"
+            # Na ponte, quadros para nós do outro anel aguardam o token de lá
+            if anel_ponte is not None:
+                lado = lado_do_no.get(destino)
+                if lado and lado != ("ponte" if pela_ponte else "local"):
+                    anel_saida = anel_ponte if lado == "ponte" else aneis[0]
+                    extensoes.pop("m", None)
+                    extensoes.pop("d", None)
+                    extensoes.pop("w", None)
+                    extensoes["ttl"] = ttl - 1
+                    # Retransmissões do mesmo remetente substituem a cópia ainda pendente
+                    anel_saida.repasses = [r for r in anel_saida.repasses if ler_pacote(r)[1:3] != (origem, destino)]
+                    anel_saida.repasses.append(montar_pacote(controle, origem, destino, crc, texto, extensoes))
+                    logging.info(f"[{apelido}] 🌉 Quadro de {origem} para {destino} atravessando a ponte")
+                    rastro.registrar(EVENTO["QUADRO_NA_PONTE"], ttl, origem, destino)
+                    return
+            # O gerador atua como monitor ativo: marca o quadro na primeira
+            # passagem e o descarta na segunda (origem não o retirou do anel)
+            if (ponte_gerador if pela_ponte else gerar_token) and marcar_no_monitor(extensoes):
+                estatisticas_quadros.incrementar("descartados_orfaos")
+                rastro.registrar(EVENTO["QUADRO_DESCARTADO"], ttl, origem, destino)
+                logging.warning(f"[{apelido}] 🗑️ Quadro órfão de {origem} para {destino} descartado pelo monitor (total: {estatisticas_quadros.descartados_orfaos})",
+                                extra=evento("DESCARTE", origem))
+                return
+            extensoes["ttl"] = ttl - 1
+            if pela_ponte:
+                ip, porta = ip_ponte, porta_ponte
+            else:
+                sentido = int(extensoes.get("d", 0))
+                ip, porta, direcao = proximo_salto(sentido)
+                if modo_anel != "simples":
+                    if direcao != sentido:
+                        dobrar_quadro(extensoes)
+                    extensoes["d"] = direcao
+            logging.info("[%s] Repassando mensagem para %s:%s", apelido, ip, porta)
+            rastro.registrar(EVENTO["QUADRO_REPASSADO"], ttl - 1, origem, destino)
+            enviar_udp(ip, porta, montar_pacote(controle, origem, destino, crc, texto, extensoes))
+
 def receptor():
     """
     Thread responsável por receber mensagens e tokens
     Gerencia a chegada de tokens e pacotes de dados
     """
-    global token_presente, fila_mensagens
     socket_udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     socket_udp.bind((ip_local, porta_local))
     mostrar_estado_token('CIRCULANDO', f"Receptor ativo em {ip_local}:{porta_local}")
@@ -554,113 +2161,32 @@ def receptor():
 
     while True:
         try:
-            dados, endereco = socket_udp.recvfrom(2048)
-            mensagem = dados.decode()
-
-            if mensagem.startswith("DISCOVER:"):  # Mensagem de descoberta
-                _, nome, ip, porta = mensagem.split(":")
-                porta = int(porta)
-                if nome != apelido:  # Ignora mensagens próprias
-                    atualizar_mapeamento(nome, ip, porta)
-                    logging.info(f"[{apelido}] Nó descoberto: {nome} ({ip}:{porta})")
-                    # Envia lista completa de nós para o novo nó
-                    enviar_lista_nos(nome)
-                    # Repassa a mensagem de descoberta
-                    enviar_udp(ip_destino, porta_destino, mensagem)
-
-            elif mensagem.startswith("UPDATE:"):  # Mensagem de atualização
-                _, nome, ip, porta = mensagem.split(":")
-                porta = int(porta)
-                if nome != apelido:  # Ignora mensagens próprias
-                    atualizar_mapeamento(nome, ip, porta)
-                    logging.info(f"[{apelido}] Mapeamento atualizado: {nome} ({ip}:{porta})")
-                    # Repassa a atualização
-                    enviar_udp(ip_destino, porta_destino, mensagem)
-
-            elif mensagem.startswith("9000:"):  # Token com sequência
-                with lock_token:
-                    # Verifica tempo mínimo entre tokens
-                    if controle_token.verificar_tempo_minimo():
-                        continue
-                    
-                    # Processa o token
-                    token_info = processar_token(mensagem)
-                    if token_info:
-                        logging.info(f"[Token] 📨 Token recebido de {token_info['origem']} para {token_info['destino']}")
-                        logging.info(f"[Token] 🔢 Sequência: {token_info['sequencia']}")
-                        logging.info(f"[Token] ⏱️ Timestamp: {datetime.fromtimestamp(token_info['timestamp'])}")
-                        logging.debug(f"[Token] 🔍 Estado do token após processamento:")
-                        logging.debug(f"[Token] 📊 Sequência atual: {controle_token.token.sequencia}")
-                        logging.debug(f"[Token] ⏱️ Timestamp atual: {datetime.fromtimestamp(controle_token.token.timestamp)}")
-                        logging.debug(f"[Token] 🏷️ Node ID atual: {controle_token.token.node_id}")
-                    
-                    if not controle_token.processar_token(mensagem):
-                        continue
-                    
-                    # Atualiza controle de tempo
-                    controle_token.atualizar_tempo()
-                    token_presente = True
-                    mostrar_estado_token('CIRCULANDO', f"Token recebido - Pronto para enviar mensagens")
-                    logging.info(f"[{apelido}] ✅ Token recebido - Pronto para enviar mensagens")
-
-            elif mensagem.startswith("7777:"):  # Pacote de dados
-                _, conteudo = mensagem.split(":", 1)
-                controle, origem, destino, crc, texto = conteudo.split(";", 4)
-
-                # Atualiza mapeamento com o nó de origem
-                if origem not in mapeamento_apelidos:
-                    atualizar_mapeamento(origem, endereco[0], endereco[1])
-
-                # Ignora mensagens próprias
-                if origem == apelido:
-                    if controle == "naoexiste":
-                        logging.info(f"[{apelido}] Ignorando mensagem própria: {texto}")
-                        continue
-                    else:
-                        print("\n" + "="*50)
-                        print(f"\n[{datetime.now().strftime('%H:%M:%S')}] RETORNO DE MENSAGEM:")
-                        print(f"Status: {controle}")
-                        print(f"Mensagem: {texto}")
-                        print("="*50 + "\n")
-                        logging.info(f"[{apelido}] Pacote retornou: {controle}")
-                        processar_resposta_mensagem(controle, destino, texto)
-                        # Após processar a resposta, passa o token
-                        token_str = controle_token.token.to_string()
-                        enviar_udp(ip_destino, porta_destino, token_str)
-                        token_presente = False
-                        controle_token.atualizar_tempo()
-                        continue
+            dados, endereco = socket_udp.recvfrom(TAMANHO_DATAGRAMA)
+            if captura is not None:
+                captura.registrar(dados, endereco)
+            tratar_datagrama(dados.decode(), endereco)
+        except Exception as erro:
+            logging.error(f"[ERRO] Falha na recepção: {erro}")
+
+def receptor_ponte():
+    """
+    Thread da ponte: recebe na porta da ponte o tráfego do segundo anel
+    """
+    socket_ponte = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    socket_ponte.bind((ip_local, porta_local_ponte))
+    logging.info(f"[{apelido}] 🌉 Ponte ativa em {ip_local}:{porta_local_ponte}, próximo nó {ip_ponte}:{porta_ponte}")
 
-                if destino == apelido or destino == "TODOS":
-                    crc_recalculado = calcular_crc(texto)
-                    if int(crc) == crc_recalculado:
-                        print("\n" + "="*50)
-                        print(f"\n[{datetime.now().strftime('%H:%M:%S')}] MENSAGEM RECEBIDA:")
-                        print(f"De: {origem}")
-                        print(f"Para: {destino}")
-                        print(f"Conteúdo: {texto}")
-                        print(f"Status: CRC OK")
-                        print("="*50 + "\n")
-                        logging.info(f"[{apelido}] MENSAGEM RECEBIDA de {origem}: {texto}")
-                        resposta = f"7777:ACK;{origem};{apelido};{crc};{texto}"
-                    else:
-                        print("\n" + "="*50)
-                        print(f"\n[{datetime.now().strftime('%H:%M:%S')}] ERRO DE CRC:")
-                        print(f"De: {origem}")
-                        print(f"Para: {destino}")
-                        print(f"Conteúdo: {texto}")
-                        print(f"Status: CRC INVÁLIDO")
-                        print("="*50 + "\n")
-                        logging.info(f"[{apelido}] Erro de CRC! Enviando NACK para {origem}")
-                        resposta = f"7777:NACK;{origem};{apelido};{crc};{texto}"
-                    enviar_udp(*mapeamento_apelidos[origem], resposta)
-
-                else:
-                    logging.info(f"[{apelido}] Repassando mensagem para {ip_destino}:{porta_destino}")
-                    enviar_udp(ip_destino, porta_destino, mensagem)
+    # O nó se anuncia no segundo anel com o mesmo endereço do anel principal
+    enviar_udp(ip_ponte, porta_ponte, f"DISCOVER:{apelido}:{ip_local}:{porta_local}")
 
+    while True:
+        try:
+            dados, endereco = socket_ponte.recvfrom(TAMANHO_DATAGRAMA)
+            if captura is not None:
+                captura.registrar(dados, endereco, pela_ponte=True)
+            tratar_datagrama(dados.decode(), endereco, pela_ponte=True)
         except Exception as erro:
-            logging.error(f"[ERRO] Falha na recepção: {erro}")
+            logging.error(f"[ERRO] Falha na recepção da ponte: {erro}")
 
 # ================================
 # THREAD DO GERENCIADOR
@@ -670,80 +2196,136 @@ def gerenciador():
     Thread responsável por gerenciar o token e enviar mensagens
     Controla o fluxo de dados na rede em anel
     """
-    global token_presente, fila_mensagens
+    global fila_mensagens
     
     # Se for o gerador inicial, envia o primeiro token
-    if gerar_token:
-        time.sleep(2)  # Aguarda a rede estabilizar
+    if gerar_token or ponte_gerador:
+        time.sleep(ESPERA_GERADOR)  # Aguarda a rede estabilizar
         mostrar_estado_token('CIRCULANDO', "Iniciando circulação do token...")
         logging.info(f"[{apelido}] Iniciando circulação do token...")
-        token_str = controle_token.token.to_string()
-        logging.info(f"[Token] 📤 Enviando token de {apelido} para {ip_destino}:{porta_destino}")
-        enviar_udp(ip_destino, porta_destino, token_str)
-        controle_token.atualizar_tempo()
-        controle_token.token_gerado = True
+        for anel in aneis:
+            if gerador_do_anel(anel):
+                despachar_repasses(anel)
+                passar_token(anel)
+                anel.controle.token_gerado = True
     
-    while True:
+    ultima_verificacao_enlaces = 0
+    ultima_rota = 0
+    while not saida_concluida.is_set():
         try:
+            # Na ponte, levanta periodicamente os nós alcançados por cada anel
+            if anel_ponte is not None and time.monotonic() - ultima_rota >= INTERVALO_ROTA:
+                for pela_ponte in (False, True):
+                    enviar_udp(*proximo_no_anel(pela_ponte), f"ROTA:{apelido}:")
+                ultima_rota = time.monotonic()
+
+            # Verifica os enlaces com os vizinhos no anel duplo
+            if modo_anel != "simples" and time.monotonic() - ultima_verificacao_enlaces >= INTERVALO_VIZINHOS:
+                verificar_enlaces()
+                ultima_verificacao_enlaces = time.monotonic()
+
             with mutex:
-                # Verifica timeout do token
-                if gerar_token and controle_token.verificar_timeout():
-                    mostrar_estado_token('PERDIDO', f"Token não retornou em {controle_token.tempo_maximo}s")
-                    logging.warning(f"[{apelido}] ⚠️ TIMEOUT! Regenerando token...")
-                    logging.warning(f"[{apelido}] Última passagem do token: {time.time() - controle_token.ultima_passagem:.2f}s atrás")
-                    token_str = controle_token.regenerar_token()
-                    if token_str:
-                        logging.info(f"[Token] 📤 Regenerando token de {apelido} para {ip_destino}:{porta_destino}")
-                        enviar_udp(ip_destino, porta_destino, token_str)
-                        controle_token.atualizar_tempo()
-                        mostrar_estado_token('REGENERADO', "Novo token enviado")
-                    continue
+                for anel in aneis:
+                    # Verifica timeout do token
+                    if gerador_do_anel(anel) and anel.controle.verificar_timeout():
+                        mostrar_estado_token('PERDIDO', f"Token não retornou em {anel.controle.tempo_maximo}s")
+                        logging.warning(f"[{apelido}] ⚠️ TIMEOUT! Regenerando token...")
+                        logging.warning(f"[{apelido}] Última passagem do token: {time.monotonic() - anel.controle.ultima_passagem:.2f}s atrás")
+                        token_str = anel.controle.regenerar_token()
+                        if token_str:
+                            logging.info(f"[Token] 📤 Regenerando token do anel {anel.indice} em {apelido}")
+                            rastro.registrar(EVENTO["TOKEN_REGENERADO"], anel.controle.token.sequencia, apelido)
+                            if not interface_ativa:
+                                print(f"@REGENERADO {anel.indice} {anel.controle.token.sequencia}", flush=True)
+                            despachar_repasses(anel)
+                            passar_token(anel)
+                            mostrar_estado_token('REGENERADO', "Novo token enviado")
+                        continue
+
+                    # Se tem token, processa mensagens
+                    if anel.token_presente:
+                        despachar_repasses(anel)
 
-                # Se tem token, processa mensagens
-                if token_presente:
-                    if fila_mensagens:
-                        destino, texto, reenviado, tentativas = fila_mensagens[0]
-                        
-                        # Verifica se o destino está ativo
-                        if not verificar_destino_ativo(destino):
-                            mostrar_estado_mensagem('NAO_EXISTE', f"Destino {destino} não existe na rede")
-                            logging.warning(f"[{apelido}] Destino {destino} não existe na rede")
-                            fila_mensagens.pop(0)
-                            continue
-                        
-                        mostrar_estado_token('EM_USO', "Processando mensagem da fila")
-                        
-                        # Prepara a mensagem
-                        if reenviado:
-                            controle = "naoexiste"
-                            mensagem_pronta = texto
+                        if anel.fila:
+                            # Aguarda o retorno do último quadro sem bloquear os demais anéis
+                            if time.monotonic() < anel.proximo_envio:
+                                continue
+                            # Sem resposta no tempo do token (ex: o quadro aguarda na ponte o token
+                            # do outro anel), o token segue e o quadro é reenviado na próxima passagem;
+                            # segurá-lo impediria a resposta que depende deste anel de chegar
+                            if anel.aguardando_resposta:
+                                mostrar_estado_token('CIRCULANDO', "Sem resposta. Passando token.")
+                                passar_token(anel)
+                                continue
+                            destino, texto, reenviado, tentativas = anel.fila[0]
+                            
+                            # Verifica se o destino está ativo
+                            if not verificar_destino_ativo(destino):
+                                mostrar_estado_mensagem('NAO_EXISTE', f"Destino {destino} não existe na rede")
+                                logging.warning(f"[{apelido}] Destino {destino} não existe na rede", extra=evento("DESCARTE", destino))
+                                anel.fila.pop(0)
+                                instante_enfileirado.pop((destino, texto), None)
+                                if not interface_ativa:
+                                    print(f"@DESCARTADA {destino} naoexiste {texto}", flush=True)
+                                continue
+                            
+                            mostrar_estado_token('EM_USO', "Processando mensagem da fila")
+                            
+                            # Prepara a mensagem
+                            if reenviado:
+                                controle = "naoexiste"
+                                mensagem_pronta = texto
+                            else:
+                                controle = "naoexiste"
+                                mensagem_pronta = inserir_erro(texto, probabilidade_erro)
+                            
+                            # Envia mensagem no sentido em que o token do anel circula
+                            crc = calcular_crc(texto)  # CRC do texto original: o erro inserido é detectado no destino
+                            ip, porta, direcao = salto_do_anel(anel)
+                            extensoes = {"ttl": calcular_ttl()}
+                            if modo_anel != "simples" or anel is anel_ponte:
+                                extensoes["a"] = anel.indice
+                            if modo_anel != "simples" and anel is not anel_ponte:
+                                extensoes["d"] = direcao
+                                if direcao != anel.direcao:
+                                    dobrar_quadro(extensoes)
+                            if entrega_direta and destino != "TODOS" and destino in mapeamento_apelidos:
+                                ip, porta = mapeamento_apelidos[destino]
+                            if rastrear_saltos:
+                                extensoes["t"] = marca_salto(apelido)
+                            pacote = montar_pacote(controle, apelido, destino, crc, mensagem_pronta, extensoes)
+                            logging.info(f"[{apelido}] Enviando mensagem para {destino}", extra=evento("MENSAGEM", destino))
+                            rastro.registrar(EVENTO["QUADRO_ENVIADO"], extensoes["ttl"], apelido, destino)
+                            resumo.incrementar("quadros_enviados")
+                            metricas.incrementar("quadros_enviados")
+                            anel.usou_token = True
+                            enviar_udp(ip, porta, pacote)
+                            logging.info(f"[{apelido}] Mensagem enviada: {mensagem_pronta}")
+                            
+                            # Aguarda um tempo para a mensagem voltar
+                            anel.proximo_envio = time.monotonic() + tempo_token
+                            anel.aguardando_resposta = True
+                        elif saindo and not any(outro.fila for outro in aneis):
+                            # Filas vazias durante a saída: anuncia e entrega o token
+                            concluir_saida()
                         else:
-                            controle = "naoexiste"
-                            mensagem_pronta = inserir_erro(texto)
-                        
-                        # Envia mensagem
-                        crc = calcular_crc(mensagem_pronta)
-                        pacote = f"7777:{controle};{apelido};{destino};{crc};{mensagem_pronta}"
-                        logging.info(f"[{apelido}] Enviando mensagem para {destino}")
-                        enviar_udp(ip_destino, porta_destino, pacote)
-                        logging.info(f"[{apelido}] Mensagem enviada: {mensagem_pronta}")
-                        
-                        # Aguarda um tempo para a mensagem voltar
-                        time.sleep(tempo_token)
-                    else:
-                        # Se não tem mensagem, passa o token
-                        token_str = controle_token.token.to_string()
-                        mostrar_estado_token('CIRCULANDO', "Nenhuma mensagem. Passando token.")
-                        logging.info(f"[Token] 📤 Enviando token de {apelido} para {ip_destino}:{porta_destino}")
-                        enviar_udp(ip_destino, porta_destino, token_str)
-                        token_presente = False
-                        controle_token.atualizar_tempo()
-
-            # Mostra status do token a cada segundo
-            if gerar_token and time.time() - controle_token.ultima_passagem > 1:
-                controle_token.mostrar_status()
+                            # Se não tem mensagem, passa o token
+                            mostrar_estado_token('CIRCULANDO', "Nenhuma mensagem. Passando token.")
+                            passar_token(anel)
+
+            # Pedidos dos sinais: o handler só marca o evento, o trabalho (join, arquivo) fica aqui
+            if pedido_rastro.is_set():
+                pedido_rastro.clear()
+                salvar_rastro("SIGUSR1")
+            if perfilador.pedido.is_set():
+                perfilador.pedido.clear()
+                perfilador.alternar()
+
+            # Resumo das métricas uma vez por intervalo
+            if time.monotonic() - resumo.inicio >= resumo.intervalo:
+                resumo.emitir()
             
-            time.sleep(0.1)  # Pequena pausa para não sobrecarregar a CPU
+            time.sleep(PAUSA_GERENCIADOR)  # Pequena pausa para não sobrecarregar a CPU
         except Exception as erro:
             logging.error(f"[ERRO] Falha no gerenciador: {erro}")
 
@@ -753,11 +2335,34 @@ def gerenciador():
 if __name__ == "__main__":
     try:
         logging.info(f"Iniciando nó {apelido} em {ip_local}:{porta_local}")
+
+        # Rastro de eventos: SIGUSR1 grava sob demanda; falhas em threads gravam automaticamente
+        if hasattr(signal, "SIGUSR1"):
+            signal.signal(signal.SIGUSR1, lambda *_: pedido_rastro.set())
+        # Perfil de CPU: SIGUSR2 liga e, no próximo sinal, desliga e grava perfil_<apelido>.folded
+        if hasattr(signal, "SIGUSR2"):
+            signal.signal(signal.SIGUSR2, lambda *_: perfilador.pedido.set())
+        def falha_em_thread(argumentos):
+            salvar_rastro(f"falha: {argumentos.exc_value}")
+            threading.__excepthook__(argumentos)
+        threading.excepthook = falha_em_thread
+
+        # Métricas para o Prometheus em http://127.0.0.1:<metricas_porta>/metrics
+        if "metricas_porta" in opcoes:
+            servidor_metricas = http.server.ThreadingHTTPServer(("127.0.0.1", int(opcoes["metricas_porta"])), ManipuladorMetricas)
+            threading.Thread(target=servidor_metricas.serve_forever, name="metricas", daemon=True).start()
+            logging.info(f"[{apelido}] 📈 Métricas em http://127.0.0.1:{opcoes['metricas_porta']}/metrics")
         
         # Inicia threads
-        thread_receptor = threading.Thread(target=receptor)
-        thread_gerenciador = threading.Thread(target=gerenciador)
-        thread_interface = threading.Thread(target=interface_usuario)
+        thread_receptor = threading.Thread(target=receptor, name="receptor")
+        thread_gerenciador = threading.Thread(target=gerenciador, name="gerenciador")
+        if interface_ativa:
+            thread_interface = threading.Thread(target=interface_usuario, name="interface_usuario")
+        else:
+            thread_interface = threading.Thread(target=entrada_sem_interface, name="entrada_sem_interface")
+        if anel_ponte is not None:
+            thread_ponte = threading.Thread(target=receptor_ponte, name="receptor_ponte", daemon=True)
+            thread_ponte.start()
         
         thread_receptor.daemon = True
         thread_gerenciador.daemon = True
@@ -767,14 +2372,16 @@ if __name__ == "__main__":
         thread_gerenciador.start()
         thread_interface.start()
         
-        # Mantém o programa rodando
-        while True:
+        # Mantém o programa rodando até a saída ser concluída
+        while not saida_concluida.is_set():
             time.sleep(1)
     except KeyboardInterrupt:
         logging.info("Encerrando aplicação...")
         print("\nEncerrando aplicação...")
+        sair_da_rede()
     except Exception as e:
         logging.error(f"Erro fatal: {e}")
+        salvar_rastro(f"erro fatal: {e}")
         print(f"\nErro fatal: {e}")
     finally:
         if 'socket_udp' in locals():
@@ -0,0 +1,190 @@
+"""
+Analisador de desempenho a partir dos logs dos nós (leitura em fluxo)
+
+Uso: python ferramentas/analisar_logs.py <log ou pasta> [<log ou pasta> ...]
+
+Lê os logs de todos os nós linha a linha, sem carregá-los na memória (inclusive
+os segmentos rotacionados .gz), intercala os eventos pelo horário e
+correlaciona o token entre os nós pela sequência. Os horários são corrigidos
+pelo desvio de relógio que cada nó registra em relação ao gerador do token.
+Mostra o tempo de volta do token (percentis), a latência por salto, a taxa de
+retransmissão, os timeouts e os tokens duplicados.
+"""
+import glob
+import gzip
+import heapq
+import os
+import re
+import sys
+import time
+from array import array
+from collections import defaultdict
+from datetime import datetime
+
+# Trechos das linhas de log que interessam à análise (as demais são ignoradas sem decodificar)
+MARCADORES = {
+    "Token recebido de ": "token_recebido",
+    "🔢 Sequência: ": "sequencia",
+    "Enviando token de ": "token_enviado",
+    "Token regenerado - Nova sequência: ": "token_regenerado",
+    "Enviando mensagem para ": "quadro_enviado",
+    "Retransmitindo...": "retransmissao",
+    "] Mensagem entregue com sucesso": "entregue",
+    "TIMEOUT DO TOKEN": "timeout",
+    "Token duplicado detectado": "duplicado",
+    "TOKEN MUITO RÁPIDO": "muito_rapido",
+    "🗑️": "descartado",
+    "🕰️ Relógio: desvio do anel ": "desvio_relogio",
+}
+PADRAO = re.compile(b"|".join(re.escape(marcador.encode()) for marcador in MARCADORES))
+EVENTO_DO_MARCADOR = {marcador.encode(): evento for marcador, evento in MARCADORES.items()}
+LIMITE_PENDENTES = 10000  # Tokens enviados aguardando a chegada no próximo nó
+SALTO_MAXIMO = 5.0  # Envio mais antigo que isso não é o mesmo token (sequência reiniciada)
+
+_minutos = {}
+
+
+def instante(linha: bytes) -> float:
+    """
+    Converte o horário do log ("2025-06-03 20:33:50,934") em segundos, reaproveitando o minuto
+    """
+    minuto = linha[:16]
+    base = _minutos.get(minuto)
+    if base is None:
+        base = _minutos[minuto] = datetime.strptime(minuto.decode(), "%Y-%m-%d %H:%M").timestamp()
+    return base + int(linha[17:19]) + int(linha[20:23]) / 1000
+
+
+def arquivos_de(caminhos: list) -> list:
+    """
+    Agrupa os arquivos de log por nó: segmentos rotacionados (em ordem) seguidos do log atual
+    """
+    logs = []
+    for caminho in caminhos:
+        if os.path.isdir(caminho):
+            logs += glob.glob(os.path.join(caminho, "**", "logs_*.log"), recursive=True)
+        else:
+            logs.append(caminho)
+    grupos = []
+    for log in sorted(set(logs)):
+        segmentos = sorted(glob.glob(f"{glob.escape(log)}.*"))
+        segmentos = [s for s in segmentos if not s.endswith(".idx")]
+        # Segmento ainda sendo comprimido: usa só a versão sem compressão
+        segmentos = [s for s in segmentos if not (s.endswith(".gz") and s[:-3] in segmentos)]
+        grupos.append(segmentos + [log])
+    return grupos
+
+
+def eventos_do_no(indice: int, arquivos: list, estatisticas: dict):
+    """
+    Gera (instante, índice do nó, evento, mensagem) para as linhas relevantes dos arquivos de um nó.
+    Os instantes são levados ao relógio do gerador do token pelo último desvio registrado pelo nó
+    """
+    desvio = 0.0
+    for caminho in arquivos:
+        abrir = gzip.open if caminho.endswith(".gz") else open
+        with abrir(caminho, "rb") as arquivo:
+            for linha in arquivo:
+                estatisticas["linhas"] += 1
+                achado = PADRAO.search(linha)
+                if achado is None or len(linha) < 23:
+                    continue
+                try:
+                    momento = instante(linha)
+                except ValueError:
+                    continue
+                mensagem = linha[linha.find(b" - ", 24) + 3:].decode("utf-8", errors="replace").rstrip()
+                evento = EVENTO_DO_MARCADOR[achado.group()]
+                if evento == "desvio_relogio":
+                    desvio = float(mensagem.rsplit(" ", 2)[1]) / 1000
+                    continue
+                yield momento - desvio, indice, evento, mensagem
+
+
+def percentis(valores, escala: float = 1.0) -> str:
+    if not valores:
+        return "sem amostras"
+    ordenados = sorted(valores)
+    def p(q):
+        return ordenados[min(len(ordenados) - 1, int(q * len(ordenados)))] * escala
+    return (f"{len(ordenados):7} amostras | p50 {p(0.5):9.3f} | p90 {p(0.9):9.3f} | "
+            f"p99 {p(0.99):9.3f} | máx {ordenados[-1] * escala:9.3f}")
+
+
+def analisar(grupos: list) -> dict:
+    estatisticas = defaultdict(int)
+    voltas = defaultdict(lambda: array("d"))  # Nó -> tempos entre chegadas do token
+    saltos = defaultdict(lambda: array("d"))  # (de, para) -> latência do salto
+    ultima_chegada = {}  # Nó -> instante da última chegada do token
+    # Estado por arquivo de nó (cada fluxo é um nó)
+    proxima_sequencia = defaultdict(int)  # Sequência do próximo token que o nó enviar
+    recebendo = {}  # Chegada (instante, nó) cuja linha de sequência ainda não foi lida
+    enviados = {}  # Sequência -> (instante, nó que enviou)
+
+    fluxos = [eventos_do_no(indice, arquivos, estatisticas) for indice, arquivos in enumerate(grupos)]
+    for momento, fluxo, evento, mensagem in heapq.merge(*fluxos, key=lambda item: item[0]):
+        estatisticas[evento] += 1
+        if evento == "token_recebido":
+            no = mensagem.rsplit(" para ", 1)[-1]
+            if no in ultima_chegada:
+                voltas[no].append(momento - ultima_chegada[no])
+            ultima_chegada[no] = momento
+            recebendo[fluxo] = (momento, no)
+        elif evento == "sequencia":
+            # A linha da sequência vem logo após a de chegada, no mesmo nó
+            if fluxo not in recebendo:
+                continue
+            chegada, no = recebendo.pop(fluxo)
+            sequencia = int(mensagem.rsplit(" ", 1)[-1])
+            proxima_sequencia[fluxo] = sequencia + 1  # O nó incrementa antes de repassar
+            envio = enviados.pop(sequencia, None)
+            if envio and envio[1] != no and chegada - envio[0] <= SALTO_MAXIMO:
+                saltos[(envio[1], no)].append(chegada - envio[0])
+        elif evento == "token_regenerado":
+            # O token anterior se perdeu: envios pendentes não serão mais correlacionados
+            enviados.clear()
+            proxima_sequencia[fluxo] = int(mensagem.rsplit(" ", 1)[-1])
+        elif evento == "token_enviado":
+            no = mensagem.split("Enviando token de ", 1)[1].split(" para ", 1)[0]
+            enviados[proxima_sequencia[fluxo]] = (momento, no)
+            if len(enviados) > LIMITE_PENDENTES:
+                # Tokens perdidos nunca chegam: descarta os envios mais antigos
+                for sequencia in sorted(enviados)[:LIMITE_PENDENTES // 2]:
+                    del enviados[sequencia]
+    return {"estatisticas": estatisticas, "voltas": voltas, "saltos": saltos}
+
+
+def relatorio(resultado: dict, duracao: float):
+    estatisticas = resultado["estatisticas"]
+    print("=" * 70)
+    print("RELATÓRIO DE DESEMPENHO DO ANEL".center(70))
+    print("=" * 70)
+    print(f"Linhas lidas: {estatisticas['linhas']} ({estatisticas['linhas'] / max(duracao, 1e-9):,.0f} linhas/s)")
+
+    print("\nTempo de volta do token por nó (s):")
+    for no, valores in sorted(resultado["voltas"].items()):
+        print(f"- {no:15} {percentis(valores)}")
+
+    print("\nLatência por salto do token (ms):")
+    for (origem, destino), valores in sorted(resultado["saltos"].items()):
+        print(f"- {origem:>12} -> {destino:12} {percentis(valores, 1000)}")
+
+    enviados = estatisticas["quadro_enviado"]
+    retransmissoes = estatisticas["retransmissao"]
+    taxa = 100 * retransmissoes / enviados if enviados else 0
+    print("\nQuadros:")
+    print(f"- Enviados: {enviados} | entregues: {estatisticas['entregue']} | "
+          f"retransmissões: {retransmissoes} ({taxa:.1f}%) | descartados: {estatisticas['descartado']}")
+    print("\nToken:")
+    print(f"- Timeouts: {estatisticas['timeout']} | duplicados: {estatisticas['duplicado']} | "
+          f"muito rápidos: {estatisticas['muito_rapido']} | regenerações: {estatisticas['token_regenerado']}")
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    inicio = time.perf_counter()
+    resultado = analisar(arquivos_de(sys.argv[1:]))
+    relatorio(resultado, time.perf_counter() - inicio)
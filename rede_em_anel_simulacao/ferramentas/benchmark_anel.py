@@ -0,0 +1,264 @@
+"""
+Benchmark de ponta a ponta do anel (vazão e latência de entrega)
+
+Uso: python ferramentas/benchmark_anel.py [--nos 3,5] [--tamanhos 32,512] [--erros 0,0.2]
+                                          [--tempos 1] [--mensagens 20] [--limite 120] [--tempo-minimo 0]
+                                          [--revisao REV] [--json saida.json] [--csv saida.csv]
+     python ferramentas/benchmark_anel.py --comparar antes.json depois.json
+
+Para cada combinação de número de nós, tamanho da mensagem, probabilidade de
+erro e tempo do token, sobe um anel no loopback a partir do main.py do
+Computador1 (ou do main.py de uma revisão do git com --revisao), sem interface,
+e cada nó envia a quantidade pedida de mensagens a destinos aleatórios.
+Mede as entregas por segundo, a latência de entrega (p50/p99/p999, da fila ao
+ACK), o tempo médio de volta do token e a taxa de retransmissão, pelas linhas
+@ENTREGUE/@DESCARTADA dos nós e pelas métricas de cada um.
+A revisão precisa ter o modo sem interface (interface=false).
+
+Os nós usam tempo_minimo_token=0 por padrão (--tempo-minimo muda): no loopback
+o token volta ao gerador bem antes do mínimo padrão (0.5s) e seria descartado
+como rápido demais a cada volta, e o anel só andaria com a regeneração pelo
+timeout (15s); o benchmark mediria o timeout, e não o anel.
+"""
+import csv
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTADOS = ("@ENTREGUE", "@DESCARTADA")  # Linhas que encerram uma mensagem na origem
+AQUECIMENTO = 15  # Limite para a descoberta dos nós (em segundos)
+INTERVALO_PARTIDA = 0.2  # Entre a partida de um nó e a do anterior no anel (em segundos)
+PORTA_BASE = 7100  # Portas dos nós; as métricas usam PORTA_BASE + 1000
+CAMPOS = ["nos", "tamanho", "erro", "tempo_token", "mensagens", "entregues", "descartadas", "duracao_s",
+          "entregas_por_s", "latencia_p50_ms", "latencia_p99_ms", "latencia_p999_ms",
+          "volta_media_s", "taxa_retransmissao"]
+
+
+def codigo_do_no(revisao: str = None) -> str:
+    """
+    main.py usado pelos nós: o da árvore de trabalho ou o de uma revisão do git
+    """
+    if revisao is None:
+        with open(os.path.join(RAIZ, "Computador1", "main.py"), encoding="utf-8") as arquivo:
+            return arquivo.read()
+    return subprocess.run(["git", "show", f"{revisao}:./Computador1/main.py"], cwd=RAIZ,
+                          capture_output=True, text=True, check=True).stdout
+
+
+def percentil(valores: list, q: float) -> float:
+    if not valores:
+        return float("nan")
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(q * len(ordenados)))]
+
+
+def ler_metricas(porta: int) -> dict:
+    """
+    Lê o /metrics de um nó e soma as séries de mesmo nome e rótulos (sem o rótulo do nó)
+    """
+    valores = {}
+    with urllib.request.urlopen(f"http://127.0.0.1:{porta}/metrics", timeout=5) as resposta:
+        for linha in resposta.read().decode().splitlines():
+            if linha.startswith("#") or not linha:
+                continue
+            serie, valor = linha.rsplit(" ", 1)
+            nome, _, rotulos = serie.partition("{")
+            rotulos = ",".join(r for r in rotulos.rstrip("}").split(",") if not r.startswith("no="))
+            valores[(nome, rotulos)] = valores.get((nome, rotulos), 0.0) + float(valor)
+    return valores
+
+
+def acompanhar(processo, resultados: list, trava: threading.Lock):
+    """
+    Lê a saída de um nó e guarda as linhas de evento (@ENTREGUE, @DESCARTADA, @RECEBIDA, @REGENERADO)
+    """
+    for linha in processo.stdout:
+        if linha.startswith("@"):
+            with trava:
+                resultados.append((time.monotonic(), linha.split()))
+
+
+def subir_no(diretorio: str, resultados: list, trava: threading.Lock) -> subprocess.Popen:
+    """
+    Inicia um nó já configurado e acompanha sua saída
+    """
+    processo = subprocess.Popen([sys.executable, "main.py"], cwd=diretorio, text=True,
+                                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    threading.Thread(target=acompanhar, args=(processo, resultados, trava), daemon=True).start()
+    return processo
+
+
+def subir_anel(codigo: str, pasta: str, nos: int, tempo: float, erro: float,
+               resultados: list, trava: threading.Lock, opcoes: tuple = ()) -> list:
+    """
+    Cria e inicia os nós No1..NoN na pasta, sem interface (No1 gera o token)
+    Args:
+        opcoes: Linhas extras do config.txt; {anterior} vira o endereço do nó anterior
+    Returns:
+        Processos dos nós, na ordem do anel
+    """
+    processos = []
+    # Em ordem inversa: cada nó anuncia-se (DISCOVER) ao sucessor, que já precisa estar ouvindo
+    for indice in reversed(range(nos)):
+        diretorio = os.path.join(pasta, f"No{indice + 1}")
+        os.makedirs(diretorio)
+        with open(os.path.join(diretorio, "main.py"), "w", encoding="utf-8") as arquivo:
+            arquivo.write(codigo)
+        anterior = f"127.0.0.1:{PORTA_BASE + (indice - 1) % nos}"
+        with open(os.path.join(diretorio, "config.txt"), "w") as arquivo:
+            arquivo.write("\n".join([
+                f"127.0.0.1:{PORTA_BASE + (indice + 1) % nos}", f"No{indice + 1}", str(tempo),
+                "true" if indice == 0 else "false",
+                f"porta={PORTA_BASE + indice}", f"metricas_porta={PORTA_BASE + 1000 + indice}",
+                "interface=false", f"probabilidade_erro={erro}", "nivel_log=WARNING",
+                *(opcao.format(anterior=anterior) for opcao in opcoes),
+            ]))
+        processos.append(subir_no(diretorio, resultados, trava))
+        time.sleep(INTERVALO_PARTIDA)
+    processos.reverse()
+    return processos
+
+
+def aguardar_descoberta(nos: int, limite: float = AQUECIMENTO) -> bool:
+    """
+    Espera todos os nós conhecerem o anel inteiro (nos_ativos nas métricas) e o token circular.
+    A descoberta é feita uma única vez na partida e um DISCOVER perdido só é
+    suprido pelas atualizações dos vizinhos; sem isso a resposta a um quadro
+    de origem desconhecida não tem para onde voltar
+    """
+    fim = time.monotonic() + limite
+    while time.monotonic() < fim:
+        try:
+            conhecidos = [ler_metricas(PORTA_BASE + 1000 + indice).get(("anel_estrutura_itens", 'estrutura="nos_ativos"'), 0)
+                          for indice in range(nos)]
+        except OSError:
+            conhecidos = []
+        if conhecidos and min(conhecidos) >= nos:
+            time.sleep(2)  # O gerador espera a rede estabilizar antes do primeiro token
+            return True
+        time.sleep(0.2)
+    print(f"  ⚠️ Descoberta incompleta após {limite:.0f}s: quadros para nós desconhecidos ficarão sem resposta", flush=True)
+    return False
+
+
+def executar_cenario(codigo: str, nos: int, tamanho: int, erro: float, tempo: float,
+                     mensagens: int, limite: float, opcoes: tuple = (), semente: int = 1) -> dict:
+    nomes = [f"No{indice + 1}" for indice in range(nos)]
+    resultados, trava = [], threading.Lock()
+    processos = []
+    with tempfile.TemporaryDirectory() as pasta:
+        try:
+            processos = subir_anel(codigo, pasta, nos, tempo, erro, resultados, trava, opcoes)
+            aguardar_descoberta(nos)
+
+            sorteio = random.Random(semente)
+            inicio = time.monotonic()
+            for processo, nome in zip(processos, nomes):
+                outros = [outro for outro in nomes if outro != nome]
+                for numero in range(mensagens):
+                    texto = f"{numero}:" + "x" * max(0, tamanho - len(str(numero)) - 1)
+                    processo.stdin.write(f"{sorteio.choice(outros)} {texto}\n")
+                processo.stdin.flush()
+
+            esperadas = nos * mensagens
+            while sum(campos[0] in RESULTADOS for _, campos in resultados) < esperadas and time.monotonic() - inicio < limite:
+                time.sleep(0.1)
+            metricas = [ler_metricas(PORTA_BASE + 1000 + indice) for indice in range(nos)]
+        finally:
+            for processo in processos:
+                processo.kill()
+                processo.wait()
+
+    with trava:
+        encerradas = [(instante, campos) for instante, campos in resultados if campos[0] in RESULTADOS]
+        entregas = [(instante, campos) for instante, campos in encerradas if campos[0] == "@ENTREGUE"]
+        descartadas = len(encerradas) - len(entregas)
+        fim = max((instante for instante, _ in encerradas), default=time.monotonic())
+    latencias = [float(campos[2]) * 1000 for _, campos in entregas]
+    total = {}
+    for valores in metricas:
+        for chave, valor in valores.items():
+            total[chave] = total.get(chave, 0.0) + valor
+    enviados = total.get(("anel_quadros_total", 'sentido="enviado"'), 0.0)
+    voltas = total.get(("anel_tempo_volta_segundos_count", ""), 0.0)
+    duracao = max(fim - inicio, 1e-9)
+    return {
+        "nos": nos, "tamanho": tamanho, "erro": erro, "tempo_token": tempo, "mensagens": esperadas,
+        "entregues": len(entregas), "descartadas": descartadas, "duracao_s": round(duracao, 3),
+        "entregas_por_s": round(len(entregas) / duracao, 3),
+        "latencia_p50_ms": round(percentil(latencias, 0.5), 3),
+        "latencia_p99_ms": round(percentil(latencias, 0.99), 3),
+        "latencia_p999_ms": round(percentil(latencias, 0.999), 3),
+        "volta_media_s": round(total.get(("anel_tempo_volta_segundos_sum", ""), 0.0) / voltas, 3) if voltas else None,
+        "taxa_retransmissao": round(total.get(("anel_retransmissoes_total", ""), 0.0) / enviados, 4) if enviados else None,
+    }
+
+
+def lista(argumentos: list, opcao: str, padrao: str, tipo):
+    valor = argumentos[argumentos.index(opcao) + 1] if opcao in argumentos else padrao
+    return [tipo(item) for item in valor.split(",")]
+
+
+def comparar(antes: list, depois: list):
+    """
+    Compara dois arquivos de resultado, cenário a cenário
+    """
+    chave = lambda linha: (linha["nos"], linha["tamanho"], linha["erro"], linha["tempo_token"])
+    anteriores = {chave(linha): linha for linha in antes}
+    print(f"{'nós':>4} {'tam':>5} {'erro':>5} {'tempo':>5} | {'entregas/s':>21} | {'p50 (ms)':>21} | {'p99 (ms)':>21}")
+    for linha in depois:
+        anterior = anteriores.get(chave(linha))
+        if anterior is None:
+            continue
+        colunas = []
+        for campo in ("entregas_por_s", "latencia_p50_ms", "latencia_p99_ms"):
+            razao = linha[campo] / anterior[campo] if anterior[campo] else float("nan")
+            colunas.append(f"{anterior[campo]:8.2f} -> {linha[campo]:8.2f} {razao:5.2f}x")
+        print(f"{linha['nos']:>4} {linha['tamanho']:>5} {linha['erro']:>5} {linha['tempo_token']:>5} | " + " | ".join(colunas))
+
+
+if __name__ == "__main__":
+    argumentos = sys.argv[1:]
+    if argumentos[:1] == ["--comparar"]:
+        if len(argumentos) != 3:
+            print(__doc__)
+            sys.exit(1)
+        with open(argumentos[1]) as arquivo_antes, open(argumentos[2]) as arquivo_depois:
+            comparar(json.load(arquivo_antes)["cenarios"], json.load(arquivo_depois)["cenarios"])
+        sys.exit(0)
+
+    revisao = argumentos[argumentos.index("--revisao") + 1] if "--revisao" in argumentos else None
+    codigo = codigo_do_no(revisao)
+    mensagens = int(argumentos[argumentos.index("--mensagens") + 1]) if "--mensagens" in argumentos else 20
+    limite = float(argumentos[argumentos.index("--limite") + 1]) if "--limite" in argumentos else 120
+    tempo_minimo = argumentos[argumentos.index("--tempo-minimo") + 1] if "--tempo-minimo" in argumentos else "0"
+    opcoes = (f"tempo_minimo_token={tempo_minimo}",)
+
+    cenarios = []
+    for nos, tamanho, erro, tempo in itertools.product(
+            lista(argumentos, "--nos", "3", int), lista(argumentos, "--tamanhos", "32", int),
+            lista(argumentos, "--erros", "0.2", float), lista(argumentos, "--tempos", "1", float)):
+        print(f"Cenário: {nos} nós, mensagens de {tamanho} bytes, erro {erro:.0%}, tempo do token {tempo}s...", flush=True)
+        resultado = executar_cenario(codigo, nos, tamanho, erro, tempo, mensagens, limite, opcoes)
+        cenarios.append(resultado)
+        print(f"  {resultado['entregues']}/{resultado['mensagens']} entregues em {resultado['duracao_s']}s "
+              f"({resultado['entregas_por_s']} /s) | latência p50 {resultado['latencia_p50_ms']} ms "
+              f"p99 {resultado['latencia_p99_ms']} ms p999 {resultado['latencia_p999_ms']} ms | "
+              f"volta {resultado['volta_media_s']}s | retransmissão {resultado['taxa_retransmissao']}", flush=True)
+
+    if "--json" in argumentos:
+        with open(argumentos[argumentos.index("--json") + 1], "w") as arquivo:
+            json.dump({"revisao": revisao or "árvore de trabalho", "opcoes": list(opcoes), "cenarios": cenarios}, arquivo, indent=2, ensure_ascii=False)
+    if "--csv" in argumentos:
+        with open(argumentos[argumentos.index("--csv") + 1], "w", newline="") as arquivo:
+            escritor = csv.DictWriter(arquivo, fieldnames=CAMPOS)
+            escritor.writeheader()
+            escritor.writerows(cenarios)
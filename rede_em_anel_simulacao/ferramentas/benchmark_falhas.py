@@ -0,0 +1,210 @@
+"""
+Benchmark de recuperação do token sob falhas de nós
+
+Uso: python ferramentas/benchmark_falhas.py [--nos 3] [--falhas pausa,queda,parada] [--alvos 1,2]
+                                            [--instante 10] [--duracao 10] [--observar 30]
+                                            [--intervalo 1] [--tempo 0.3] [--tempo-maximo 15]
+                                            [--tempo-minimo 0] [--anel-duplo failover]
+                                            [--revisao REV] [--json saida.json] [--csv saida.csv]
+
+Sobe um anel sem interface no loopback (como o benchmark_anel.py) e mantém uma
+carga constante: cada nó ativo enfileira uma mensagem a cada --intervalo
+segundos para um destino aleatório. No --instante (segundos após o início da
+carga) aplica a falha ao nó alvo (1 é o gerador do token):
+- pausa: congela o processo (SIGSTOP) por --duracao segundos e o retoma
+- queda: mata o processo e o reinicia após --duracao segundos
+- parada: mata o processo sem reiniciar
+A carga segue por --observar segundos após o fim da falha e depois o anel
+tem até --drenagem segundos para entregar o que ficou nas filas.
+
+Mede o tempo até o gerador detectar a perda do token (@REGENERADO), a maior
+interrupção do tráfego após a falha (e a maior antes dela, como referência),
+quando o tráfego foi retomado, as mensagens perdidas (enfileiradas e nunca
+recebidas no destino), as duplicadas (recebidas mais de uma vez) e os tokens
+duplicados descartados pelos nós.
+
+Os nós usam tempo_minimo_token=0 por padrão: no loopback o token volta ao
+gerador antes do mínimo padrão (0.5s) e seria descartado a cada volta, o que
+se confundiria com a perda causada pela falha.
+"""
+import csv
+import itertools
+import json
+import os
+import random
+import signal
+import sys
+import tempfile
+import threading
+import time
+
+from benchmark_anel import PORTA_BASE, aguardar_descoberta, codigo_do_no, ler_metricas, lista, subir_anel, subir_no
+
+CAMPOS = ["nos", "falha", "alvo", "enviadas", "recebidas", "perdidas", "duplicadas", "descartadas",
+          "deteccao_s", "regeneracoes", "interrupcao_normal_s", "interrupcao_s", "retomada_s",
+          "tokens_duplicados"]
+
+
+def maior_intervalo(inicio: float, fim: float, instantes: list) -> tuple:
+    """
+    Maior intervalo sem recepções entre inicio e fim
+    Returns:
+        (duração do intervalo, instante em que terminou); sem recepções, o instante é None
+    """
+    instantes = sorted(instante for instante in instantes if inicio <= instante <= fim)
+    if not instantes:
+        return fim - inicio, None
+    return max((depois - antes, depois) for antes, depois in zip([inicio] + instantes, instantes))
+
+
+def executar_falha(codigo: str, nos: int, falha: str, alvo: int, instante: float, duracao: float,
+                   observar: float, drenagem: float, intervalo: float, tempo: float,
+                   opcoes: tuple, semente: int = 1) -> dict:
+    registros, trava = [], threading.Lock()
+    enviadas = set()
+    indice_alvo = alvo - 1
+    with tempfile.TemporaryDirectory() as pasta:
+        processos = []
+        try:
+            processos = subir_anel(codigo, pasta, nos, tempo, 0.0, registros, trava, opcoes)
+            aguardar_descoberta(nos)
+
+            sorteio = random.Random(semente)
+            ativos = set(range(nos))
+            inicio = time.monotonic()
+            inicio_falha = inicio + instante
+            fim_falha = inicio_falha + (0 if falha == "parada" else duracao)
+            aplicada = recuperada = False
+            numero = 0
+            while time.monotonic() < fim_falha + observar:
+                if not aplicada and time.monotonic() >= inicio_falha:
+                    if falha == "pausa":
+                        processos[indice_alvo].send_signal(signal.SIGSTOP)
+                    else:
+                        processos[indice_alvo].kill()
+                        processos[indice_alvo].wait()
+                    ativos.discard(indice_alvo)
+                    inicio_falha, aplicada = time.monotonic(), True
+                if aplicada and not recuperada and falha != "parada" and time.monotonic() >= fim_falha:
+                    if falha == "pausa":
+                        processos[indice_alvo].send_signal(signal.SIGCONT)
+                    else:
+                        processos[indice_alvo] = subir_no(os.path.join(pasta, f"No{alvo}"), registros, trava)
+                    ativos.add(indice_alvo)
+                    fim_falha, recuperada = time.monotonic(), True
+
+                for indice in sorted(ativos):
+                    destino = sorteio.choice([outro for outro in range(nos) if outro != indice])
+                    identificador = f"No{indice + 1}#{numero}"
+                    try:
+                        processos[indice].stdin.write(f"No{destino + 1} {identificador}\n")
+                        processos[indice].stdin.flush()
+                    except OSError:
+                        continue
+                    enviadas.add(identificador)
+                numero += 1
+                time.sleep(intervalo)
+
+            # Drenagem: o que ainda está nas filas pode ser entregue
+            limite = time.monotonic() + drenagem
+            while time.monotonic() < limite:
+                with trava:
+                    recebidas = {campos[-1] for _, campos in registros if campos[0] == "@RECEBIDA"}
+                if enviadas <= recebidas:
+                    break
+                time.sleep(0.2)
+
+            tokens_duplicados = 0
+            for indice in ativos:
+                try:
+                    metricas = ler_metricas(PORTA_BASE + 1000 + indice)
+                except OSError:
+                    continue
+                tokens_duplicados += sum(valor for (nome, _), valor in metricas.items() if nome == "anel_token_duplicados_total")
+        finally:
+            for processo in processos:
+                if processo.poll() is None:
+                    processo.send_signal(signal.SIGCONT)
+                    processo.kill()
+                    processo.wait()
+
+    with trava:
+        recepcoes = [(momento, campos[-1]) for momento, campos in registros if campos[0] == "@RECEBIDA"]
+        regeneracoes = [momento for momento, campos in registros if campos[0] == "@REGENERADO" and momento >= inicio_falha]
+        descartadas = sum(1 for _, campos in registros if campos[0] == "@DESCARTADA")
+    contagem = {}
+    for _, identificador in recepcoes:
+        contagem[identificador] = contagem.get(identificador, 0) + 1
+    instantes = [momento for momento, _ in recepcoes]
+    normal, _ = maior_intervalo(inicio, inicio_falha, instantes)
+    interrupcao, retomada = maior_intervalo(inicio_falha, fim_falha + observar, instantes)
+    arredondar = lambda valor: round(valor, 3) if valor is not None else None
+    return {
+        "nos": nos, "falha": falha, "alvo": f"No{alvo}",
+        "enviadas": len(enviadas), "recebidas": len(contagem),
+        "perdidas": len(enviadas - contagem.keys()),
+        "duplicadas": sum(vezes - 1 for vezes in contagem.values()),
+        "descartadas": descartadas,
+        "deteccao_s": arredondar(regeneracoes[0] - inicio_falha) if regeneracoes else None,
+        "regeneracoes": len(regeneracoes),
+        "interrupcao_normal_s": arredondar(normal),
+        "interrupcao_s": arredondar(interrupcao),
+        "retomada_s": arredondar(retomada - inicio_falha) if retomada is not None else None,
+        "tokens_duplicados": int(tokens_duplicados),
+    }
+
+
+def segundos(valor) -> str:
+    return "nunca" if valor is None else f"{valor}s"
+
+
+def valor(argumentos: list, opcao: str, padrao: str) -> str:
+    return argumentos[argumentos.index(opcao) + 1] if opcao in argumentos else padrao
+
+
+if __name__ == "__main__":
+    argumentos = sys.argv[1:]
+    if "--ajuda" in argumentos or "-h" in argumentos:
+        print(__doc__)
+        sys.exit(0)
+    falhas = lista(argumentos, "--falhas", "pausa,queda,parada", str)
+    if any(falha not in ("pausa", "queda", "parada") for falha in falhas):
+        print(__doc__)
+        sys.exit(1)
+
+    revisao = valor(argumentos, "--revisao", None)
+    codigo = codigo_do_no(revisao)
+    opcoes = [f"tempo_minimo_token={valor(argumentos, '--tempo-minimo', '0')}",
+              f"tempo_maximo_token={valor(argumentos, '--tempo-maximo', '15')}"]
+    if "--anel-duplo" in argumentos:
+        opcoes += [f"anel_duplo={valor(argumentos, '--anel-duplo', 'failover')}", "anterior={anterior}"]
+    parametros = {
+        "instante": float(valor(argumentos, "--instante", "10")),
+        "duracao": float(valor(argumentos, "--duracao", "10")),
+        "observar": float(valor(argumentos, "--observar", "30")),
+        "drenagem": float(valor(argumentos, "--drenagem", "20")),
+        "intervalo": float(valor(argumentos, "--intervalo", "1")),
+        "tempo": float(valor(argumentos, "--tempo", "0.3")),
+    }
+
+    cenarios = []
+    for nos, falha, alvo in itertools.product(lista(argumentos, "--nos", "3", int), falhas,
+                                              lista(argumentos, "--alvos", "2", int)):
+        print(f"Cenário: {nos} nós, {falha} de No{alvo}...", flush=True)
+        resultado = executar_falha(codigo, nos, falha, alvo, opcoes=tuple(opcoes), **parametros)
+        cenarios.append(resultado)
+        print(f"  detecção {segundos(resultado['deteccao_s'])} ({resultado['regeneracoes']} regenerações) | "
+              f"interrupção {segundos(resultado['interrupcao_s'])} (normal {segundos(resultado['interrupcao_normal_s'])}), "
+              f"retomada {segundos(resultado['retomada_s'])} | {resultado['recebidas']}/{resultado['enviadas']} recebidas, "
+              f"{resultado['perdidas']} perdidas, {resultado['duplicadas']} duplicadas | "
+              f"tokens duplicados {resultado['tokens_duplicados']}", flush=True)
+
+    if "--json" in argumentos:
+        with open(valor(argumentos, "--json", None), "w") as arquivo:
+            json.dump({"revisao": revisao or "árvore de trabalho", "opcoes": opcoes, "parametros": parametros,
+                       "cenarios": cenarios}, arquivo, indent=2, ensure_ascii=False)
+    if "--csv" in argumentos:
+        with open(valor(argumentos, "--csv", None), "w", newline="") as arquivo:
+            escritor = csv.DictWriter(arquivo, fieldnames=CAMPOS)
+            escritor.writeheader()
+            escritor.writerows(cenarios)
@@ -0,0 +1,75 @@
+"""
+Benchmark do tratamento de token com logging ligado e desligado
+
+Uso: python ferramentas/benchmark_logging.py [repeticoes]
+
+Copia o nó Computador1 para uma pasta temporária (para não sobrescrever os
+logs do projeto), importa o main.py e mede o tempo de tratar_datagrama()
+para tokens sintéticos com nivel_log=INFO e com o log desligado.
+"""
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NIVEIS = {"ligado": "INFO", "desligado": "CRITICAL"}
+
+
+def medir_no_processo(repeticoes: int):
+    """
+    Roda dentro da cópia do nó: trata tokens sintéticos e imprime os tempos (em segundos)
+    """
+    sys.path.insert(0, os.getcwd())
+    import main
+
+    anel = main.aneis[0]
+    tempos = []
+    for sequencia in range(1, repeticoes + 1):
+        anel.controle.ultimo_token_time = 0  # Evita o descarte por "token muito rápido"
+        token = f"9000:{sequencia}:{time.time()}:Benchmark"
+        inicio = time.perf_counter()
+        main.tratar_datagrama(token, ("127.0.0.1", 0))
+        tempos.append(time.perf_counter() - inicio)
+        anel.token_presente = False
+    print(json.dumps(tempos))
+
+
+def medir(nivel: str, repeticoes: int) -> list:
+    """
+    Executa a medição em um processo separado com o nível de log informado
+    """
+    with tempfile.TemporaryDirectory() as pasta:
+        shutil.copy(os.path.join(RAIZ, "Computador1", "main.py"), pasta)
+        with open(os.path.join(RAIZ, "Computador1", "config.txt")) as arquivo:
+            linhas = arquivo.read().splitlines()[:4]
+        linhas[3] = "false"  # Sem gerador: só o tratamento do token é medido
+        with open(os.path.join(pasta, "config.txt"), "w") as arquivo:
+            arquivo.write("\n".join(linhas + [f"nivel_log={nivel}"]))
+        saida = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--no", str(repeticoes)],
+            cwd=pasta, capture_output=True, text=True, check=True
+        )
+        return json.loads(saida.stdout.strip().splitlines()[-1])
+
+
+def resumir(tempos: list) -> str:
+    tempos_us = sorted(t * 1e6 for t in tempos)
+    p99 = tempos_us[int(len(tempos_us) * 0.99) - 1]
+    return (f"média {statistics.mean(tempos_us):8.1f} µs | "
+            f"mediana {statistics.median(tempos_us):8.1f} µs | p99 {p99:8.1f} µs")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--no":
+        medir_no_processo(int(sys.argv[2]))
+        sys.exit(0)
+
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print(f"Tratamento de token ({repeticoes} tokens por nível)")
+    for nome, nivel in NIVEIS.items():
+        print(f"- log {nome:9} ({nivel:8}): {resumir(medir(nivel, repeticoes))}")
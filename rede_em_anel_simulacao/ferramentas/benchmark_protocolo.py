@@ -0,0 +1,204 @@
+"""
+Microbenchmarks das funções quentes do protocolo
+
+Uso: python ferramentas/benchmark_protocolo.py [--repeticoes N] [--json saida.json]
+     python ferramentas/benchmark_protocolo.py --comparar antes.json depois.json
+
+Copia o nó Computador1 para uma pasta temporária (para não sobrescrever os
+logs do projeto), importa o main.py com o log desligado e mede cada função
+em várias repetições com o coletor de lixo desligado. Cada repetição roda
+laços suficientes para durar ao menos 50 ms. O resultado em JSON (mediana,
+mínimo e desvio por operação, além do commit) serve para comparar commits
+com --comparar.
+"""
+import gc
+import itertools
+import json
+import os
+import platform
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DURACAO_MINIMA = 0.05  # Duração mínima de uma repetição (em segundos)
+LIMIAR_MUDANCA = 0.05  # Diferença relativa a partir da qual a comparação aponta mudança
+TEXTO = "12:00:00 | Computador1 -> Computador2: " + "x" * 64
+
+
+def casos(main) -> dict:
+    """
+    Funções medidas, já preparadas com os dados de entrada (nome -> função sem argumentos)
+    """
+    token = main.Token()
+    token.sequencia = 12345
+    token.node_id = "Computador1"
+    token_str = token.to_string()
+
+    controle = main.ControleToken()
+
+    def processar_token():
+        controle.processar_token(token_str)
+        controle.tokens_recebidos.clear()  # Evita o descarte como duplicado na próxima chamada
+
+    def verificar_tempo_minimo():
+        controle.ultimo_token_time = 0
+        controle.verificar_tempo_minimo()
+
+    crc = main.calcular_crc(TEXTO)
+    quadro = main.montar_pacote("naoexiste", "Computador3", "Computador2", crc, TEXTO, {"ttl": 8})
+
+    def ler_quadro():
+        controle_quadro, origem, destino, crc_quadro, extensoes, texto = main.ler_pacote(quadro)
+        int(extensoes.get("ttl", main.TTL_MINIMO))
+
+    # Destino real no loopback para enviar_udp e para o repasse de quadros
+    destino = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    destino.bind(("127.0.0.1", 0))
+    porta = destino.getsockname()[1]
+    main.ip_destino, main.porta_destino = "127.0.0.1", porta
+    datagrama = f"PING:127.0.0.1:{porta}"
+
+    return {
+        "Token.to_string": token.to_string,
+        "Token.from_string": lambda: main.Token.from_string(token_str),
+        "ControleToken.processar_token": processar_token,
+        "ControleToken.verificar_tempo_minimo": verificar_tempo_minimo,
+        "calcular_crc": lambda: main.calcular_crc(TEXTO),
+        "inserir_erro": lambda: main.inserir_erro(TEXTO),
+        "ler_pacote (quadro do receptor)": ler_quadro,
+        "tratar_datagrama (quadro repassado)": lambda: main.tratar_datagrama(quadro, ("127.0.0.1", porta)),
+        "enviar_udp": lambda: main.enviar_udp("127.0.0.1", porta, datagrama),
+    }
+
+
+def medir_funcao(funcao, repeticoes: int) -> dict:
+    """
+    Mede uma função como o timeit: calibra os laços e repete com o coletor de lixo desligado
+    Returns:
+        Nanossegundos por operação (mediana, mínimo, desvio) e os laços por repetição
+    """
+    lacos = 1
+    while True:
+        inicio = time.perf_counter()
+        for _ in itertools.repeat(None, lacos):
+            funcao()
+        if time.perf_counter() - inicio >= DURACAO_MINIMA:
+            break
+        lacos *= 2
+
+    tempos = []
+    gc_ligado = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeticoes):
+            inicio = time.perf_counter_ns()
+            for _ in itertools.repeat(None, lacos):
+                funcao()
+            tempos.append((time.perf_counter_ns() - inicio) / lacos)
+    finally:
+        if gc_ligado:
+            gc.enable()
+    return {
+        "mediana_ns": statistics.median(tempos),
+        "minimo_ns": min(tempos),
+        "desvio_ns": statistics.stdev(tempos) if len(tempos) > 1 else 0.0,
+        "lacos": lacos,
+    }
+
+
+def medir_no_processo(repeticoes: int):
+    """
+    Roda dentro da cópia do nó e imprime os resultados em JSON
+    """
+    sys.path.insert(0, os.getcwd())
+    import main
+
+    resultados = {nome: medir_funcao(funcao, repeticoes) for nome, funcao in casos(main).items()}
+    print(json.dumps(resultados))
+
+
+def commit_atual() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconhecido"
+
+
+def medir(repeticoes: int) -> dict:
+    """
+    Executa as medições em um processo separado, com o log desligado
+    """
+    with tempfile.TemporaryDirectory() as pasta:
+        shutil.copy(os.path.join(RAIZ, "Computador1", "main.py"), pasta)
+        with open(os.path.join(RAIZ, "Computador1", "config.txt")) as arquivo:
+            linhas = arquivo.read().splitlines()[:4]
+        linhas[3] = "false"  # Sem gerador: o nó só repassa o que recebe
+        with open(os.path.join(pasta, "config.txt"), "w") as arquivo:
+            arquivo.write("\n".join(linhas + ["nivel_log=CRITICAL"]))
+        saida = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--no", str(repeticoes)],
+            cwd=pasta, capture_output=True, text=True, check=True
+        )
+    return {
+        "commit": commit_atual(),
+        "python": platform.python_version(),
+        "maquina": platform.machine(),
+        "repeticoes": repeticoes,
+        "resultados": json.loads(saida.stdout.strip().splitlines()[-1]),
+    }
+
+
+def mostrar(medicao: dict):
+    print(f"Commit {medicao['commit']} | Python {medicao['python']} | {medicao['repeticoes']} repetições")
+    print(f"{'função':40} {'mediana':>12} {'mínimo':>12} {'desvio':>8}")
+    for nome, resultado in medicao["resultados"].items():
+        desvio = 100 * resultado["desvio_ns"] / resultado["mediana_ns"]
+        print(f"{nome:40} {resultado['mediana_ns']:9.0f} ns {resultado['minimo_ns']:9.0f} ns {desvio:7.1f}%")
+
+
+def comparar(antes: dict, depois: dict):
+    """
+    Compara duas medições pela mediana; mudanças acima do limiar e do ruído são destacadas
+    """
+    print(f"Comparação {antes['commit']} -> {depois['commit']} (mediana por operação)")
+    for nome, resultado in depois["resultados"].items():
+        anterior = antes["resultados"].get(nome)
+        if anterior is None:
+            print(f"{nome:40} {'-':>12} {resultado['mediana_ns']:9.0f} ns  (novo)")
+            continue
+        razao = resultado["mediana_ns"] / anterior["mediana_ns"]
+        ruido = (resultado["desvio_ns"] + anterior["desvio_ns"]) / anterior["mediana_ns"]
+        marca = ""
+        if abs(razao - 1) > max(LIMIAR_MUDANCA, ruido):
+            marca = "  ⬆️ mais lento" if razao > 1 else "  ⬇️ mais rápido"
+        print(f"{nome:40} {anterior['mediana_ns']:9.0f} ns {resultado['mediana_ns']:9.0f} ns {razao:6.2f}x{marca}")
+
+
+if __name__ == "__main__":
+    argumentos = sys.argv[1:]
+    if len(argumentos) > 1 and argumentos[0] == "--no":
+        medir_no_processo(int(argumentos[1]))
+        sys.exit(0)
+
+    if argumentos[:1] == ["--comparar"]:
+        if len(argumentos) != 3:
+            print(__doc__)
+            sys.exit(1)
+        with open(argumentos[1]) as arquivo_antes, open(argumentos[2]) as arquivo_depois:
+            comparar(json.load(arquivo_antes), json.load(arquivo_depois))
+        sys.exit(0)
+
+    repeticoes = int(argumentos[argumentos.index("--repeticoes") + 1]) if "--repeticoes" in argumentos else 11
+    medicao = medir(repeticoes)
+    mostrar(medicao)
+    if "--json" in argumentos:
+        caminho = argumentos[argumentos.index("--json") + 1]
+        with open(caminho, "w") as arquivo:
+            json.dump(medicao, arquivo, indent=2, ensure_ascii=False)
+        print(f"\nResultados salvos em {caminho}")
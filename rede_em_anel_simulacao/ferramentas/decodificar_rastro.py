@@ -0,0 +1,61 @@
+"""
+Decodifica o rastro binário de eventos gravado por um nó (rastro_<apelido>.bin)
+
+Uso: python ferramentas/decodificar_rastro.py rastro_Computador1.bin [--csv]
+
+O rastro é gravado pela opção 6 do menu, pelo sinal SIGUSR1 ou automaticamente
+quando uma thread do nó falha.
+"""
+import csv
+import mmap
+import struct
+import sys
+
+FORMATO_EVENTO = struct.Struct("<dBI16s16s")
+CABECALHO_RASTRO = struct.Struct("<8sIIQI")
+
+
+def ler_rastro(caminho: str):
+    """
+    Lê o arquivo de rastro
+    Returns:
+        Tupla (total de eventos registrados, lista de eventos)
+        Cada evento: (instante, tipo, valor, origem, destino)
+    """
+    with open(caminho, "rb") as arquivo:
+        with mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+            assinatura, tamanho_registro, quantidade, total, tamanho_nomes = CABECALHO_RASTRO.unpack_from(mapa)
+            if assinatura.rstrip(b"\0") != b"RASTRO1" or tamanho_registro != FORMATO_EVENTO.size:
+                raise ValueError(f"{caminho} não é um rastro de eventos compatível")
+            inicio = CABECALHO_RASTRO.size
+            nomes = mapa[inicio:inicio + tamanho_nomes].decode().split(",")
+            inicio += tamanho_nomes
+            eventos = []
+            for instante, tipo, valor, origem, destino in FORMATO_EVENTO.iter_unpack(
+                    mapa[inicio:inicio + quantidade * FORMATO_EVENTO.size]):
+                eventos.append((
+                    instante,
+                    nomes[tipo] if tipo < len(nomes) else str(tipo),
+                    valor,
+                    origem.rstrip(b"\0").decode(errors="replace"),
+                    destino.rstrip(b"\0").decode(errors="replace"),
+                ))
+    return total, eventos
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    total, eventos = ler_rastro(sys.argv[1])
+    if "--csv" in sys.argv:
+        escritor = csv.writer(sys.stdout)
+        escritor.writerow(["instante", "evento", "valor", "origem", "destino"])
+        escritor.writerows(eventos)
+        sys.exit(0)
+
+    print(f"{len(eventos)} eventos (de {total} registrados)")
+    inicio = eventos[0][0] if eventos else 0
+    for instante, tipo, valor, origem, destino in eventos:
+        print(f"+{instante - inicio:10.6f}s  {tipo:20} {valor:>8}  {origem:>16} -> {destino}")
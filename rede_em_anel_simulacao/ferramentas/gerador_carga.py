@@ -0,0 +1,228 @@
+"""
+Gerador de carga para o anel (laço aberto ou fechado)
+
+Uso: python ferramentas/gerador_carga.py [--nos 3] [--modo aberto|fechado] [--duracao 60]
+                                         [--taxa 2] [--chegadas poisson|constante] [--pendentes 2]
+                                         [--destinos uniforme|vizinho|zipf:1.2|No2] [--tamanhos 32|16-256|32,512]
+                                         [--tempo 0.3] [--drenagem 30] [--opcao chave=valor ...]
+                                         [--semente 1] [--revisao REV] [--json resumo.json] [--csv mensagens.csv]
+
+Sobe um anel sem interface no loopback (como o benchmark_anel.py) e gera carga:
+- aberto: mensagens chegam à taxa --taxa (mensagens/s no anel todo), em
+  intervalos constantes ou exponenciais (Poisson), cada uma em um nó de origem
+  sorteado, independentemente de o anel dar conta delas
+- fechado: cada nó mantém --pendentes mensagens em andamento e envia a próxima
+  assim que uma termina (ACK ou descarte)
+Os destinos seguem a distribuição --destinos (uniforme entre os demais, o
+próximo nó, Zipf pela distância no anel ou sempre o mesmo nó) e os tamanhos
+vêm de --tamanhos (fixo, intervalo ou lista).
+
+A latência de cada mensagem é medida a partir do instante em que ela deveria
+ter sido enviada pelo cronograma (correção da omissão coordenada): quando o
+anel atrasa, a fila cheia do nó segura as próximas mensagens, e medir a partir
+da entrada na fila (a latência de serviço, também mostrada) esconderia essa
+espera. Mensagens ainda pendentes ao fim da drenagem entram na latência
+corrigida com o tempo que já esperaram (limite inferior).
+
+Os nós usam tempo_minimo_token=0 (--opcao tempo_minimo_token=N muda): no
+loopback o token volta ao gerador antes do mínimo padrão (0.5s), seria
+descartado a cada volta e a carga mediria a regeneração pelo timeout.
+"""
+import csv
+import json
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from benchmark_anel import RESULTADOS, aguardar_descoberta, codigo_do_no, percentil, subir_anel
+
+CAMPOS = ["id", "origem", "destino", "tamanho", "previsto_s", "enviado_s", "concluido_s", "resultado",
+          "latencia_corrigida_ms", "latencia_servico_ms"]
+
+
+def sorteador_destinos(especificacao: str, nos: int, sorteio: random.Random):
+    """
+    Função (índice da origem) -> índice do destino, conforme a distribuição pedida
+    """
+    if especificacao == "uniforme":
+        return lambda origem: sorteio.choice([outro for outro in range(nos) if outro != origem])
+    if especificacao == "vizinho":
+        return lambda origem: (origem + 1) % nos
+    if especificacao.startswith("zipf"):
+        expoente = float(especificacao.partition(":")[2] or 1.0)
+        pesos = [1 / distancia ** expoente for distancia in range(1, nos)]
+        return lambda origem: (origem + sorteio.choices(range(1, nos), pesos)[0]) % nos
+    fixo = int(especificacao.removeprefix("No")) - 1
+    uniforme = sorteador_destinos("uniforme", nos, sorteio)
+    return lambda origem: fixo if origem != fixo else uniforme(origem)
+
+
+def sorteador_tamanhos(especificacao: str, sorteio: random.Random):
+    if "-" in especificacao:
+        menor, maior = (int(parte) for parte in especificacao.split("-"))
+        return lambda: sorteio.randint(menor, maior)
+    tamanhos = [int(parte) for parte in especificacao.split(",")]
+    return lambda: sorteio.choice(tamanhos)
+
+
+def gerar_carga(codigo: str, nos: int, modo: str, duracao: float, taxa: float, chegadas: str,
+                pendentes: int, destinos: str, tamanhos: str, tempo: float, drenagem: float,
+                opcoes: tuple, semente: int) -> list:
+    """
+    Executa a carga e devolve o registro de cada mensagem oferecida
+    """
+    sorteio = random.Random(semente)
+    destino_de = sorteador_destinos(destinos, nos, sorteio)
+    tamanho = sorteador_tamanhos(tamanhos, sorteio)
+    registros, trava = [], threading.Lock()
+    mensagens = {}  # Identificador -> registro
+    em_andamento = [0] * nos
+    with tempfile.TemporaryDirectory() as pasta:
+        processos = []
+        try:
+            processos = subir_anel(codigo, pasta, nos, tempo, 0.0, registros, trava, opcoes)
+            aguardar_descoberta(nos)
+
+            def enviar(origem: int, previsto: float):
+                numero = len(mensagens)
+                identificador = f"No{origem + 1}#{numero}"
+                destino = destino_de(origem)
+                texto = f"{identificador}:" + "x" * max(0, tamanho() - len(identificador) - 1)
+                processos[origem].stdin.write(f"No{destino + 1} {texto}\n")
+                processos[origem].stdin.flush()
+                mensagens[identificador] = {
+                    "id": identificador, "origem": f"No{origem + 1}", "destino": f"No{destino + 1}",
+                    "tamanho": len(texto), "previsto": previsto, "enviado": time.monotonic(),
+                    "concluido": None, "resultado": None, "servico": None,
+                }
+                em_andamento[origem] += 1
+
+            inicio = time.monotonic()
+            fim_carga = inicio + duracao
+            proxima = inicio
+            lidos = 0
+            while True:
+                agora = time.monotonic()
+                with trava:
+                    novos = registros[lidos:]
+                    lidos = len(registros)
+                for momento, campos in novos:
+                    if campos[0] not in RESULTADOS:
+                        continue
+                    mensagem = mensagens.get(campos[-1].split(":", 1)[0])
+                    if mensagem is None or mensagem["concluido"] is not None:
+                        continue
+                    mensagem["concluido"] = momento
+                    mensagem["resultado"] = "entregue" if campos[0] == "@ENTREGUE" else f"descartada ({campos[2]})"
+                    if campos[0] == "@ENTREGUE":
+                        mensagem["servico"] = float(campos[2])
+                    em_andamento[int(mensagem["origem"][2:]) - 1] -= 1
+
+                if agora < fim_carga:
+                    if modo == "aberto":
+                        # Envia tudo o que o cronograma já previa, mesmo atrasado
+                        while proxima <= agora and proxima < fim_carga:
+                            enviar(sorteio.randrange(nos), proxima)
+                            proxima += sorteio.expovariate(taxa) if chegadas == "poisson" else 1 / taxa
+                    else:
+                        for origem in range(nos):
+                            while em_andamento[origem] < pendentes:
+                                enviar(origem, time.monotonic())
+                elif not any(em_andamento) or agora >= fim_carga + drenagem:
+                    break
+                time.sleep(0.005)
+        finally:
+            for processo in processos:
+                processo.kill()
+                processo.wait()
+
+    fim = time.monotonic()
+    for mensagem in mensagens.values():
+        concluido = mensagem["concluido"]
+        mensagem["latencia_corrigida"] = (concluido if concluido is not None else fim) - mensagem["previsto"]
+        for campo in ("previsto", "enviado", "concluido"):
+            if mensagem[campo] is not None:
+                mensagem[campo] -= inicio
+    return list(mensagens.values())
+
+
+def resumir(mensagens: list, duracao: float) -> dict:
+    entregues = [mensagem for mensagem in mensagens if mensagem["resultado"] == "entregue"]
+    pendentes = [mensagem for mensagem in mensagens if mensagem["resultado"] is None]
+    corrigidas = [1000 * mensagem["latencia_corrigida"] for mensagem in entregues + pendentes]
+    servico = [1000 * mensagem["servico"] for mensagem in entregues]
+    fim = max((mensagem["concluido"] for mensagem in entregues), default=duracao)
+
+    def percentis(valores: list) -> dict:
+        return {nome: round(percentil(valores, q), 3) for nome, q in
+                (("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("p999", 0.999), ("max", 1.0))}
+
+    return {
+        "oferecidas": len(mensagens), "entregues": len(entregues), "pendentes": len(pendentes),
+        "descartadas": len(mensagens) - len(entregues) - len(pendentes),
+        "taxa_oferecida": round(len(mensagens) / duracao, 3),
+        "vazao": round(len(entregues) / max(fim, 1e-9), 3),
+        "latencia_corrigida_ms": percentis(corrigidas),
+        "latencia_servico_ms": percentis(servico),
+    }
+
+
+def valor(argumentos: list, opcao: str, padrao: str) -> str:
+    return argumentos[argumentos.index(opcao) + 1] if opcao in argumentos else padrao
+
+
+if __name__ == "__main__":
+    argumentos = sys.argv[1:]
+    modo = valor(argumentos, "--modo", "aberto")
+    chegadas = valor(argumentos, "--chegadas", "poisson")
+    if modo not in ("aberto", "fechado") or chegadas not in ("poisson", "constante") or "--ajuda" in argumentos:
+        print(__doc__)
+        sys.exit(1)
+
+    revisao = valor(argumentos, "--revisao", None)
+    # As opções de --opcao vêm depois e prevalecem (no config.txt vale a última linha de cada chave)
+    opcoes = ("tempo_minimo_token=0",) + tuple(
+        argumentos[indice + 1] for indice, argumento in enumerate(argumentos) if argumento == "--opcao")
+    parametros = {
+        "nos": int(valor(argumentos, "--nos", "3")), "modo": modo,
+        "duracao": float(valor(argumentos, "--duracao", "60")),
+        "taxa": float(valor(argumentos, "--taxa", "2")), "chegadas": chegadas,
+        "pendentes": int(valor(argumentos, "--pendentes", "2")),
+        "destinos": valor(argumentos, "--destinos", "uniforme"),
+        "tamanhos": valor(argumentos, "--tamanhos", "32"),
+        "tempo": float(valor(argumentos, "--tempo", "0.3")),
+        "drenagem": float(valor(argumentos, "--drenagem", "30")),
+        "opcoes": opcoes, "semente": int(valor(argumentos, "--semente", "1")),
+    }
+    mensagens = gerar_carga(codigo_do_no(revisao), **parametros)
+    resumo = resumir(mensagens, parametros["duracao"])
+
+    if modo == "aberto":
+        print(f"Carga aberta ({chegadas}, {parametros['taxa']}/s) em {parametros['nos']} nós por {parametros['duracao']:.0f}s")
+    else:
+        print(f"Carga fechada ({parametros['pendentes']} pendentes por nó) em {parametros['nos']} nós por {parametros['duracao']:.0f}s")
+    print(f"Oferecidas: {resumo['oferecidas']} ({resumo['taxa_oferecida']}/s) | entregues: {resumo['entregues']} | "
+          f"descartadas: {resumo['descartadas']} | pendentes: {resumo['pendentes']} | vazão: {resumo['vazao']} entregas/s")
+    for nome, chave in (("corrigida", "latencia_corrigida_ms"), ("de serviço", "latencia_servico_ms")):
+        print(f"Latência {nome} (ms): " + " | ".join(f"{p} {v:.1f}" for p, v in resumo[chave].items()))
+
+    if "--json" in argumentos:
+        with open(valor(argumentos, "--json", None), "w") as arquivo:
+            json.dump({"revisao": revisao or "árvore de trabalho", "parametros": parametros, "resumo": resumo},
+                      arquivo, indent=2, ensure_ascii=False)
+    if "--csv" in argumentos:
+        with open(valor(argumentos, "--csv", None), "w", newline="") as arquivo:
+            escritor = csv.DictWriter(arquivo, fieldnames=CAMPOS)
+            escritor.writeheader()
+            for mensagem in mensagens:
+                escritor.writerow({
+                    "id": mensagem["id"], "origem": mensagem["origem"], "destino": mensagem["destino"],
+                    "tamanho": mensagem["tamanho"], "previsto_s": round(mensagem["previsto"], 6),
+                    "enviado_s": round(mensagem["enviado"], 6),
+                    "concluido_s": round(mensagem["concluido"], 6) if mensagem["concluido"] is not None else "",
+                    "resultado": mensagem["resultado"] or "pendente",
+                    "latencia_corrigida_ms": round(1000 * mensagem["latencia_corrigida"], 3),
+                    "latencia_servico_ms": round(1000 * mensagem["servico"], 3) if mensagem["servico"] is not None else "",
+                })
@@ -0,0 +1,223 @@
+"""
+Reprodução de capturas de datagramas (opção captura=arquivo do nó)
+
+Uso: python ferramentas/reproduzir_captura.py CAPTURA [--resumo]
+     python ferramentas/reproduzir_captura.py CAPTURA --no IP:PORTA [--ponte IP:PORTA] [--velocidade 1]
+     python ferramentas/reproduzir_captura.py CAPTURA --direto [--velocidade 0] [--repeticoes 5] [--json saida.json]
+
+Sem modo, mostra o resumo da captura: duração, taxa e tamanhos por tipo de
+datagrama (token, quadro de dados, controle da rede).
+
+--no reenvia os datagramas por UDP a um nó em execução (os que chegaram pela
+ponte vão para --ponte, se informada), respeitando os intervalos originais
+divididos por --velocidade; com --velocidade 0 envia o mais rápido possível.
+
+--direto mede o caminho de recepção sem rede: em um processo novo a cada
+repetição (cópia do Computador1 com o apelido da captura, sem gerador e com
+o log desligado), entrega cada datagrama a tratar_datagrama, como faria o
+receptor(), e mede o tempo de cada chamada. Se a captura tem datagramas que
+chegaram pela ponte, a cópia é configurada como ponte (anel da ponte criado). Os envios do nó vão para um
+socket local descartado, nunca para os endereços da captura. Com a mesma
+captura e --velocidade 0 a entrada é idêntica em todas as repetições, o que
+permite comparar commits pela vazão (datagramas/s) e pela latência por tipo.
+"""
+import json
+import os
+import shutil
+import socket
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Mesmo formato de CapturaDatagramas no main.py
+CABECALHO_CAPTURA = struct.Struct("<8sdH")
+FORMATO_CAPTURA = struct.Struct("<Q?4sHH")
+ASSINATURA = b"ANELCAP1"
+TIPOS = {"9000": "token", "7777": "quadro"}
+
+
+def ler_captura(caminho: str) -> tuple:
+    """
+    Lê uma captura; um registro final incompleto (nó encerrado no meio da escrita) é ignorado
+    Returns:
+        (apelido, instante de parede do início, lista de (ns, pela_ponte, (ip, porta), dados))
+    """
+    with open(caminho, "rb") as arquivo:
+        conteudo = arquivo.read()
+    if len(conteudo) < CABECALHO_CAPTURA.size or conteudo[:8] != ASSINATURA:
+        raise ValueError(f"{caminho} não é uma captura do anel")
+    _, inicio, tamanho_apelido = CABECALHO_CAPTURA.unpack_from(conteudo)
+    posicao = CABECALHO_CAPTURA.size
+    apelido = conteudo[posicao:posicao + tamanho_apelido].decode()
+    posicao += tamanho_apelido
+    registros = []
+    while posicao + FORMATO_CAPTURA.size <= len(conteudo):
+        instante, pela_ponte, ip, porta, tamanho = FORMATO_CAPTURA.unpack_from(conteudo, posicao)
+        posicao += FORMATO_CAPTURA.size
+        if posicao + tamanho > len(conteudo):
+            break
+        registros.append((instante, pela_ponte, (socket.inet_ntoa(ip), porta), conteudo[posicao:posicao + tamanho]))
+        posicao += tamanho
+    return apelido, inicio, registros
+
+
+def tipo_datagrama(dados: bytes) -> str:
+    prefixo = dados.split(b":", 1)[0].decode(errors="replace")
+    return TIPOS.get(prefixo, prefixo)
+
+
+def resumir(apelido: str, inicio: float, registros: list):
+    duracao = (registros[-1][0] - registros[0][0]) / 1e9 if len(registros) > 1 else 0.0
+    print(f"Captura de {apelido} iniciada em {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(inicio))}")
+    print(f"{len(registros)} datagramas em {duracao:.1f}s"
+          + (f" ({len(registros) / duracao:.1f}/s)" if duracao else "")
+          + f", {sum(1 for registro in registros if registro[1])} pela ponte")
+    por_tipo = {}
+    for _, _, _, dados in registros:
+        por_tipo.setdefault(tipo_datagrama(dados), []).append(len(dados))
+    print(f"{'tipo':12} {'quantidade':>10} {'bytes médio':>12} {'bytes máx':>10}")
+    for tipo, tamanhos in sorted(por_tipo.items(), key=lambda item: -len(item[1])):
+        print(f"{tipo:12} {len(tamanhos):10} {statistics.fmean(tamanhos):12.1f} {max(tamanhos):10}")
+
+
+def endereco(texto: str) -> tuple:
+    ip, porta = texto.rsplit(":", 1)
+    return ip, int(porta)
+
+
+def reenviar(registros: list, no: tuple, ponte: tuple, velocidade: float):
+    """
+    Reenvia os datagramas por UDP respeitando os intervalos originais (divididos pela velocidade)
+    """
+    socket_udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    inicio = time.monotonic()
+    primeiro = registros[0][0] if registros else 0
+    enviados = 0
+    for instante, pela_ponte, _, dados in registros:
+        if pela_ponte and ponte is None:
+            continue
+        if velocidade > 0:
+            espera = (instante - primeiro) / 1e9 / velocidade - (time.monotonic() - inicio)
+            if espera > 0:
+                time.sleep(espera)
+        socket_udp.sendto(dados, ponte if pela_ponte else no)
+        enviados += 1
+    socket_udp.close()
+    decorrido = time.monotonic() - inicio
+    print(f"📤 {enviados} datagramas reenviados em {decorrido:.2f}s ({enviados / max(decorrido, 1e-9):.0f}/s)")
+
+
+def reproduzir_no_processo(caminho: str, velocidade: float):
+    """
+    Roda dentro da cópia do nó: entrega a captura a tratar_datagrama e imprime os tempos em JSON
+    """
+    sys.path.insert(0, os.getcwd())
+    import main
+
+    _, _, registros = ler_captura(caminho)
+    sumidouro = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sumidouro.bind(("127.0.0.1", 0))
+    porta_sumidouro = sumidouro.getsockname()[1]
+    enviar_udp = main.enviar_udp
+    main.enviar_udp = lambda ip, porta, mensagem: enviar_udp("127.0.0.1", porta_sumidouro, mensagem)
+
+    tempos = {}
+    saida = sys.stdout
+    sys.stdout = open(os.devnull, "w")  # Os prints do nó (@RECEBIDA, ...) não entram na medição
+    try:
+        inicio = time.perf_counter_ns()
+        primeiro = registros[0][0] if registros else 0
+        for instante, pela_ponte, remetente, dados in registros:
+            if velocidade > 0:
+                espera = (instante - primeiro) / 1e9 / velocidade - (time.perf_counter_ns() - inicio) / 1e9
+                if espera > 0:
+                    time.sleep(espera)
+            antes = time.perf_counter_ns()
+            main.tratar_datagrama(dados.decode(), remetente, pela_ponte=pela_ponte)
+            tempos.setdefault(tipo_datagrama(dados), []).append(time.perf_counter_ns() - antes)
+        total = time.perf_counter_ns() - inicio
+    finally:
+        sys.stdout.close()
+        sys.stdout = saida
+    processamento = sum(sum(valores) for valores in tempos.values())
+    print(json.dumps({
+        "datagramas": len(registros), "total_ns": total, "processamento_ns": processamento,
+        "por_tipo": {tipo: {"quantidade": len(valores), "mediana_ns": statistics.median(valores),
+                            "maximo_ns": max(valores)} for tipo, valores in tempos.items()},
+    }))
+
+
+def reproduzir_direto(caminho: str, apelido: str, velocidade: float, repeticoes: int, ponte: bool) -> list:
+    """
+    Uma reprodução direta por repetição, cada uma em um processo novo (estado do nó zerado)
+    """
+    resultados = []
+    for _ in range(repeticoes):
+        with tempfile.TemporaryDirectory() as pasta:
+            shutil.copy(os.path.join(RAIZ, "Computador1", "main.py"), pasta)
+            linhas = ["127.0.0.1:9", apelido, "10", "false", "porta=0", "interface=false", "nivel_log=CRITICAL"]
+            if ponte:
+                linhas += ["ponte=127.0.0.1:9", "ponte_porta=0"]  # Sem o anel da ponte, pela_ponte=True falharia
+            if velocidade == 0:
+                linhas.append("tempo_minimo_token=0")  # Tokens seguidos não são descartados por chegarem rápido demais
+            with open(os.path.join(pasta, "config.txt"), "w") as arquivo:
+                arquivo.write("\n".join(linhas))
+            saida = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), os.path.abspath(caminho), "--no-processo", str(velocidade)],
+                cwd=pasta, capture_output=True, text=True, check=True
+            )
+        resultados.append(json.loads(saida.stdout.strip().splitlines()[-1]))
+    return resultados
+
+
+def valor(argumentos: list, opcao: str, padrao: str) -> str:
+    return argumentos[argumentos.index(opcao) + 1] if opcao in argumentos else padrao
+
+
+if __name__ == "__main__":
+    argumentos = sys.argv[1:]
+    if not argumentos or argumentos[0].startswith("--"):
+        print(__doc__)
+        sys.exit(1)
+    caminho = argumentos[0]
+    if argumentos[1:2] == ["--no-processo"]:
+        reproduzir_no_processo(caminho, float(argumentos[2]))
+        sys.exit(0)
+
+    try:
+        apelido, inicio, registros = ler_captura(caminho)
+    except (OSError, ValueError) as erro:
+        print(f"[ERRO] {erro}")
+        sys.exit(1)
+
+    if "--no" in argumentos:
+        ponte = endereco(valor(argumentos, "--ponte", None)) if "--ponte" in argumentos else None
+        reenviar(registros, endereco(valor(argumentos, "--no", None)), ponte, float(valor(argumentos, "--velocidade", "1")))
+    elif "--direto" in argumentos:
+        velocidade = float(valor(argumentos, "--velocidade", "0"))
+        repeticoes = int(valor(argumentos, "--repeticoes", "5"))
+        resultados = reproduzir_direto(caminho, apelido, velocidade, repeticoes,
+                                       any(pela_ponte for _, pela_ponte, _, _ in registros))
+        vazoes = [resultado["datagramas"] / (resultado["processamento_ns"] / 1e9) for resultado in resultados]
+        print(f"Reprodução direta de {len(registros)} datagramas ({apelido}), {repeticoes} repetições, "
+              f"velocidade {'máxima' if velocidade == 0 else f'{velocidade:g}x'}")
+        print(f"Vazão de tratar_datagrama: mediana {statistics.median(vazoes):.0f} datagramas/s "
+              f"(mín {min(vazoes):.0f}, máx {max(vazoes):.0f})")
+        print(f"{'tipo':12} {'quantidade':>10} {'mediana':>12} {'máximo':>12}")
+        for tipo in resultados[0]["por_tipo"]:
+            medidas = [resultado["por_tipo"][tipo] for resultado in resultados]
+            print(f"{tipo:12} {medidas[0]['quantidade']:10} "
+                  f"{statistics.median(medida['mediana_ns'] for medida in medidas) / 1000:9.1f} µs "
+                  f"{max(medida['maximo_ns'] for medida in medidas) / 1000:9.1f} µs")
+        if "--json" in argumentos:
+            with open(valor(argumentos, "--json", None), "w") as arquivo:
+                json.dump({"captura": os.path.abspath(caminho), "apelido": apelido, "velocidade": velocidade,
+                           "vazao_mediana": statistics.median(vazoes), "repeticoes": resultados},
+                          arquivo, indent=2, ensure_ascii=False)
+    else:
+        resumir(apelido, inicio, registros)
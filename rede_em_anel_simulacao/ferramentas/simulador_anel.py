@@ -0,0 +1,639 @@
+"""
+Simulação de eventos discretos do anel com relógio virtual
+
+Uso: python ferramentas/simulador_anel.py [--nos 3] [--modo aberto|fechado] [--duracao 60]
+                                          [--taxa 2] [--chegadas poisson|constante] [--pendentes 2]
+                                          [--destinos uniforme|vizinho|zipf:1.2|No2] [--tempo 0.3]
+                                          [--drenagem 30] [--atraso 0.0005] [--perda 0]
+                                          [--falha queda:No2:10[:5]] [--falha saida:No3:20]
+                                          [--opcao chave=valor ...] [--semente 1] [--json resumo.json]
+     python ferramentas/simulador_anel.py --comparar resumo_real.json [--atraso 0.0005] [--semente 1]
+
+Reproduz a lógica do protocolo do main.py sob um escalonador de eventos
+discretos: o relógio é virtual e avança direto para o próximo evento, então
+horas de tráfego e milhares de nós levam segundos. O que é modelado:
+- o laço do gerenciador: cada nó age em batidas a cada 0.1s (com fase sorteada);
+  o token recebido só é usado ou repassado na batida seguinte
+- o controle do token do ControleToken: descarte pelo tempo mínimo, duplicados
+  pela sequência (com a limpeza das sequências guardadas), timeout do gerador
+  e regeneração saltando uma sequência por nó conhecido
+- a fila de TAMANHO_FILA mensagens por nó (a entrada espera vaga), uma mensagem
+  por visita do token; sem resposta no tempo do token, o token segue e a cabeça
+  da fila é reenviada na visita seguinte. Erro inserido com probabilidade_erro e
+  NACK com até MAX_TENTATIVAS retransmissões; o ACK retira a cabeça da fila e a
+  resposta de uma cópia já tratada é ignorada, como no nó
+- os quadros percorrem o anel com TTL e o gerador como monitor (marca na primeira
+  passagem, descarta órfãos na segunda); ACK/NACK vão direto à origem
+- enlaces com atraso por salto sorteado entre metade e 1,5x --atraso e perda de
+  cada datagrama com probabilidade --perda
+- falhas: queda:NoK:instante[:duração] (o nó some; com duração, volta com estado
+  zerado e, se for o gerador configurado, gera um novo token 2s depois, como na
+  partida) e saida:NoK:instante (saída graciosa: o LEAVE religa o antecessor e
+  passa o papel de gerador ao sucessor)
+
+Não são modelados a descoberta (os nós já se conhecem, como após a espera do
+benchmark_anel.py), o anel duplo, as pontes, a entrega direta e o custo de
+CPU. O caminho de um quadro é calculado na partida, com o anel daquele instante.
+Das opções do nó, valem tempo_minimo_token (padrão 0, como no
+gerador_carga.py), tempo_maximo_token e probabilidade_erro (padrão 0).
+
+As constantes e as regras puras do protocolo (TTL inicial, marca do monitor)
+vêm de uma cópia do main.py do Computador1, importada com o log desligado como
+no benchmark_protocolo.py. Na partida, o ControleToken dessa cópia e as regras
+do token do simulador são conferidos nos mesmos casos; se divergirem (o main.py
+mudou e o simulador não acompanhou), a simulação não roda (código de saída 1).
+
+O resumo é o mesmo do gerador_carga.py (vazão, latência corrigida e de
+serviço), mais as estatísticas do token. --comparar lê o --json de uma execução
+real do gerador_carga.py, simula os mesmos parâmetros e mostra os dois lado a lado.
+"""
+import atexit
+import contextlib
+import heapq
+import io
+import itertools
+import json
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import deque
+
+from benchmark_anel import codigo_do_no
+from gerador_carga import resumir, sorteador_destinos, sorteador_tamanhos
+
+
+def carregar_main():
+    """
+    Importa uma cópia do main.py do Computador1 (para não sobrescrever os logs do
+    projeto) com o log desligado; o nó não sobe, só o módulo é carregado
+    """
+    pasta = tempfile.mkdtemp(prefix="simulador_anel_")
+    atexit.register(shutil.rmtree, pasta, ignore_errors=True)
+    with open(os.path.join(pasta, "main.py"), "w", encoding="utf-8") as arquivo:
+        arquivo.write(codigo_do_no())
+    with open(os.path.join(pasta, "config.txt"), "w") as arquivo:
+        arquivo.write("\n".join(["127.0.0.1:6001", "No1", "1", "false", "interface=false", "nivel_log=CRITICAL"]))
+    diretorio = os.getcwd()
+    os.chdir(pasta)
+    sys.path.insert(0, pasta)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):  # "Configuração carregada: ..."
+            import main
+    finally:
+        sys.path.remove(pasta)
+        os.chdir(diretorio)
+    return main
+
+
+main = carregar_main()
+MAX_TENTATIVAS = main.MAX_TENTATIVAS
+TAMANHO_FILA = main.TAMANHO_FILA
+PAUSA_GERENCIADOR = main.PAUSA_GERENCIADOR
+ESPERA_GERADOR = main.ESPERA_GERADOR
+LIMPEZA_TOKENS = main.controle_token.tempo_limpeza
+MAX_TOKENS_ARMAZENADOS = main.controle_token.max_tokens_armazenados
+ENCERRAMENTO = 0.5  # Após concluir a saída o processo ainda repassa o que chega (metade do time.sleep(1) do laço principal)
+INICIO_CARGA = ESPERA_GERADOR + 1  # A carga começa com o token já circulando
+
+
+class No:
+    """
+    Estado de um nó simulado (o equivalente às globais e ao Anel primário do main.py)
+    """
+    def __init__(self, indice: int, proximo: int, gerador: bool, fase: float, agora: float):
+        self.indice = indice
+        self.nome = f"No{indice + 1}"
+        self.proximo = proximo
+        self.gerador_configurado = gerador
+        self.reiniciar(fase, agora, set())
+
+    def reiniciar(self, fase: float, agora: float, removidos: set):
+        self.vivo = True
+        self.geracao = getattr(self, "geracao", -1) + 1  # Eventos de uma vida anterior são ignorados
+        self.gerador = self.gerador_configurado
+        self.fase = fase
+        self.removidos = set(removidos)  # Nós que este nó sabe que saíram
+        self.fila = []  # [mensagem, reenviado, tentativas]
+        self.entrada = deque()  # Mensagens esperando vaga na fila
+        self.token_presente = False
+        self.aguardando_resposta = False  # Quadro enviado com o token atual ainda sem ACK/NACK
+        self.sequencia = 0
+        self.tokens_recebidos = {}  # Sequência -> instante (em ordem de chegada)
+        self.ultima_passagem = self.ultimo_token = agora
+        self.proximo_envio = 0.0
+        self.ultima_chegada = None
+        self.batidas = set()
+        self.saindo = False
+        self.saiu = None
+
+
+class Simulador:
+    def __init__(self, nos: int, tempo: float, probabilidade_erro: float, tempo_minimo: float,
+                 tempo_maximo: float, atraso: float, perda: float, semente: int):
+        self.agora = 0.0
+        self.eventos = []
+        self.contador = itertools.count()
+        self.sorteio = random.Random(semente)
+        self.tempo = tempo
+        self.probabilidade_erro = probabilidade_erro
+        self.tempo_minimo = tempo_minimo
+        self.tempo_maximo = tempo_maximo
+        self.atraso = atraso
+        self.perda = perda
+        self.sairam = set()
+        self.nos = [No(indice, (indice + 1) % nos, indice == 0, self.sorteio.uniform(0, PAUSA_GERENCIADOR), 0.0)
+                    for indice in range(nos)]
+        self.ao_concluir = None  # Chamada a cada mensagem concluída (laço fechado)
+        self.processados = 0
+        self.estatisticas = dict.fromkeys(
+            ("regeneracoes", "tokens_duplicados", "tokens_rapidos", "retransmissoes", "reenvios",
+             "recebidas_duplicadas", "descartados_ttl", "descartados_orfaos", "perdidos_enlace"), 0)
+        self.voltas = []
+        self.recebidas = {}  # Mensagem -> vezes recebida no destino
+        self.agendar(ESPERA_GERADOR, self.partida_gerador, self.nos[0], 0)
+
+    # ---- Escalonador ----
+    def agendar(self, instante: float, funcao, *argumentos):
+        heapq.heappush(self.eventos, (instante, next(self.contador), funcao, argumentos))
+
+    def executar(self, ate: float):
+        while self.eventos and self.eventos[0][0] <= ate:
+            self.agora, _, funcao, argumentos = heapq.heappop(self.eventos)
+            funcao(*argumentos)
+            self.processados += 1
+        self.agora = max(self.agora, ate)
+
+    def atraso_salto(self) -> float:
+        return self.sorteio.uniform(0.5 * self.atraso, 1.5 * self.atraso)
+
+    def enviar(self, destino: int, funcao, *argumentos):
+        """
+        Um datagrama por um enlace: chega após o atraso do salto, se não for perdido
+        """
+        if self.sorteio.random() < self.perda:
+            self.estatisticas["perdidos_enlace"] += 1
+            return
+        self.agendar(self.agora + self.atraso_salto(), self.receber, destino, funcao, argumentos)
+
+    def receber(self, indice: int, funcao, argumentos: tuple):
+        no = self.nos[indice]
+        if no.saiu is not None and self.agora - no.saiu < ENCERRAMENTO and funcao == self.chegada_token:
+            self.enviar(no.proximo, funcao, *argumentos)  # Saída concluída: só repassa até encerrar
+        elif no.vivo:
+            funcao(no, *argumentos)
+
+    def acordar(self, no: No, instante: float = None):
+        """
+        Agenda a batida do gerenciador do nó no instante pedido (ou na próxima)
+        """
+        instante = max(self.agora, instante if instante is not None else self.agora)
+        batida = no.fase + max(0, math.ceil((instante - no.fase) / PAUSA_GERENCIADOR)) * PAUSA_GERENCIADOR
+        if batida < instante:  # Arredondamento do ponto flutuante
+            batida += PAUSA_GERENCIADOR
+        if batida not in no.batidas:
+            no.batidas.add(batida)
+            self.agendar(batida, self.batida, no, no.geracao)
+
+    # ---- Gerenciador ----
+    def batida(self, no: No, geracao: int):
+        no.batidas.discard(self.agora)
+        if geracao != no.geracao or not no.vivo:
+            return
+        if no.gerador and self.agora - no.ultima_passagem > self.tempo_maximo:
+            no.sequencia += self.conhecidos(no)
+            no.sequencia += 1
+            self.estatisticas["regeneracoes"] += 1
+            self.passar_token(no)
+            return
+        if not no.token_presente:
+            return
+        if no.fila:
+            if self.agora < no.proximo_envio:
+                self.acordar(no, no.proximo_envio)
+                return
+            if no.aguardando_resposta:
+                self.passar_token(no)  # Sem resposta no tempo do token: a cabeça é reenviada na próxima visita
+                return
+            mensagem, reenviado, tentativas = no.fila[0]
+            if mensagem["destino_indice"] in no.removidos:
+                no.fila.pop(0)
+                self.concluir(no, mensagem, "descartada (naoexiste)")
+                self.acordar(no, self.agora + PAUSA_GERENCIADOR)
+                return
+            if mensagem["aguardando"]:
+                self.estatisticas["reenvios"] += 1  # A visita anterior terminou sem resposta
+            mensagem["aguardando"] = True
+            corrompido = not reenviado and self.sorteio.random() < self.probabilidade_erro
+            self.enviar_quadro(no, mensagem, corrompido)
+            no.proximo_envio = self.agora + self.tempo
+            no.aguardando_resposta = True
+            self.acordar(no, no.proximo_envio)
+        elif no.saindo:
+            self.concluir_saida(no)
+        else:
+            self.passar_token(no)
+
+    def conhecidos(self, no: No) -> int:
+        return len(self.nos) - len(no.removidos)
+
+    def partida_gerador(self, no: No, geracao: int):
+        if geracao == no.geracao and no.vivo and no.gerador:
+            self.passar_token(no)
+
+    # ---- Token ----
+    def atualizar_tempo(self, no: No):
+        no.ultima_passagem = no.ultimo_token = self.agora
+        if no.gerador:
+            self.acordar(no, self.agora + self.tempo_maximo + 1e-6)  # Verificação do timeout
+
+    def passar_token(self, no: No):
+        self.enviar(no.proximo, self.chegada_token, no.sequencia)
+        no.token_presente = False
+        no.aguardando_resposta = False
+        self.atualizar_tempo(no)
+
+    def chegada_token(self, no: No, sequencia: int):
+        # verificar_tempo_minimo, com a limpeza dos tokens antigos
+        recebidos = no.tokens_recebidos
+        while recebidos and (self.agora - next(iter(recebidos.values())) > LIMPEZA_TOKENS
+                             or len(recebidos) > MAX_TOKENS_ARMAZENADOS):
+            del recebidos[next(iter(recebidos))]
+        if self.agora - no.ultimo_token < self.tempo_minimo:
+            self.estatisticas["tokens_rapidos"] += 1
+            return
+        if sequencia in recebidos:
+            self.estatisticas["tokens_duplicados"] += 1
+            return
+        recebidos[sequencia] = self.agora
+        no.sequencia = sequencia + 1
+        if no.ultima_chegada is not None:
+            self.voltas.append(self.agora - no.ultima_chegada)
+        no.ultima_chegada = self.agora
+        self.atualizar_tempo(no)
+        no.token_presente = True
+        self.acordar(no)
+
+    # ---- Quadros de dados ----
+    def enviar_quadro(self, origem: No, mensagem: dict, corrompido: bool):
+        """
+        Percorre o anel a partir da origem até o destino, o monitor ou a perda do quadro
+        """
+        ttl = main.calcular_ttl(self.conhecidos(origem))
+        extensoes = {}  # Extensões do quadro que o protocolo altera no caminho (marca do monitor)
+        instante = self.agora
+        atual = origem
+        # Laço quente com milhares de nós: sorteios e buscas em variáveis locais
+        sortear, nos, perda = self.sorteio.random, self.nos, self.perda
+        minimo, variacao = 0.5 * self.atraso, self.atraso
+        while True:
+            if perda and sortear() < perda:
+                self.estatisticas["perdidos_enlace"] += 1
+                return
+            instante += minimo + variacao * sortear()
+            atual = nos[atual.proximo]
+            if atual.saiu is not None and instante - atual.saiu < ENCERRAMENTO:
+                continue  # Saída concluída: repassa sem tratar
+            if not atual.vivo or atual is origem:
+                return  # Nó caído, ou o quadro voltou à origem (ignorado como mensagem própria)
+            if atual.indice == mensagem["destino_indice"]:
+                self.agendar(instante, self.receber, atual.indice, self.chegada_quadro, (origem.indice, mensagem, corrompido))
+                return
+            if ttl <= 1:
+                self.estatisticas["descartados_ttl"] += 1
+                return
+            if atual.gerador and main.marcar_no_monitor(extensoes):
+                self.estatisticas["descartados_orfaos"] += 1
+                return
+            ttl -= 1
+
+    def chegada_quadro(self, no: No, origem: int, mensagem: dict, corrompido: bool):
+        if origem in no.removidos:
+            return  # Origem desconhecida: não há para onde devolver a resposta
+        if not corrompido:
+            vezes = self.recebidas.get(mensagem["id"], 0)
+            self.recebidas[mensagem["id"]] = vezes + 1
+            self.estatisticas["recebidas_duplicadas"] += vezes > 0
+        self.enviar(origem, self.chegada_resposta, mensagem, not corrompido)
+
+    def chegada_resposta(self, no: No, respondida: dict, ack: bool):
+        if not no.fila or no.fila[0][0] is not respondida:
+            return  # Resposta de uma cópia já tratada: ignorada, e o token fica onde está
+        mensagem, reenviado, tentativas = no.fila[0]
+        mensagem["aguardando"] = False
+        if ack:
+            no.fila.pop(0)
+            self.concluir(no, mensagem, "entregue")
+        elif tentativas < MAX_TENTATIVAS:
+            no.fila[0] = [mensagem, True, tentativas + 1]
+            self.estatisticas["retransmissoes"] += 1
+        else:
+            no.fila.pop(0)
+            self.concluir(no, mensagem, "descartada (tentativas)")
+        if no.saindo and not no.fila:
+            self.concluir_saida(no)
+        elif no.token_presente:
+            self.passar_token(no)
+
+    # ---- Mensagens ----
+    def oferecer(self, origem: int, mensagem: dict):
+        no = self.nos[origem]
+        if not no.vivo or no.saindo:
+            return  # Entrada perdida com o processo ou ignorada durante a saída
+        no.entrada.append(mensagem)
+        self.liberar_entrada(no)
+
+    def liberar_entrada(self, no: No):
+        while no.entrada and len(no.fila) < TAMANHO_FILA:
+            mensagem = no.entrada.popleft()
+            mensagem["enviado"] = self.agora
+            no.fila.append([mensagem, False, 0])
+
+    def concluir(self, no: No, mensagem: dict, resultado: str):
+        mensagem["concluido"] = self.agora
+        mensagem["resultado"] = resultado
+        if resultado == "entregue":
+            mensagem["servico"] = self.agora - mensagem["enviado"]
+        self.liberar_entrada(no)
+        if self.ao_concluir is not None:
+            self.ao_concluir(mensagem)
+
+    # ---- Falhas ----
+    def queda(self, indice: int, duracao: float = None):
+        no = self.nos[indice]
+        no.vivo = False
+        no.geracao += 1
+        if duracao is not None:
+            self.agendar(self.agora + duracao, self.reinicio, indice)
+
+    def reinicio(self, indice: int):
+        no = self.nos[indice]
+        no.reiniciar(self.sorteio.uniform(0, PAUSA_GERENCIADOR), self.agora, self.sairam)
+        if no.gerador:
+            self.agendar(self.agora + ESPERA_GERADOR, self.partida_gerador, no, no.geracao)
+
+    def saida(self, indice: int):
+        no = self.nos[indice]
+        if not no.vivo:
+            return
+        no.saindo = True
+        no.entrada.clear()
+        limite = self.tempo_maximo + len(no.fila) * (MAX_TENTATIVAS + 1) * self.tempo
+        self.agendar(self.agora + limite, self.saida_forcada, no, no.geracao)
+
+    def saida_forcada(self, no: No, geracao: int):
+        if geracao == no.geracao and no.vivo:
+            no.fila.clear()
+            self.concluir_saida(no)
+
+    def concluir_saida(self, no: No):
+        self.sairam.add(no.indice)
+        for outro in self.nos:
+            if outro is not no and no.indice not in outro.removidos:
+                self.enviar(outro.indice, self.chegada_leave, no.indice, no.proximo, no.gerador)
+        if no.token_presente:
+            self.passar_token(no)
+        no.vivo = False
+        no.geracao += 1
+        no.saiu = self.agora
+
+    def chegada_leave(self, no: No, indice: int, proximo: int, gerador: bool):
+        no.removidos.add(indice)
+        if no.proximo == indice:
+            no.proximo = proximo
+        if gerador and proximo == no.indice and not no.gerador:
+            no.gerador = True
+            self.atualizar_tempo(no)
+
+
+def conferir_main() -> list:
+    """
+    Aplica o ControleToken do main.py e as regras do token do simulador aos mesmos casos
+    Returns:
+        Divergências encontradas (vazia se o simulador acompanha o main.py)
+    """
+    divergencias = []
+    controle = main.ControleToken()
+    controle.tempo_minimo = 0
+    simulador = Simulador(3, 1.0, 0.0, 0.0, 15.0, 0.0, 0.0, 1)
+    no = simulador.nos[1]
+    token = main.Token()
+    token.sequencia = 41
+
+    # Token novo: aceito, e o nó repassa a sequência seguinte
+    aceito = controle.processar_token(token.to_string())
+    simulador.chegada_token(no, 41)
+    if (aceito, controle.token.sequencia) != (no.token_presente, no.sequencia):
+        divergencias.append(f"token novo: main.py {(aceito, controle.token.sequencia)}, "
+                            f"simulador {(no.token_presente, no.sequencia)}")
+
+    # Mesma sequência outra vez: descartada como duplicada
+    aceito = controle.processar_token(token.to_string())
+    simulador.chegada_token(no, 41)
+    if aceito or simulador.estatisticas["tokens_duplicados"] != 1:
+        divergencias.append(f"token duplicado: main.py {'aceita' if aceito else 'descarta'}, simulador "
+                            f"{'descarta' if simulador.estatisticas['tokens_duplicados'] else 'aceita'}")
+
+    # Token antes do tempo mínimo: descartado
+    controle.tempo_minimo = simulador.tempo_minimo = 60
+    controle.atualizar_tempo()
+    simulador.atualizar_tempo(no)
+    rapido = controle.verificar_tempo_minimo()
+    simulador.chegada_token(no, 50)
+    if rapido != bool(simulador.estatisticas["tokens_rapidos"]):
+        divergencias.append(f"tempo mínimo: main.py {'descarta' if rapido else 'aceita'}, simulador "
+                            f"{'descarta' if simulador.estatisticas['tokens_rapidos'] else 'aceita'}")
+
+    # Regeneração pelo gerador com três nós conhecidos
+    main.nos_ativos.clear()
+    main.nos_ativos.update(gerador.nome for gerador in simulador.nos)
+    controle.token.sequencia = 42
+    controle.regenerando = True
+    controle.regenerar_token()
+    gerador = simulador.nos[0]
+    gerador.sequencia = 42
+    gerador.ultima_passagem = simulador.agora - simulador.tempo_maximo - 1
+    simulador.batida(gerador, gerador.geracao)
+    if controle.token.sequencia != gerador.sequencia:
+        divergencias.append(f"regeneração: main.py sequência {controle.token.sequencia}, simulador {gerador.sequencia}")
+    return divergencias
+
+
+def simular(nos: int, modo: str, duracao: float, taxa: float, chegadas: str, pendentes: int,
+            destinos: str, tempo: float, drenagem: float, opcoes: tuple, semente: int, tamanhos: str = "32",
+            atraso: float = 0.0005, perda: float = 0.0, falhas: tuple = (), **_) -> tuple:
+    """
+    Executa uma simulação com os parâmetros do gerador_carga.py
+    Returns:
+        (mensagens no formato do gerador_carga.py, estatísticas da simulação)
+    """
+    # Padrões dos nós do gerador_carga.py (tempo_minimo_token=0, sem erro inserido)
+    configuracao = {"tempo_minimo_token": "0", "tempo_maximo_token": str(main.tempo_maximo_token),
+                    "probabilidade_erro": "0"}
+    for opcao in opcoes:
+        chave, _, valor_opcao = opcao.partition("=")
+        configuracao[chave] = valor_opcao
+    simulador = Simulador(nos, tempo, float(configuracao["probabilidade_erro"]),
+                          float(configuracao["tempo_minimo_token"]), float(configuracao["tempo_maximo_token"]),
+                          atraso, perda, semente)
+    sorteio = random.Random(semente)
+    destino_de = sorteador_destinos(destinos, nos, sorteio)
+    tamanho = sorteador_tamanhos(tamanhos, sorteio)  # Mesmos sorteios do gerador_carga.py, na mesma ordem
+    mensagens = []
+    em_andamento = [0] * nos
+    fim_carga = INICIO_CARGA + duracao
+
+    def nova_mensagem(origem: int):
+        destino = destino_de(origem)
+        mensagem = {"id": f"No{origem + 1}#{len(mensagens)}", "origem": f"No{origem + 1}",
+                    "destino": f"No{destino + 1}", "destino_indice": destino, "tamanho": tamanho(),
+                    "previsto": simulador.agora,
+                    "enviado": None, "concluido": None, "resultado": None, "servico": None,
+                    "aguardando": False}
+        mensagens.append(mensagem)
+        em_andamento[origem] += 1
+        simulador.oferecer(origem, mensagem)
+
+    def concluida(mensagem: dict):
+        origem = int(mensagem["origem"][2:]) - 1
+        em_andamento[origem] -= 1
+        if modo == "fechado" and simulador.agora < fim_carga:
+            while em_andamento[origem] < pendentes:
+                nova_mensagem(origem)
+
+    def chegada_aberta():
+        nova_mensagem(sorteio.randrange(nos))
+        proxima = simulador.agora + (sorteio.expovariate(taxa) if chegadas == "poisson" else 1 / taxa)
+        if proxima < fim_carga:
+            simulador.agendar(proxima, chegada_aberta)
+
+    def inicio_fechado():
+        for origem in range(nos):
+            while em_andamento[origem] < pendentes:
+                nova_mensagem(origem)
+
+    simulador.ao_concluir = concluida
+    simulador.agendar(INICIO_CARGA, chegada_aberta if modo == "aberto" else inicio_fechado)
+    for falha in falhas:
+        tipo, nome, instante, *resto = falha.split(":")
+        indice = int(nome.removeprefix("No")) - 1
+        if tipo == "queda":
+            simulador.agendar(INICIO_CARGA + float(instante), simulador.queda, indice, float(resto[0]) if resto else None)
+        else:
+            simulador.agendar(INICIO_CARGA + float(instante), simulador.saida, indice)
+
+    inicio_real = time.perf_counter()
+    simulador.executar(fim_carga)
+    while simulador.agora < fim_carga + drenagem and any(em_andamento):
+        simulador.executar(simulador.agora + 0.5)
+    real = time.perf_counter() - inicio_real
+
+    for mensagem in mensagens:
+        concluido = mensagem["concluido"]
+        mensagem["latencia_corrigida"] = (concluido if concluido is not None else simulador.agora) - mensagem["previsto"]
+        for campo in ("previsto", "enviado", "concluido"):
+            if mensagem[campo] is not None:
+                mensagem[campo] -= INICIO_CARGA
+        if mensagem["resultado"] is None and mensagem["enviado"] is None:
+            mensagem["enviado"] = mensagem["previsto"]  # Nunca entrou na fila (nó caído ou entrada cheia)
+    estatisticas = dict(simulador.estatisticas)
+    estatisticas["volta_media_s"] = round(sum(simulador.voltas) / len(simulador.voltas), 4) if simulador.voltas else None
+    estatisticas["eventos"] = simulador.processados
+    estatisticas["tempo_virtual_s"] = round(simulador.agora, 3)
+    estatisticas["tempo_real_s"] = round(real, 3)
+    estatisticas["aceleracao"] = round(simulador.agora / max(real, 1e-9), 1)
+    return mensagens, estatisticas
+
+
+def mostrar(resumo: dict, estatisticas: dict):
+    print(f"Oferecidas: {resumo['oferecidas']} ({resumo['taxa_oferecida']}/s) | entregues: {resumo['entregues']} | "
+          f"descartadas: {resumo['descartadas']} | pendentes: {resumo['pendentes']} | vazão: {resumo['vazao']} entregas/s")
+    for nome, chave in (("corrigida", "latencia_corrigida_ms"), ("de serviço", "latencia_servico_ms")):
+        print(f"Latência {nome} (ms): " + " | ".join(f"{p} {v:.1f}" for p, v in resumo[chave].items()))
+    volta = estatisticas["volta_media_s"]
+    print(f"Token: volta média {'-' if volta is None else f'{volta:.3f}s'} | regenerações {estatisticas['regeneracoes']} | "
+          f"duplicados {estatisticas['tokens_duplicados']} | rápidos demais {estatisticas['tokens_rapidos']}")
+    print(f"Quadros: retransmissões {estatisticas['retransmissoes']} | reenvios por falta de resposta "
+          f"{estatisticas['reenvios']} | recebidos em dobro {estatisticas['recebidas_duplicadas']} | "
+          f"descartados (TTL {estatisticas['descartados_ttl']}, órfãos {estatisticas['descartados_orfaos']}) | "
+          f"perdidos no enlace {estatisticas['perdidos_enlace']}")
+    print(f"⏱️ {estatisticas['tempo_virtual_s']:.0f}s virtuais em {estatisticas['tempo_real_s']:.2f}s "
+          f"({estatisticas['eventos']} eventos, {estatisticas['aceleracao']:g}x o tempo real)")
+
+
+def comparar(real: dict, simulado: dict):
+    """
+    Resumo real (gerador_carga.py) e simulado lado a lado
+    """
+    print(f"{'métrica':32} {'real':>12} {'simulado':>12} {'razão':>8}")
+    linhas = [(chave, real[chave], simulado[chave]) for chave in ("oferecidas", "entregues", "descartadas", "pendentes", "vazao")]
+    for grupo in ("latencia_corrigida_ms", "latencia_servico_ms"):
+        linhas += [(f"{grupo} {p}", real[grupo][p], simulado[grupo][p]) for p in real[grupo]]
+    for nome, valor_real, valor_simulado in linhas:
+        razao = f"{valor_simulado / valor_real:7.2f}x" if valor_real else "-"
+        print(f"{nome:32} {valor_real:12.1f} {valor_simulado:12.1f} {razao:>8}")
+
+
+def valor(argumentos: list, opcao: str, padrao: str) -> str:
+    return argumentos[argumentos.index(opcao) + 1] if opcao in argumentos else padrao
+
+
+if __name__ == "__main__":
+    argumentos = sys.argv[1:]
+    if "--ajuda" in argumentos:
+        print(__doc__)
+        sys.exit(0)
+    falhas = tuple(argumentos[indice + 1] for indice, argumento in enumerate(argumentos) if argumento == "--falha")
+    if any(falha.split(":")[0] not in ("queda", "saida") or len(falha.split(":")) < 3 for falha in falhas):
+        print(__doc__)
+        sys.exit(1)
+
+    real = None
+    if "--comparar" in argumentos:
+        with open(valor(argumentos, "--comparar", None)) as arquivo:
+            real = json.load(arquivo)
+        parametros = dict(real["parametros"], opcoes=tuple(real["parametros"]["opcoes"]))
+    else:
+        parametros = {
+            "nos": int(valor(argumentos, "--nos", "3")), "modo": valor(argumentos, "--modo", "aberto"),
+            "duracao": float(valor(argumentos, "--duracao", "60")),
+            "taxa": float(valor(argumentos, "--taxa", "2")), "chegadas": valor(argumentos, "--chegadas", "poisson"),
+            "pendentes": int(valor(argumentos, "--pendentes", "2")),
+            "destinos": valor(argumentos, "--destinos", "uniforme"),
+            "tamanhos": valor(argumentos, "--tamanhos", "32"),
+            "tempo": float(valor(argumentos, "--tempo", "0.3")),
+            "drenagem": float(valor(argumentos, "--drenagem", "30")),
+            "opcoes": tuple(argumentos[indice + 1] for indice, argumento in enumerate(argumentos) if argumento == "--opcao"),
+        }
+    parametros["semente"] = int(valor(argumentos, "--semente", str(parametros.get("semente", 1))))
+    parametros["atraso"] = float(valor(argumentos, "--atraso", "0.0005"))
+    parametros["perda"] = float(valor(argumentos, "--perda", "0"))
+    parametros["falhas"] = falhas
+    if parametros["modo"] not in ("aberto", "fechado") or parametros["chegadas"] not in ("poisson", "constante"):
+        print(__doc__)
+        sys.exit(1)
+
+    divergencias = conferir_main()
+    if divergencias:
+        print("❌ As regras do token do simulador divergem do main.py:")
+        for divergencia in divergencias:
+            print(f"  - {divergencia}")
+        sys.exit(1)
+
+    mensagens, estatisticas = simular(**parametros)
+    resumo = resumir(mensagens, parametros["duracao"])
+    descricao = (f"aberta ({parametros['chegadas']}, {parametros['taxa']}/s)" if parametros["modo"] == "aberto"
+                 else f"fechada ({parametros['pendentes']} pendentes por nó)")
+    print(f"Simulação: carga {descricao} em {parametros['nos']} nós por {parametros['duracao']:.0f}s virtuais")
+    mostrar(resumo, estatisticas)
+    if real is not None:
+        print()
+        comparar(real["resumo"], resumo)
+
+    if "--json" in argumentos:
+        with open(valor(argumentos, "--json", None), "w") as arquivo:
+            json.dump({"parametros": dict(parametros, opcoes=list(parametros["opcoes"]), falhas=list(falhas)),
+                       "resumo": resumo, "simulacao": estatisticas}, arquivo, indent=2, ensure_ascii=False)
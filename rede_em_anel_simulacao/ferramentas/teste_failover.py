@@ -0,0 +1,114 @@
+"""
+Teste de entrega através de um enlace caído no anel duplo (anel_duplo=failover)
+
+Uso: python ferramentas/teste_failover.py [--nos 6] [--alvo 4] [--mensagens 4] [--tempo 0.3]
+                                          [--tempo-maximo 5] [--limite 120] [--revisao REV]
+
+Sobe um anel sem interface no loopback com anel_duplo=failover (como o
+benchmark_falhas.py), mata o nó --alvo sem reiniciar e espera os vizinhos
+detectarem a queda (PING sem PONG) e dobrarem o anel. Depois, cada nó envia
+--mensagens mensagens a cada destino cujo caminho no anel primário passava
+pelo nó morto: o quadro só chega dando a volta pelo outro sentido (wrap),
+passando de novo pelo monitor e, às vezes, pela própria origem.
+
+Mostra as entregas (ACK) por par origem→destino e falha (código de saída 1)
+se alguma mensagem não foi entregue dentro do --limite.
+"""
+import os
+import signal
+import sys
+import tempfile
+import threading
+import time
+
+from benchmark_anel import aguardar_descoberta, codigo_do_no, subir_anel
+
+DETECCAO = 3 + 2  # LIMITE_ENLACE do main.py e uma margem para os PINGs
+
+
+def pares_atravessando(nos: int, alvo: int) -> list:
+    """
+    Pares (origem, destino) cujo caminho no sentido primário passa pelo nó alvo (índices a partir de 0)
+    """
+    pares = []
+    for origem in range(nos):
+        for destino in range(nos):
+            if alvo in (origem, destino) or origem == destino:
+                continue
+            if (alvo - origem) % nos < (destino - origem) % nos:
+                pares.append((origem, destino))
+    return pares
+
+
+def executar(codigo: str, nos: int, alvo: int, mensagens: int, tempo: float, tempo_maximo: float, limite: float) -> dict:
+    registros, trava = [], threading.Lock()
+    opcoes = ("anel_duplo=failover", "anterior={anterior}", "tempo_minimo_token=0", f"tempo_maximo_token={tempo_maximo}")
+    pares = pares_atravessando(nos, alvo - 1)
+    with tempfile.TemporaryDirectory() as pasta:
+        processos = []
+        try:
+            processos = subir_anel(codigo, pasta, nos, tempo, 0.0, registros, trava, opcoes)
+            aguardar_descoberta(nos)
+
+            processos[alvo - 1].kill()
+            processos[alvo - 1].wait()
+            print(f"No{alvo} parado; aguardando {DETECCAO}s para os vizinhos dobrarem o anel...", flush=True)
+            time.sleep(DETECCAO)
+
+            for numero in range(mensagens):
+                for origem, destino in pares:
+                    processos[origem].stdin.write(f"No{destino + 1} No{origem + 1}>No{destino + 1}#{numero}\n")
+            for origem in {origem for origem, _ in pares}:
+                processos[origem].stdin.flush()
+
+            esperadas = len(pares) * mensagens
+            inicio = time.monotonic()
+            while time.monotonic() - inicio < limite:
+                with trava:
+                    encerradas = sum(1 for _, campos in registros if campos[0] in ("@ENTREGUE", "@DESCARTADA"))
+                if encerradas >= esperadas:
+                    break
+                time.sleep(0.2)
+        finally:
+            for processo in processos:
+                if processo.poll() is None:
+                    processo.send_signal(signal.SIGKILL)
+                    processo.wait()
+
+    with trava:
+        entregues = {campos[-1] for _, campos in registros if campos[0] == "@ENTREGUE"}
+        regeneracoes = sum(1 for _, campos in registros if campos[0] == "@REGENERADO")
+    por_par = {}
+    for origem, destino in pares:
+        par = f"No{origem + 1}>No{destino + 1}"
+        por_par[par] = sum(1 for numero in range(mensagens) if f"{par}#{numero}" in entregues)
+    return {"por_par": por_par, "mensagens": mensagens, "regeneracoes": regeneracoes}
+
+
+def valor(argumentos: list, opcao: str, padrao: str) -> str:
+    return argumentos[argumentos.index(opcao) + 1] if opcao in argumentos else padrao
+
+
+if __name__ == "__main__":
+    argumentos = sys.argv[1:]
+    if "--ajuda" in argumentos or "-h" in argumentos:
+        print(__doc__)
+        sys.exit(0)
+    nos = int(valor(argumentos, "--nos", "6"))
+    alvo = int(valor(argumentos, "--alvo", "4"))
+    if not 1 < alvo <= nos or nos < 4:
+        print("O alvo não pode ser o gerador (No1) e o anel precisa de ao menos 4 nós")
+        sys.exit(1)
+
+    print(f"Anel failover de {nos} nós, enlaces com No{alvo} caídos...", flush=True)
+    resultado = executar(codigo_do_no(valor(argumentos, "--revisao", None)), nos, alvo,
+                         int(valor(argumentos, "--mensagens", "4")), float(valor(argumentos, "--tempo", "0.3")),
+                         float(valor(argumentos, "--tempo-maximo", "5")), float(valor(argumentos, "--limite", "120")))
+    falhas = 0
+    for par, entregues in resultado["por_par"].items():
+        marca = "✅" if entregues == resultado["mensagens"] else "❌"
+        falhas += entregues != resultado["mensagens"]
+        print(f"  {marca} {par}: {entregues}/{resultado['mensagens']} entregues")
+    print(f"{len(resultado['por_par']) - falhas}/{len(resultado['por_par'])} pares com todas as mensagens entregues, "
+          f"{resultado['regeneracoes']} regenerações do token")
+    sys.exit(1 if falhas else 0)
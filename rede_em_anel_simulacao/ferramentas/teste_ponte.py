@@ -0,0 +1,159 @@
+"""
+Teste de ponta a ponta de dois anéis ligados por uma ponte
+
+Uso: python ferramentas/teste_ponte.py [--ordens ac,ca] [--mensagens 3] [--tempo 1]
+                                       [--limite 120] [--revisao REV]
+
+Sobe no loopback, sem interface, o anel A (A1, A2, BR) e o anel C (BR, C1, C2):
+BR é a ponte, com a porta normal no anel A e a porta da ponte no anel C, e gera
+o token do anel C (ponte_gerador=true); A1 gera o do anel A. --ordens define a
+ordem de partida de cada execução: "ac" sobe o anel A primeiro e "ca" o anel C
+(os DISCOVER de um anel que parte antes da ponte se perdem e o mapeamento
+depende das atualizações).
+
+Depois que todos os nós conhecem os cinco nós, cada nó envia --mensagens
+mensagens a cada nó do outro anel (e a ponte a todos), com tráfego nos dois
+sentidos ao mesmo tempo. Mostra as entregas (ACK) por par e quantas vezes o
+destino recebeu cada mensagem, e falha (código de saída 1) se alguma não foi
+entregue dentro do --limite.
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from benchmark_anel import INTERVALO_PARTIDA, RESULTADOS, codigo_do_no, ler_metricas, subir_no
+
+PORTA_BASE = 7200  # A1, A2, BR; a porta da ponte e C1, C2 começam em PORTA_BASE + 10
+DESCOBERTA = 30  # Limite para todos os nós conhecerem os dois anéis (em segundos)
+
+# Nome -> (porta, próximo nó, opções extras do config.txt)
+NOS = {
+    "A1": (PORTA_BASE, PORTA_BASE + 1, []),
+    "A2": (PORTA_BASE + 1, PORTA_BASE + 2, []),
+    "BR": (PORTA_BASE + 2, PORTA_BASE, [f"ponte=127.0.0.1:{PORTA_BASE + 11}", f"ponte_porta={PORTA_BASE + 10}",
+                                        "ponte_gerador=true"]),
+    "C1": (PORTA_BASE + 11, PORTA_BASE + 12, []),
+    "C2": (PORTA_BASE + 12, PORTA_BASE + 10, []),
+}
+ANEIS = {"a": ["A1", "A2", "BR"], "c": ["C1", "C2"]}
+
+
+def metricas_do_no(nome: str) -> int:
+    return NOS[nome][0] + 1000
+
+
+def configurar(codigo: str, pasta: str, nome: str, tempo: float):
+    porta, proximo, extras = NOS[nome]
+    diretorio = os.path.join(pasta, nome)
+    os.makedirs(diretorio)
+    with open(os.path.join(diretorio, "main.py"), "w", encoding="utf-8") as arquivo:
+        arquivo.write(codigo)
+    with open(os.path.join(diretorio, "config.txt"), "w") as arquivo:
+        arquivo.write("\n".join([
+            f"127.0.0.1:{proximo}", nome, str(tempo), "true" if nome == "A1" else "false",
+            f"porta={porta}", f"metricas_porta={metricas_do_no(nome)}", "interface=false",
+            "probabilidade_erro=0", "nivel_log=WARNING", "tempo_minimo_token=0", *extras,
+        ]))
+    return diretorio
+
+
+def aguardar_descoberta(limite: float) -> bool:
+    """
+    Espera todos os nós conhecerem os cinco nós (nos_ativos nas métricas)
+    """
+    fim = time.monotonic() + limite
+    while time.monotonic() < fim:
+        try:
+            conhecidos = [ler_metricas(metricas_do_no(nome)).get(("anel_estrutura_itens", 'estrutura="nos_ativos"'), 0)
+                          for nome in NOS]
+        except OSError:
+            conhecidos = []
+        if conhecidos and min(conhecidos) >= len(NOS):
+            return True
+        time.sleep(0.5)
+    print(f"  ⚠️ Descoberta incompleta após {limite:.0f}s", flush=True)
+    return False
+
+
+def pares() -> list:
+    lado = {nome: anel for anel, nomes in ANEIS.items() for nome in nomes}
+    return [(origem, destino) for origem in NOS for destino in NOS
+            if origem != destino and (lado[origem] != lado[destino] or "BR" in (origem, destino))]
+
+
+def executar(codigo: str, ordem: str, mensagens: int, tempo: float, limite: float) -> dict:
+    registros, trava = [], threading.Lock()
+    processos = {}
+    with tempfile.TemporaryDirectory() as pasta:
+        try:
+            # Cada anel em ordem inversa, como no benchmark_anel.py: o sucessor já ouve o DISCOVER
+            for anel in ordem:
+                for nome in reversed(ANEIS[anel]):
+                    processos[nome] = subir_no(configurar(codigo, pasta, nome, tempo), registros, trava)
+                    time.sleep(INTERVALO_PARTIDA)
+            descoberta = aguardar_descoberta(DESCOBERTA)
+
+            for numero in range(mensagens):
+                for origem, destino in pares():
+                    processos[origem].stdin.write(f"{destino} {origem}>{destino}#{numero}\n")
+            for processo in processos.values():
+                processo.stdin.flush()
+
+            esperadas = len(pares()) * mensagens
+            inicio = time.monotonic()
+            while time.monotonic() - inicio < limite:
+                with trava:
+                    encerradas = sum(1 for _, campos in registros if campos[0] in RESULTADOS)
+                if encerradas >= esperadas:
+                    break
+                time.sleep(0.2)
+            duracao = time.monotonic() - inicio
+        finally:
+            for processo in processos.values():
+                processo.kill()
+                processo.wait()
+
+    with trava:
+        entregues = {campos[-1] for _, campos in registros if campos[0] == "@ENTREGUE"}
+        recebidas = [campos[-1] for _, campos in registros if campos[0] == "@RECEBIDA"]
+        regeneracoes = sum(1 for _, campos in registros if campos[0] == "@REGENERADO")
+    por_par = {}
+    for origem, destino in pares():
+        par = f"{origem}>{destino}"
+        identificadores = [f"{par}#{numero}" for numero in range(mensagens)]
+        por_par[par] = (sum(1 for identificador in identificadores if identificador in entregues),
+                        sum(recebidas.count(identificador) for identificador in identificadores))
+    return {"descoberta": descoberta, "por_par": por_par, "duracao_s": round(duracao, 1), "regeneracoes": regeneracoes}
+
+
+def valor(argumentos: list, opcao: str, padrao: str) -> str:
+    return argumentos[argumentos.index(opcao) + 1] if opcao in argumentos else padrao
+
+
+if __name__ == "__main__":
+    argumentos = sys.argv[1:]
+    if "--ajuda" in argumentos or "-h" in argumentos:
+        print(__doc__)
+        sys.exit(0)
+    ordens = valor(argumentos, "--ordens", "ac,ca").split(",")
+    if any(sorted(ordem) != ["a", "c"] for ordem in ordens):
+        print(__doc__)
+        sys.exit(1)
+    codigo = codigo_do_no(valor(argumentos, "--revisao", None))
+    mensagens = int(valor(argumentos, "--mensagens", "3"))
+
+    falhas = 0
+    for ordem in ordens:
+        print(f"Anéis {' e '.join(anel.upper() for anel in ordem)}, nessa ordem de partida...", flush=True)
+        resultado = executar(codigo, ordem, mensagens, float(valor(argumentos, "--tempo", "1")),
+                             float(valor(argumentos, "--limite", "120")))
+        for par, (entregues, recebidas) in resultado["por_par"].items():
+            falhas += entregues != mensagens
+            print(f"  {'✅' if entregues == mensagens else '❌'} {par}: {entregues}/{mensagens} entregues "
+                  f"(recebidas {recebidas} vezes)")
+        completos = sum(1 for entregues, _ in resultado["por_par"].values() if entregues == mensagens)
+        print(f"  {completos}/{len(resultado['por_par'])} pares completos em {resultado['duracao_s']}s, "
+              f"{resultado['regeneracoes']} regenerações do token", flush=True)
+    sys.exit(1 if falhas else 0)
@@ -0,0 +1,220 @@
+"""
+Teste de resistência (soak) do anel com detecção de vazamentos
+
+Uso: python ferramentas/teste_resistencia.py [--horas 4] [--nos 3] [--taxa 2] [--amostragem 30]
+                                             [--aceleracao 1] [--tempo 0.3] [--opcao chave=valor ...]
+                                             [--revisao REV] [--csv amostras.csv] [--json relatorio.json]
+
+Sobe um anel sem interface no loopback (como o benchmark_anel.py) e o mantém
+sob carga constante (--taxa mensagens/s no anel todo) por --horas horas. A cada
+--amostragem segundos registra, para cada nó, a memória residente (RSS), os
+descritores abertos e as threads (lidos de /proc) e o tamanho das estruturas
+que crescem com o tráfego (filas, tokens_recebidos, instante_enfileirado, ...,
+pela métrica anel_estrutura_itens).
+
+Ao fim (ou com Ctrl+C) gera o relatório de tendência: primeiro e último valor,
+máximo e inclinação por hora de cada série. Uma série é considerada crescente
+quando a mediana do último terço das amostras passa da mediana do terço do
+meio além da tolerância (o primeiro terço é o aquecimento); nesse caso o teste falha
+(código de saída 1).
+
+--aceleracao K comprime o tempo: divide o tempo do token, o timeout do token e
+o intervalo do resumo por K e multiplica a taxa por K, de modo que uma hora
+de execução corresponde a cerca de K horas de tráfego.
+Os nós usam tempo_minimo_token=0: com o mínimo padrão (0.5s) o token que volta
+rápido no loopback seria descartado e o anel rodaria pela regeneração; com a
+aceleração o mínimo chegaria ao timeout e nenhum token seria aceito.
+Requer Linux (/proc).
+"""
+import csv
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+
+from benchmark_anel import PORTA_BASE, aguardar_descoberta, codigo_do_no, ler_metricas, subir_anel
+
+# Tolerância (absoluta, relativa) antes de considerar uma série crescente
+TOLERANCIAS = {"rss_mb": (0.5, 0.01), "descritores": (1, 0.0), "threads": (1, 0.0)}
+TOLERANCIA_ESTRUTURAS = (1, 0.05)
+
+
+def ler_processo(pid: int) -> dict:
+    """
+    Memória residente, threads e descritores abertos de um processo (Linux)
+    """
+    amostra = {"descritores": len(os.listdir(f"/proc/{pid}/fd"))}
+    with open(f"/proc/{pid}/status") as arquivo:
+        for linha in arquivo:
+            if linha.startswith("VmRSS:"):
+                amostra["rss_mb"] = int(linha.split()[1]) / 1024
+            elif linha.startswith("Threads:"):
+                amostra["threads"] = int(linha.split()[1])
+    return amostra
+
+
+def amostrar(processos: list) -> dict:
+    """
+    Uma amostra de cada nó: (nó, série) -> valor
+    """
+    amostra = {}
+    for indice, processo in enumerate(processos):
+        no = f"No{indice + 1}"
+        try:
+            for serie, valor in ler_processo(processo.pid).items():
+                amostra[(no, serie)] = valor
+            metricas = ler_metricas(PORTA_BASE + 1000 + indice)
+        except OSError:
+            continue  # Nó encerrado: a ausência da amostra aparece no relatório
+        for (nome, rotulos), valor in metricas.items():
+            if nome == "anel_estrutura_itens":
+                amostra[(no, rotulos.split('"')[1])] = valor
+            elif nome == "anel_entregas_total":
+                amostra[(no, "entregas")] = valor
+    return amostra
+
+
+def inclinacao(instantes: list, valores: list) -> float:
+    """
+    Inclinação da reta de mínimos quadrados (unidades por hora)
+    """
+    media_t, media_v = statistics.fmean(instantes), statistics.fmean(valores)
+    variancia = sum((t - media_t) ** 2 for t in instantes)
+    if variancia == 0:
+        return 0.0
+    return 3600 * sum((t - media_t) * (v - media_v) for t, v in zip(instantes, valores)) / variancia
+
+
+def crescente(serie: str, valores: list) -> bool:
+    terco = len(valores) // 3
+    if terco < 2 or serie == "entregas":
+        return False
+    absoluta, relativa = TOLERANCIAS.get(serie, TOLERANCIA_ESTRUTURAS)
+    meio = statistics.median(valores[terco:2 * terco])
+    return statistics.median(valores[2 * terco:]) > meio + max(absoluta, relativa * meio)
+
+
+def tendencias(amostras: list) -> list:
+    """
+    Resumo de cada série (nó, nome) ao longo das amostras
+    """
+    series = {}
+    for instante, amostra in amostras:
+        for chave, valor in amostra.items():
+            series.setdefault(chave, ([], []))
+            series[chave][0].append(instante)
+            series[chave][1].append(valor)
+    relatorio = []
+    for (no, serie), (instantes, valores) in sorted(series.items()):
+        relatorio.append({
+            "no": no, "serie": serie, "amostras": len(valores),
+            "primeiro": valores[0], "ultimo": valores[-1], "maximo": max(valores),
+            "por_hora": round(inclinacao(instantes, valores), 3) if len(valores) > 1 else 0.0,
+            "crescente": crescente(serie, valores),
+        })
+    return relatorio
+
+
+def alimentar(processos: list, taxa: float, parar: threading.Event, semente: int = 1):
+    """
+    Carga constante: uma mensagem a cada 1/taxa segundos, de um nó sorteado para outro
+    """
+    sorteio = random.Random(semente)
+    nos = len(processos)
+    numero = 0
+    proxima = time.monotonic()
+    while not parar.is_set():
+        origem = sorteio.randrange(nos)
+        destino = sorteio.choice([outro for outro in range(nos) if outro != origem])
+        try:
+            processos[origem].stdin.write(f"No{destino + 1} No{origem + 1}#{numero}\n")
+            processos[origem].stdin.flush()
+        except OSError:
+            pass
+        numero += 1
+        proxima += 1 / taxa
+        parar.wait(max(0.0, proxima - time.monotonic()))
+
+
+def valor(argumentos: list, opcao: str, padrao: str) -> str:
+    return argumentos[argumentos.index(opcao) + 1] if opcao in argumentos else padrao
+
+
+if __name__ == "__main__":
+    argumentos = sys.argv[1:]
+    if "--ajuda" in argumentos or not os.path.isdir("/proc/self/fd"):
+        print(__doc__)
+        sys.exit(1)
+    horas = float(valor(argumentos, "--horas", "4"))
+    nos = int(valor(argumentos, "--nos", "3"))
+    aceleracao = float(valor(argumentos, "--aceleracao", "1"))
+    taxa = float(valor(argumentos, "--taxa", "2")) * aceleracao
+    intervalo_amostras = float(valor(argumentos, "--amostragem", "30"))
+    tempo = float(valor(argumentos, "--tempo", "0.3")) / aceleracao
+    revisao = valor(argumentos, "--revisao", None)
+    opcoes = ["tempo_minimo_token=0", f"tempo_maximo_token={15 / aceleracao}", f"intervalo_status={30 / aceleracao}"]
+    opcoes += [argumentos[indice + 1] for indice, argumento in enumerate(argumentos) if argumento == "--opcao"]
+
+    amostras = []
+    eventos, trava = deque(maxlen=1000), threading.Lock()  # A saída dos nós não precisa ser guardada
+    parar = threading.Event()
+    with tempfile.TemporaryDirectory() as pasta:
+        processos = []
+        try:
+            processos = subir_anel(codigo_do_no(revisao), pasta, nos, tempo, 0.0, eventos, trava, tuple(opcoes))
+            aguardar_descoberta(nos)
+            threading.Thread(target=alimentar, args=(processos, taxa, parar), daemon=True).start()
+            inicio = time.monotonic()
+            print(f"Teste de resistência: {nos} nós, {taxa:g} mensagens/s, {horas:g}h "
+                  f"(aceleração {aceleracao:g}x), amostras a cada {intervalo_amostras:g}s", flush=True)
+            while time.monotonic() - inicio < horas * 3600:
+                amostra = amostrar(processos)
+                decorrido = time.monotonic() - inicio
+                amostras.append((decorrido, amostra))
+                rss = sum(v for (_, serie), v in amostra.items() if serie == "rss_mb")
+                maior = lambda nome: max((v for (_, serie), v in amostra.items() if serie.startswith(nome)), default=0)
+                print(f"[{decorrido / 60:7.1f} min] RSS total {rss:6.1f} MB | descritores {maior('descritores'):.0f} | "
+                      f"threads {maior('threads'):.0f} | fila {maior('fila_anel'):.0f} | "
+                      f"tokens_recebidos {maior('tokens_recebidos'):.0f} | entregas {sum(v for (_, s), v in amostra.items() if s == 'entregas'):.0f}",
+                      flush=True)
+                time.sleep(max(0.0, intervalo_amostras - (time.monotonic() - inicio - decorrido)))
+        except KeyboardInterrupt:
+            print("\nInterrompido: relatório com as amostras até aqui")
+        finally:
+            parar.set()
+            for processo in processos:
+                processo.kill()
+                processo.wait()
+
+    relatorio = tendencias(amostras)
+    print("\n" + "=" * 86)
+    print("RELATÓRIO DE TENDÊNCIA".center(86))
+    print("=" * 86)
+    print(f"{'nó':5} {'série':26} {'primeiro':>10} {'último':>10} {'máximo':>10} {'por hora':>10}")
+    for linha in relatorio:
+        if linha["maximo"] == linha["primeiro"] == linha["ultimo"] and linha["serie"] not in TOLERANCIAS:
+            continue  # Estruturas que não mudaram ficam só no JSON
+        marca = "  ⚠️ crescendo" if linha["crescente"] else ""
+        print(f"{linha['no']:5} {linha['serie']:26} {linha['primeiro']:10.1f} {linha['ultimo']:10.1f} "
+              f"{linha['maximo']:10.1f} {linha['por_hora']:+10.2f}{marca}")
+    crescentes = [f"{linha['no']}/{linha['serie']}" for linha in relatorio if linha["crescente"]]
+    print("=" * 86)
+    print(f"❌ Séries crescentes: {', '.join(crescentes)}" if crescentes else "✅ Nenhuma série cresceu sem limite")
+
+    if "--csv" in argumentos:
+        chaves = sorted({chave for _, amostra in amostras for chave in amostra})
+        with open(valor(argumentos, "--csv", None), "w", newline="") as arquivo:
+            escritor = csv.writer(arquivo)
+            escritor.writerow(["segundos"] + [f"{no}/{serie}" for no, serie in chaves])
+            for instante, amostra in amostras:
+                escritor.writerow([round(instante, 1)] + [amostra.get(chave, "") for chave in chaves])
+    if "--json" in argumentos:
+        with open(valor(argumentos, "--json", None), "w") as arquivo:
+            json.dump({"revisao": revisao or "árvore de trabalho", "horas": horas, "aceleracao": aceleracao,
+                       "taxa": taxa, "opcoes": opcoes, "series": relatorio}, arquivo, indent=2, ensure_ascii=False)
+    sys.exit(1 if crescentes else 0)